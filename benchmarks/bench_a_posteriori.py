@@ -0,0 +1,110 @@
+# Copyright (C) 2020 Sebastian Blauth
+#
+# This file is part of CASHOCS.
+#
+# CASHOCS is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# CASHOCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CASHOCS.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Benchmark for the a posteriori mesh check of shape optimization problems.
+
+Compares the vectorized check of the _MeshHandler with the previously used
+loop over all vertices of the mesh, which queries the bounding box tree for
+every single vertex. Note, that the timing of the new check also includes the
+subsequent update of the mesh quality. Run with ``python bench_a_posteriori.py``.
+"""
+
+import os
+import time
+
+import numpy as np
+from fenics import *
+
+import cashocs
+
+
+
+config = cashocs.create_config(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests', 'config_sop.ini'))
+
+
+
+def vertex_loop_check(mesh, bbtree):
+	"""The previous, vertex based self intersection test.
+
+	Parameters
+	----------
+	mesh : dolfin.cpp.mesh.Mesh
+		The (deformed) mesh.
+	bbtree : dolfin.cpp.geometry.BoundingBoxTree
+		The bounding box tree of the deformed mesh.
+
+	Returns
+	-------
+	bool
+		True if the mesh is valid, False otherwise.
+	"""
+
+	cells = mesh.cells()
+	coordinates = mesh.coordinates()
+	for i in range(coordinates.shape[0]):
+		x = Point(coordinates[i])
+		cells_idx = bbtree.compute_entity_collisions(x)
+		intersections = len(cells_idx)
+		M = cells[cells_idx]
+		occurences = M.flatten().tolist().count(i)
+
+		if intersections > occurences:
+			return False
+
+	return True
+
+
+
+def run(n, dim):
+	mesh, _, boundaries, dx, ds, _ = cashocs.regular_mesh(n, 1.0, 1.0, 1.0 if dim == 3 else None)
+	V = FunctionSpace(mesh, 'CG', 1)
+	u = Function(V)
+	p = Function(V)
+	bcs = cashocs.create_bcs_list(V, Constant(0), boundaries, list(range(1, 2*dim + 1)))
+	e = inner(grad(u), grad(p))*dx - Constant(1)*p*dx
+	J = u*dx
+
+	sop = cashocs.ShapeOptimizationProblem(e, bcs, J, u, p, boundaries, config)
+	mesh_handler = sop.mesh_handler
+
+	W = VectorFunctionSpace(mesh, 'CG', 1)
+	if dim == 2:
+		trafo = interpolate(Expression(('0.01*x[0]*x[1]', '0.01*x[1]'), degree=2), W)
+	else:
+		trafo = interpolate(Expression(('0.01*x[0]*x[1]', '0.01*x[1]', '0.01*x[2]'), degree=2), W)
+
+	mesh_handler.move_mesh(trafo)
+
+	start = time.time()
+	valid_new = mesh_handler._MeshHandler__test_a_posteriori()
+	time_new = time.time() - start
+
+	start = time.time()
+	valid_old = vertex_loop_check(mesh, mesh_handler.bbtree)
+	time_old = time.time() - start
+
+	print('dim = ' + str(dim) + '   vertices = ' + format(mesh.num_vertices(), '8d') + '   loop: ' + format(time_old, '.3e') + ' s'
+		  + '   vectorized: ' + format(time_new, '.3e') + ' s' + '   (same verdict: ' + str(valid_new == valid_old) + ')')
+
+
+
+if __name__ == '__main__':
+	config.set('Output', 'verbose', 'False')
+	for n in [16, 32, 64, 128]:
+		run(n, 2)
+	for n in [8, 16, 32]:
+		run(n, 3)
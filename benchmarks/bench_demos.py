@@ -0,0 +1,583 @@
+# Copyright (C) 2020 Sebastian Blauth
+#
+# This file is part of CASHOCS.
+#
+# CASHOCS is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# CASHOCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CASHOCS.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Benchmarks of the documented demos at several mesh resolutions.
+
+The problems of demos/documented are solved with their config files, where the
+mesh is refined by the parameter ``refinement``: the number of subintervals of
+the regular meshes is multiplied by it, and the mesh size of the GMSH meshes is
+divided by it (this requires gmsh). For each demo and refinement, the wall time
+(``time_solve``) and the peak memory (``peakmem_solve``) of the solution are measured,
+and the iterations, the number of state and adjoint solves, the number of KSP
+iterations, and the time spent in the phases of the algorithm (see the ``timings``
+parameter of the config file) are tracked. The forms are compiled before the
+measurements, so that the just-in-time compilation is not included.
+
+The benchmarks are run with `asv <https://asv.readthedocs.io/>`_ from the root
+directory of the repository, which stores the results for each commit, e.g., ::
+
+    asv run master^!
+    asv continuous master HEAD
+    asv compare master HEAD
+
+The latter two compare the current commit with the master branch, and report the
+benchmarks whose results changed significantly.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+
+from fenics import *
+
+import cashocs
+from cashocs._cli import convert
+
+
+
+demo_directory = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'demos', 'documented'))
+refinements = [1, 2, 4]
+
+
+
+def create_config(path, instrumented):
+	"""Loads the config of a demo, without any output.
+
+	Parameters
+	----------
+	path : str
+		The path to the config file, relative to demos/documented.
+	instrumented : bool
+		If this is ``True``, the timings and the KSP telemetry are enabled.
+
+	Returns
+	-------
+	configparser.ConfigParser
+		The config of the demo.
+	"""
+
+	config = cashocs.create_config(os.path.join(demo_directory, path))
+	config.set('Output', 'verbose', 'False')
+	config.set('Output', 'save_results', 'False')
+	config.set('Output', 'save_pvd', 'False')
+	config.set('Output', 'timings', str(instrumented))
+	config.set('Output', 'ksp_telemetry', str(instrumented))
+
+	return config
+
+
+
+def generate_mesh(geo_file, refinement):
+	"""Generates a mesh from a .geo file with gmsh and converts it to .xdmf.
+
+	The mesh is saved in the current working directory.
+
+	Parameters
+	----------
+	geo_file : str
+		The path to the .geo file, relative to demos/documented.
+	refinement : int
+		The factor by which the mesh size of the .geo file is divided.
+
+	Returns
+	-------
+	str
+		The path to the .xdmf file.
+	"""
+
+	if shutil.which('gmsh') is None:
+		raise NotImplementedError('gmsh is not available')
+
+	name = os.path.splitext(os.path.basename(geo_file))[0]
+	msh_file = os.path.realpath(name + '.msh')
+	xdmf_file = os.path.realpath(name + '.xdmf')
+	subprocess.run(['gmsh', os.path.join(demo_directory, geo_file), '-2', '-clscale', str(1.0 / refinement), '-o', msh_file],
+				   check=True, stdout=subprocess.DEVNULL)
+	convert(argparse.Namespace(infile=msh_file, outfile=xdmf_file))
+
+	return xdmf_file
+
+
+
+def poisson(instrumented, refinement):
+	config = create_config('optimal_control/poisson/config.ini', instrumented)
+	mesh, subdomains, boundaries, dx, ds, dS = cashocs.regular_mesh(25*refinement)
+	V = FunctionSpace(mesh, 'CG', 1)
+
+	y = Function(V)
+	p = Function(V)
+	u = Function(V)
+
+	e = inner(grad(y), grad(p))*dx - u*p*dx
+	bcs = cashocs.create_bcs_list(V, Constant(0), boundaries, [1, 2, 3, 4])
+
+	y_d = Expression('sin(2*pi*x[0])*sin(2*pi*x[1])', degree=1)
+	alpha = 1e-6
+	J = Constant(0.5)*(y - y_d)*(y - y_d)*dx + Constant(0.5*alpha)*u*u*dx
+
+	return cashocs.OptimalControlProblem(e, bcs, J, y, u, p, config)
+
+
+
+def nonlinear_pdes(instrumented, refinement):
+	config = create_config('optimal_control/nonlinear_pdes/config.ini', instrumented)
+	mesh, subdomains, boundaries, dx, ds, dS = cashocs.regular_mesh(25*refinement)
+	V = FunctionSpace(mesh, 'CG', 1)
+
+	y = Function(V)
+	p = Function(V)
+	u = Function(V)
+
+	c = Constant(1e2)
+	e = inner(grad(y), grad(p))*dx + c*pow(y, 3)*p*dx - u*p*dx
+	bcs = cashocs.create_bcs_list(V, Constant(0), boundaries, [1, 2, 3, 4])
+
+	y_d = Expression('sin(2*pi*x[0])*sin(2*pi*x[1])', degree=1)
+	alpha = 1e-6
+	J = Constant(0.5)*(y - y_d)*(y - y_d)*dx + Constant(0.5*alpha)*u*u*dx
+
+	return cashocs.OptimalControlProblem(e, bcs, J, y, u, p, config)
+
+
+
+def picard_iteration(instrumented, refinement):
+	config = create_config('optimal_control/picard_iteration/config.ini', instrumented)
+	mesh, subdomains, boundaries, dx, ds, dS = cashocs.regular_mesh(50*refinement)
+	V = FunctionSpace(mesh, 'CG', 1)
+
+	y = Function(V)
+	p = Function(V)
+	z = Function(V)
+	q = Function(V)
+	u = Function(V)
+	v = Function(V)
+
+	e_y = inner(grad(y), grad(p))*dx + z*p*dx - u*p*dx
+	bcs_y = cashocs.create_bcs_list(V, Constant(0), boundaries, [1, 2, 3, 4])
+	e_z = inner(grad(z), grad(q))*dx + y*q*dx - v*q*dx
+	bcs_z = cashocs.create_bcs_list(V, Constant(0), boundaries, [1, 2, 3, 4])
+
+	y_d = Expression('sin(2*pi*x[0])*sin(2*pi*x[1])', degree=1)
+	z_d = Expression('sin(4*pi*x[0])*sin(4*pi*x[1])', degree=1)
+	alpha = 1e-6
+	beta = 1e-6
+	J = Constant(0.5)*(y - y_d)*(y - y_d)*dx + Constant(0.5)*(z - z_d)*(z - z_d)*dx \
+		+ Constant(0.5*alpha)*u*u*dx + Constant(0.5*beta)*v*v*dx
+
+	return cashocs.OptimalControlProblem([e_y, e_z], [bcs_y, bcs_z], J, [y, z], [u, v], [p, q], config)
+
+
+
+def stokes(instrumented, refinement):
+	config = create_config('optimal_control/stokes/config.ini', instrumented)
+	mesh, subdomains, boundaries, dx, ds, dS = cashocs.regular_mesh(30*refinement)
+	v_elem = VectorElement('CG', mesh.ufl_cell(), 2)
+	p_elem = FiniteElement('CG', mesh.ufl_cell(), 1)
+	V = FunctionSpace(mesh, MixedElement([v_elem, p_elem]))
+	U = VectorFunctionSpace(mesh, 'CG', 1)
+
+	up = Function(V)
+	u, p = split(up)
+	vq = Function(V)
+	v, q = split(vq)
+	c = Function(U)
+
+	e = inner(grad(u), grad(v))*dx - p*div(v)*dx - q*div(u)*dx - inner(c, v)*dx
+
+	def pressure_point(x, on_boundary):
+		return near(x[0], 0) and near(x[1], 0)
+
+	no_slip_bcs = cashocs.create_bcs_list(V.sub(0), Constant((0, 0)), boundaries, [1, 2, 3])
+	lid_velocity = Expression(('4*x[0]*(1-x[0])', '0.0'), degree=2)
+	bc_lid = DirichletBC(V.sub(0), lid_velocity, boundaries, 4)
+	bc_pressure = DirichletBC(V.sub(1), Constant(0), pressure_point, method='pointwise')
+	bcs = no_slip_bcs + [bc_lid, bc_pressure]
+
+	alpha = 1e-5
+	u_d = Expression(('sqrt(pow(x[0], 2) + pow(x[1], 2))*cos(2*pi*x[1])', '-sqrt(pow(x[0], 2) + pow(x[1], 2))*sin(2*pi*x[0])'), degree=2)
+	J = Constant(0.5)*inner(u - u_d, u - u_d)*dx + Constant(0.5*alpha)*inner(c, c)*dx
+
+	return cashocs.OptimalControlProblem(e, bcs, J, up, c, vq, config)
+
+
+
+def shape_poisson(instrumented, refinement):
+	config = create_config('shape_optimization/shape_poisson/config.ini', instrumented)
+	mesh = UnitDiscMesh.create(MPI.comm_world, 15*refinement, 1, 2)
+	dx = Measure('dx', mesh)
+	boundary = CompiledSubDomain('on_boundary')
+	boundaries = MeshFunction('size_t', mesh, dim=1)
+	boundary.mark(boundaries, 1)
+
+	V = FunctionSpace(mesh, 'CG', 1)
+	u = Function(V)
+	p = Function(V)
+
+	x = SpatialCoordinate(mesh)
+	f = 2.5*pow(x[0] + 0.4 - pow(x[1], 2), 2) + pow(x[0], 2) + pow(x[1], 2) - 1
+	e = inner(grad(u), grad(p))*dx - f*p*dx
+	bcs = DirichletBC(V, Constant(0), boundaries, 1)
+	J = u*dx
+
+	return cashocs.ShapeOptimizationProblem(e, bcs, J, u, p, boundaries, config)
+
+
+
+def shape_stokes(instrumented, refinement):
+	config = create_config('shape_optimization/shape_stokes/config.ini', instrumented)
+	mesh, subdomains, boundaries, dx, ds, dS = cashocs.import_mesh(generate_mesh('shape_optimization/shape_stokes/mesh/mesh.geo', refinement))
+	v_elem = VectorElement('CG', mesh.ufl_cell(), 2)
+	p_elem = FiniteElement('CG', mesh.ufl_cell(), 1)
+	V = FunctionSpace(mesh, MixedElement([v_elem, p_elem]))
+
+	up = Function(V)
+	u, p = split(up)
+	vq = Function(V)
+	v, q = split(vq)
+
+	e = inner(grad(u), grad(v))*dx - p*div(v)*dx - q*div(u)*dx
+	u_in = Expression(('-1.0/4.0*(x[1] - 2.0)*(x[1] + 2.0)', '0.0'), degree=2)
+	bc_in = DirichletBC(V.sub(0), u_in, boundaries, 1)
+	bc_no_slip = cashocs.create_bcs_list(V.sub(0), Constant((0, 0)), boundaries, [2, 4])
+	bcs = [bc_in] + bc_no_slip
+	J = inner(grad(u), grad(u))*dx
+
+	return cashocs.ShapeOptimizationProblem(e, bcs, J, up, vq, boundaries, config)
+
+
+
+def inverse_tomography(instrumented, refinement):
+	config = create_config('shape_optimization/inverse_tomography/config.ini', instrumented)
+	kappa_out = 1e0
+	kappa_in = 1e1
+
+	# the measurements are generated on the reference geometry
+	mesh, subdomains, boundaries, dx, ds, dS = cashocs.import_mesh(generate_mesh('shape_optimization/inverse_tomography/mesh/reference.geo', refinement))
+	V = FunctionSpace(mesh, MixedElement([FiniteElement('CG', mesh.ufl_cell(), 1), FiniteElement('R', mesh.ufl_cell(), 0)]))
+	u, c = TrialFunctions(V)
+	v, d = TestFunctions(V)
+	a = kappa_out*inner(grad(u), grad(v))*dx(1) + kappa_in*inner(grad(u), grad(v))*dx(2) + u*d*ds + v*c*ds
+	rhs = [Constant(1)*v*(ds(3) + ds(4)) + Constant(-1)*v*(ds(1) + ds(2)),
+		   Constant(1)*v*(ds(3) + ds(2)) + Constant(-1)*v*(ds(1) + ds(4)),
+		   Constant(1)*v*(ds(3) + ds(1)) + Constant(-1)*v*(ds(2) + ds(4))]
+	measurements = []
+	for L in rhs:
+		measurement = Function(V)
+		solve(a == L, measurement)
+		measurements.append(measurement.split(True)[0])
+
+	mesh, subdomains, boundaries, dx, ds, dS = cashocs.import_mesh(generate_mesh('shape_optimization/inverse_tomography/mesh/mesh.geo', refinement))
+	V = FunctionSpace(mesh, MixedElement([FiniteElement('CG', mesh.ufl_cell(), 1), FiniteElement('R', mesh.ufl_cell(), 0)]))
+	markers = [([3, 4], [1, 2]), ([3, 2], [1, 4]), ([3, 1], [2, 4])]
+
+	e = []
+	states = []
+	adjoints = []
+	J = 0
+	for i in range(3):
+		uc = Function(V)
+		u, c = split(uc)
+		pd = Function(V)
+		p, d = split(pd)
+		positive, negative = markers[i]
+		e.append(kappa_out*inner(grad(u), grad(p))*dx(1) + kappa_in*inner(grad(u), grad(p))*dx(2) + u*d*ds + p*c*ds
+				 - Constant(1)*p*(ds(positive[0]) + ds(positive[1])) - Constant(-1)*p*(ds(negative[0]) + ds(negative[1])))
+		states.append(uc)
+		adjoints.append(pd)
+		J = J + Constant(0.5)*pow(u - measurements[i], 2)*ds
+
+	return cashocs.ShapeOptimizationProblem(e, None, J, states, adjoints, boundaries, config)
+
+
+
+def remeshing(instrumented, refinement):
+	if refinement != 1:
+		# the new meshes are generated with the mesh size of the .geo file
+		raise NotImplementedError('remeshing is only benchmarked for the original mesh size')
+	if shutil.which('gmsh') is None:
+		raise NotImplementedError('gmsh is not available')
+
+	config = create_config('shape_optimization/remeshing/config.ini', instrumented)
+	# the remeshing creates new files next to the mesh, so it is copied to the working directory
+	shutil.copy(os.path.join(demo_directory, 'shape_optimization/remeshing/mesh/mesh.geo'), './mesh.geo')
+	mesh_file = generate_mesh('shape_optimization/remeshing/mesh/mesh.geo', refinement)
+	config.set('Mesh', 'mesh_file', mesh_file)
+	config.set('Mesh', 'gmsh_file', os.path.realpath('./mesh.msh'))
+	config.set('Mesh', 'geo_file', os.path.realpath('./mesh.geo'))
+	config.set('Mesh', 'remesh_in_process', 'True')
+	config.set('Mesh', 'show_gmsh_output', 'False')
+
+	mesh, subdomains, boundaries, dx, ds, dS = cashocs.import_mesh(config)
+	V = FunctionSpace(mesh, 'CG', 1)
+	u = Function(V)
+	p = Function(V)
+
+	x = SpatialCoordinate(mesh)
+	f = 2.5*pow(x[0] + 0.4 - pow(x[1], 2), 2) + pow(x[0], 2) + pow(x[1], 2) - 1
+	e = inner(grad(u), grad(p))*dx - f*p*dx
+	bcs = DirichletBC(V, Constant(0), boundaries, 1)
+	J = u*dx
+
+	return cashocs.ShapeOptimizationProblem(e, bcs, J, u, p, boundaries, config)
+
+
+
+optimal_control_demos = {'poisson' : poisson, 'nonlinear_pdes' : nonlinear_pdes, 'picard_iteration' : picard_iteration, 'stokes' : stokes}
+shape_optimization_demos = {'shape_poisson' : shape_poisson, 'shape_stokes' : shape_stokes, 'inverse_tomography' : inverse_tomography,
+							'remeshing' : remeshing}
+
+
+
+class _Workspace:
+	"""A temporary working directory, in which the demos are run.
+
+	"""
+
+	def __enter__(self):
+		self.cwd = os.getcwd()
+		self.directory = tempfile.mkdtemp(prefix='cashocs_benchmark_')
+		os.chdir(self.directory)
+
+		return self
+
+
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		os.chdir(self.cwd)
+		shutil.rmtree(self.directory, ignore_errors=True)
+
+		return False
+
+
+
+def collect_statistics(demo, refinement):
+	"""Solves a demo with timings and KSP telemetry and collects the statistics.
+
+	Parameters
+	----------
+	demo : function
+		The function which creates the problem of the demo.
+	refinement : int
+		The refinement of the mesh.
+
+	Returns
+	-------
+	dict
+		The statistics of the solution.
+	"""
+
+	with _Workspace():
+		problem = demo(True, refinement)
+		problem.precompile()
+		problem.solve()
+		output_dict = problem.solver.output_dict
+
+	statistics = {'iterations' : output_dict['iterations'], 'state_solves' : output_dict['state_solves'],
+				  'adjoint_solves' : output_dict['adjoint_solves']}
+	for role in ['state', 'adjoint']:
+		statistics[role + '_ksp_iterations'] = sum(output_dict['ksp_telemetry'].get(role, {}).get('ksp_iterations', []))
+	for phase, value in output_dict['timings_total'].items():
+		statistics['time_' + phase] = value
+
+	return statistics
+
+
+
+class _SolveBenchmarks:
+	"""Measures the wall time and peak memory of the solution of the demos.
+
+	"""
+
+	param_names = ['demo', 'refinement']
+	demos = {}
+	timeout = 3600.0
+	# each sample needs a new problem, which is created in the setup
+	number = 1
+	repeat = 1
+	warmup_time = 0.0
+
+	def setup(self, demo, refinement):
+		self.workspace = _Workspace()
+		self.workspace.__enter__()
+		try:
+			self.problem = self.demos[demo](False, refinement)
+			self.problem.precompile()
+		except Exception:
+			self.workspace.__exit__(None, None, None)
+			raise
+
+
+
+	def teardown(self, demo, refinement):
+		self.workspace.__exit__(None, None, None)
+
+
+
+	def time_solve(self, demo, refinement):
+		self.problem.solve()
+
+
+
+	def peakmem_solve(self, demo, refinement):
+		self.problem.solve()
+
+
+
+class _StatisticsBenchmarks:
+	"""Tracks the iterations, the number of solves, and the timings of the phases for the demos.
+
+	All demos are solved once in :py:meth:`setup_cache`, and the tracked values are
+	taken from the statistics of these solutions.
+	"""
+
+	param_names = ['demo', 'refinement']
+	demos = {}
+
+	def setup_cache(self):
+		statistics = {}
+		for demo in self.params[0]:
+			for refinement in self.params[1]:
+				try:
+					statistics[demo, refinement] = collect_statistics(self.demos[demo], refinement)
+				except NotImplementedError:
+					pass
+
+		return statistics
+
+	# all demos are solved, so the default timeout of asv is too short
+	setup_cache.timeout = 7200.0
+
+
+
+	def setup(self, statistics, demo, refinement):
+		if (demo, refinement) not in statistics:
+			raise NotImplementedError('not available for this demo and refinement')
+
+
+
+	def track_iterations(self, statistics, demo, refinement):
+		return statistics[demo, refinement]['iterations']
+
+	track_iterations.unit = 'iterations'
+
+
+
+	def track_state_solves(self, statistics, demo, refinement):
+		return statistics[demo, refinement]['state_solves']
+
+	track_state_solves.unit = 'solves'
+
+
+
+	def track_adjoint_solves(self, statistics, demo, refinement):
+		return statistics[demo, refinement]['adjoint_solves']
+
+	track_adjoint_solves.unit = 'solves'
+
+
+
+	def track_state_ksp_iterations(self, statistics, demo, refinement):
+		return statistics[demo, refinement]['state_ksp_iterations']
+
+	track_state_ksp_iterations.unit = 'iterations'
+
+
+
+	def track_adjoint_ksp_iterations(self, statistics, demo, refinement):
+		return statistics[demo, refinement]['adjoint_ksp_iterations']
+
+	track_adjoint_ksp_iterations.unit = 'iterations'
+
+
+
+	def track_time_total(self, statistics, demo, refinement):
+		return statistics[demo, refinement]['time_total']
+
+	track_time_total.unit = 'seconds'
+
+
+
+	def track_time_assembly(self, statistics, demo, refinement):
+		return statistics[demo, refinement]['time_assembly']
+
+	track_time_assembly.unit = 'seconds'
+
+
+
+	def track_time_ksp(self, statistics, demo, refinement):
+		return statistics[demo, refinement]['time_ksp']
+
+	track_time_ksp.unit = 'seconds'
+
+
+
+	def track_time_newton(self, statistics, demo, refinement):
+		return statistics[demo, refinement]['time_newton']
+
+	track_time_newton.unit = 'seconds'
+
+
+
+	def track_time_riesz(self, statistics, demo, refinement):
+		return statistics[demo, refinement]['time_riesz']
+
+	track_time_riesz.unit = 'seconds'
+
+
+
+	def track_time_line_search(self, statistics, demo, refinement):
+		return statistics[demo, refinement]['time_line_search']
+
+	track_time_line_search.unit = 'seconds'
+
+
+
+class OptimalControlSolve(_SolveBenchmarks):
+	params = [list(optimal_control_demos.keys()), refinements]
+	demos = optimal_control_demos
+
+
+
+class OptimalControlStatistics(_StatisticsBenchmarks):
+	params = [list(optimal_control_demos.keys()), refinements]
+	demos = optimal_control_demos
+
+
+
+class ShapeOptimizationSolve(_SolveBenchmarks):
+	params = [list(shape_optimization_demos.keys()), refinements]
+	demos = shape_optimization_demos
+
+
+
+class ShapeOptimizationStatistics(_StatisticsBenchmarks):
+	params = [list(shape_optimization_demos.keys()), refinements]
+	demos = shape_optimization_demos
+
+	def track_time_mesh_quality(self, statistics, demo, refinement):
+		return statistics[demo, refinement]['time_mesh_quality']
+
+	track_time_mesh_quality.unit = 'seconds'
+
+
+
+	def track_time_remeshing(self, statistics, demo, refinement):
+		return statistics[demo, refinement]['time_remeshing']
+
+	track_time_remeshing.unit = 'seconds'
@@ -24,13 +24,14 @@ optimization problems, in particular, shape optimization and optimal control pro
 
 from . import verification
 from ._optimal_control.optimal_control_problem import OptimalControlProblem
+from ._optimal_control.time_dependent_problem import TimeDependentOptimalControlProblem
 from ._shape_optimization.shape_optimization_problem import ShapeOptimizationProblem
 from .geometry import import_mesh, regular_box_mesh, regular_mesh, MeshQuality
 from .nonlinear_solvers import damped_newton_solve
-from .utils import create_bcs_list, create_config
+from .utils import create_bcs_list, create_config, load_history
 
 
 
 __all__ = ['import_mesh', 'regular_mesh', 'regular_box_mesh', 'MeshQuality',
-		   'damped_newton_solve', 'OptimalControlProblem', 'ShapeOptimizationProblem',
-		   'create_config', 'create_bcs_list', 'verification']
+		   'damped_newton_solve', 'OptimalControlProblem', 'TimeDependentOptimalControlProblem', 'ShapeOptimizationProblem',
+		   'create_config', 'create_bcs_list', 'load_history', 'verification']
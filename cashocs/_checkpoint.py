@@ -0,0 +1,185 @@
+# Copyright (C) 2020 Sebastian Blauth
+#
+# This file is part of CASHOCS.
+#
+# CASHOCS is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# CASHOCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CASHOCS.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Checkpoints of the optimization algorithms.
+
+A checkpoint is a single (compressed) HDF5 file. The arrays owned by each
+process (e.g. the coefficients of the controls, states, and adjoints) are
+stored in the groups ``rank_0``, ``rank_1``, ..., and the global values (e.g.
+the iteration counter and the history) are stored as json in the attribute
+``values`` of the file. Hence, a checkpoint can only be restored with the
+same number of processes (and the same mesh partitioning) it was written with.
+"""
+
+import json
+import os
+
+from ._exceptions import InputError
+
+
+
+def store_functions(arrays, name, functions):
+	"""Adds the local coefficients of functions to the arrays of a checkpoint.
+
+	Parameters
+	----------
+	arrays : dict
+		The arrays of the checkpoint, which are modified.
+	name : str
+		The name of the functions, e.g., ``'controls'``.
+	functions : list[dolfin.function.function.Function]
+		The functions which are saved.
+
+	Returns
+	-------
+	None
+	"""
+
+	for i, function in enumerate(functions):
+		arrays[name + '_' + str(i)] = function.vector()[:]
+
+
+
+def load_functions(arrays, name, functions):
+	"""Overwrites functions with the coefficients saved in a checkpoint.
+
+	Parameters
+	----------
+	arrays : dict
+		The arrays of the checkpoint.
+	name : str
+		The name of the functions, e.g., ``'controls'``.
+	functions : list[dolfin.function.function.Function]
+		The functions which are overwritten.
+
+	Returns
+	-------
+	None
+	"""
+
+	for i, function in enumerate(functions):
+		function.vector()[:] = arrays[name + '_' + str(i)]
+
+
+
+def h5py_is_available():
+	"""Checks, whether h5py, which is required for checkpoints, is installed.
+
+	Returns
+	-------
+	bool
+		``True`` if h5py can be imported, ``False`` otherwise.
+	"""
+
+	try:
+		import h5py
+	except ImportError:
+		return False
+
+	return True
+
+
+
+def write_checkpoint(path, comm, arrays, values):
+	"""Writes a checkpoint file.
+
+	The file is written by the first process to a temporary file, which replaces
+	the previous checkpoint only when it is complete, so that an interruption
+	during the output does not destroy the last checkpoint.
+
+	Parameters
+	----------
+	path : str
+		The path to the checkpoint file.
+	comm : mpi4py.MPI.Comm
+		The MPI communicator of the problem.
+	arrays : dict
+		The arrays (numpy.ndarray) owned by the current process.
+	values : dict
+		The global values, which have to be serializable as json.
+
+	Returns
+	-------
+	None
+	"""
+
+	gathered = comm.gather(arrays, root=0)
+
+	if comm.Get_rank() == 0:
+		# imported here, so that h5py is only required if checkpoints are used
+		import h5py
+
+		temp_path = path + '.tmp'
+		with h5py.File(temp_path, 'w') as file:
+			file.attrs['number_of_processes'] = comm.Get_size()
+			file.attrs['values'] = json.dumps(values)
+			for rank, rank_arrays in enumerate(gathered):
+				group = file.create_group('rank_' + str(rank))
+				for name, array in rank_arrays.items():
+					# empty datasets cannot be chunked, and thus not be compressed
+					group.create_dataset(name, data=array, compression=('gzip' if array.size > 0 else None))
+		os.replace(temp_path, path)
+
+	comm.barrier()
+
+
+
+def read_checkpoint(path, comm):
+	"""Reads a checkpoint file.
+
+	Parameters
+	----------
+	path : str
+		The path to the checkpoint file.
+	comm : mpi4py.MPI.Comm
+		The MPI communicator of the problem.
+
+	Returns
+	-------
+	arrays : dict
+		The arrays (numpy.ndarray) owned by the current process.
+	values : dict
+		The global values.
+	"""
+
+	if not h5py_is_available():
+		raise InputError('cashocs.OptimizationProblem.solve', 'restart_from', 'Restarts require h5py, which can be installed with pip install cashocs[checkpoint].')
+
+	number_of_processes = 0
+	gathered = None
+	values = None
+
+	if comm.Get_rank() == 0 and os.path.isfile(path):
+		import h5py
+
+		with h5py.File(path, 'r') as file:
+			number_of_processes = int(file.attrs['number_of_processes'])
+			if number_of_processes == comm.Get_size():
+				values = json.loads(file.attrs['values'])
+				gathered = [{name : dataset[()] for name, dataset in file['rank_' + str(rank)].items()} for rank in range(number_of_processes)]
+
+	number_of_processes = comm.bcast(number_of_processes, root=0)
+	if number_of_processes == 0:
+		raise InputError('cashocs.OptimizationProblem.solve', 'restart_from', 'The checkpoint file ' + path + ' does not exist.')
+	elif number_of_processes != comm.Get_size():
+		raise InputError('cashocs.OptimizationProblem.solve', 'restart_from', 'The checkpoint was written with ' + str(number_of_processes) +
+						 ' processes, but ' + str(comm.Get_size()) + ' are used for the restart.')
+
+	arrays = comm.scatter(gathered, root=0)
+	values = comm.bcast(values, root=0)
+
+	return arrays, values
@@ -20,3 +20,4 @@
 """
 
 from ._convert import convert
+from ._precompile import precompile
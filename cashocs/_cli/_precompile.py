@@ -0,0 +1,99 @@
+# Copyright (C) 2020 Sebastian Blauth
+#
+# This file is part of CASHOCS.
+#
+# CASHOCS is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# CASHOCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CASHOCS.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Ahead-of-time compilation of the forms of an optimization problem.
+
+"""
+
+import argparse
+import runpy
+import sys
+import time
+
+
+
+class _SolveIntercepted(Exception):
+	"""Raised to stop the user script at its first call of solve.
+
+	"""
+
+	pass
+
+
+
+def _generate_parser():
+	parser = argparse.ArgumentParser(description='Compile the forms of an optimization problem without solving it.')
+	parser.add_argument('script', type=str, help='Python script which defines the optimization problem and calls its solve method')
+	parser.add_argument('--algorithm', type=str, default=None, help='Optimization algorithm for which the forms are compiled, overwrites the one of the script')
+	parser.add_argument('args', nargs=argparse.REMAINDER, help='Command line arguments passed on to the script')
+
+	return parser
+
+
+
+def precompile(argv=None):
+	parser = _generate_parser()
+
+	args = parser.parse_args(argv)
+
+	from .._optimal_control.optimal_control_problem import OptimalControlProblem
+	from .._shape_optimization.shape_optimization_problem import ShapeOptimizationProblem
+	from ..geometry import MeshQuality
+
+	problem_classes = [OptimalControlProblem, ShapeOptimizationProblem]
+	solve_methods = [cls.solve for cls in problem_classes]
+	intercepted = []
+
+	def intercept_solve(self, algorithm=None, *solve_args, **solve_kwargs):
+		intercepted.append((self, algorithm))
+		raise _SolveIntercepted()
+
+	argv_backup = sys.argv
+	start_time = time.time()
+	try:
+		for cls in problem_classes:
+			cls.solve = intercept_solve
+		sys.argv = [args.script] + args.args
+		runpy.run_path(args.script, run_name='__main__')
+	except _SolveIntercepted:
+		pass
+	finally:
+		sys.argv = argv_backup
+		for cls, solve in zip(problem_classes, solve_methods):
+			cls.solve = solve
+	setup_time = time.time() - start_time
+
+	if len(intercepted) == 0:
+		print('Error: The script ' + args.script + ' does not solve an optimization problem.')
+		print('')
+		sys.exit(2)
+
+	problem, algorithm = intercepted[0]
+	if args.algorithm is not None:
+		algorithm = args.algorithm
+
+	timings = problem.precompile(algorithm)
+	if isinstance(problem, ShapeOptimizationProblem):
+		start_time = time.time()
+		MeshQuality.compile_extension()
+		timings['MeshQuality extension'] = time.time() - start_time
+
+	width = max([len(name) for name in timings.keys()] + [len('Problem setup')])
+	print('Problem setup'.ljust(width) + '  ' + format(setup_time, '.2f') + ' s')
+	for name, timing in timings.items():
+		print(name.ljust(width) + '  ' + format(timing, '.2f') + ' s')
+	print('Total'.ljust(width) + '  ' + format(setup_time + sum(timings.values()), '.2f') + ' s')
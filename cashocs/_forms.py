@@ -28,16 +28,52 @@ import warnings
 import fenics
 import numpy as np
 from petsc4py import PETSc
-from ufl import replace
+from ufl import Form, replace
 from ufl.algorithms import expand_derivatives
 from ufl.algorithms.estimate_degrees import estimate_total_polynomial_degree
+from ufl.corealg.traversal import unique_pre_traversal
+from ufl.geometry import GeometricQuantity
 
 from ._exceptions import ConfigError, InputError
+from ._timing import timer
 from ._shape_optimization import Regularization
 from .utils import (_assemble_petsc_system, _optimization_algorithm_configuration, _setup_petsc_options, _solve_linear_problem, create_bcs_list, summation)
 
 
 
+def _get_subdx(V, idx, ls):
+	"""Computes the indices of the sub space with given id.
+
+	Parameters
+	----------
+	V : dolfin.function.functionspace.FunctionSpace
+		The (root) function space.
+	idx : int
+		The id of the sub space which is searched for.
+	ls : list[int]
+		The indices of the sub spaces visited so far (used for the recursion).
+
+	Returns
+	-------
+	list[int] or None
+		The list of indices, such that ``V.sub(ls[0]).sub(ls[1])...`` is the sought
+		sub space, or ``None`` if no such sub space exists.
+	"""
+
+	if V.id()==idx:
+		return ls
+	if V.num_sub_spaces() > 1:
+		for i in range(V.num_sub_spaces()):
+			ans = _get_subdx(V.sub(i), idx, ls + [i])
+			if ans is not None:
+				return ans
+	else:
+		return None
+
+
+
+
+
 class Lagrangian:
 	r"""Implementation of a Lagrangian.
 
@@ -137,6 +173,7 @@ class FormHandler:
 			self.state_adjoint_equal_spaces = False
 
 		self.mesh = self.state_spaces[0].mesh()
+		self.comm = self.mesh.mpi_comm()
 		self.dx = fenics.Measure('dx', self.mesh)
 
 		self.trial_functions_state = [fenics.TrialFunction(V) for V in self.state_spaces]
@@ -146,6 +183,7 @@ class FormHandler:
 		self.test_functions_adjoint = [fenics.TestFunction(V) for V in self.adjoint_spaces]
 
 		self.state_is_linear = self.config.getboolean('StateSystem', 'is_linear', fallback = False)
+		self.state_lhs_is_constant = [False for i in range(self.state_dim)]
 		self.state_is_picard = self.config.getboolean('StateSystem', 'picard_iteration', fallback=False)
 		self.opt_algo = _optimization_algorithm_configuration(config)
 		
@@ -226,23 +264,12 @@ class FormHandler:
 			self.bcs_list_ad = [[fenics.DirichletBC(bc) for bc in self.bcs_list[i]] for i in range(self.state_dim)]
 			[[bc.homogenize() for bc in self.bcs_list_ad[i]] for i in range(self.state_dim)]
 		else:
-			def get_subdx(V, idx, ls):
-				if V.id()==idx:
-					return ls
-				if V.num_sub_spaces() > 1:
-					for i in range(V.num_sub_spaces()):
-						ans = get_subdx(V.sub(i), idx, ls + [i])
-						if ans is not None:
-							return ans
-				else:
-					return None
-
 			self.bcs_list_ad = [[1 for bc in range(len(self.bcs_list[i]))] for i in range(self.state_dim)]
 
 			for i in range(self.state_dim):
 				for j, bc in enumerate(self.bcs_list[i]):
 					idx = bc.function_space().id()
-					subdx = get_subdx(self.state_spaces[i], idx, ls=[])
+					subdx = _get_subdx(self.state_spaces[i], idx, ls=[])
 					W = self.adjoint_spaces[i]
 					for num in subdx:
 						W = W.sub(num)
@@ -327,7 +354,11 @@ class ControlFormHandler(FormHandler):
 		self.trial_functions_control = [fenics.TrialFunction(V) for V in self.control_spaces]
 		self.test_functions_control = [fenics.TestFunction(V) for V in self.control_spaces]
 
-		self.temp = [fenics.Function(V) for V in self.control_spaces]
+		# Check, whether the lhs of the (linear) state system depends on the controls or states
+		if self.state_is_linear:
+			variables = self.controls + self.states
+			self.state_lhs_is_constant = [not any(coeff in variables for coeff in self.state_eq_forms_lhs[i].coefficients())
+										  for i in range(self.state_dim)]
 
 		# Compute the necessary equations
 		self.__compute_gradient_equations()
@@ -385,6 +416,9 @@ class ControlFormHandler(FormHandler):
 	def compute_active_sets(self):
 		"""Computes the indices corresponding to active and inactive sets.
 
+		The indices are local, i.e., they refer to the part of the control
+		vectors which is owned by the current process.
+
 		Returns
 		-------
 		None
@@ -407,7 +441,33 @@ class ControlFormHandler(FormHandler):
 			temp_active = np.concatenate((self.idx_active_lower[j], self.idx_active_upper[j]))
 			temp_active.sort()
 			self.idx_active.append(temp_active)
-			self.idx_inactive.append(np.setdiff1d(np.arange(self.control_spaces[j].dim()), self.idx_active[j]))
+			self.idx_inactive.append(np.setdiff1d(np.arange(self.controls[j].vector().local_size()), self.idx_active[j]))
+
+
+
+	def __restrict_to_indices(self, a, b, indices):
+		"""Restricts a single function to the entries with the given (local) indices.
+
+		Parameters
+		----------
+		a : dolfin.function.function.Function
+			The function which is restricted.
+		b : dolfin.function.function.Function
+			The storage for the result (is overwritten), which is zero for all
+			other entries.
+		indices : numpy.ndarray
+			The local indices of the entries which are kept.
+
+		Returns
+		-------
+		None
+		"""
+
+		values = a.vector().get_local()
+		result = np.zeros(values.shape)
+		result[indices] = values[indices]
+		b.vector().set_local(result)
+		b.vector().apply('')
 
 
 
@@ -432,9 +492,7 @@ class ControlFormHandler(FormHandler):
 
 		for j in range(self.control_dim):
 			if self.require_control_constraints[j]:
-				self.temp[j].vector()[:] = 0.0
-				self.temp[j].vector()[self.idx_active[j]] = a[j].vector()[self.idx_active[j]]
-				b[j].vector()[:] = self.temp[j].vector()[:]
+				self.__restrict_to_indices(a[j], b[j], self.idx_active[j])
 
 			else:
 				b[j].vector()[:] = 0.0
@@ -447,9 +505,7 @@ class ControlFormHandler(FormHandler):
 
 		for j in range(self.control_dim):
 			if self.require_control_constraints[j]:
-				self.temp[j].vector()[:] = 0.0
-				self.temp[j].vector()[self.idx_active_lower[j]] = a[j].vector()[self.idx_active_lower[j]]
-				b[j].vector()[:] = self.temp[j].vector()[:]
+				self.__restrict_to_indices(a[j], b[j], self.idx_active_lower[j])
 
 			else:
 				b[j].vector()[:] = 0.0
@@ -462,9 +518,7 @@ class ControlFormHandler(FormHandler):
 
 		for j in range(self.control_dim):
 			if self.require_control_constraints[j]:
-				self.temp[j].vector()[:] = 0.0
-				self.temp[j].vector()[self.idx_active_upper[j]] = a[j].vector()[self.idx_active_upper[j]]
-				b[j].vector()[:] = self.temp[j].vector()[:]
+				self.__restrict_to_indices(a[j], b[j], self.idx_active_upper[j])
 
 			else:
 				b[j].vector()[:] = 0.0
@@ -494,9 +548,7 @@ class ControlFormHandler(FormHandler):
 
 		for j in range(self.control_dim):
 			if self.require_control_constraints[j]:
-				self.temp[j].vector()[:] = 0.0
-				self.temp[j].vector()[self.idx_inactive[j]] = a[j].vector()[self.idx_inactive[j]]
-				b[j].vector()[:] = self.temp[j].vector()[:]
+				self.__restrict_to_indices(a[j], b[j], self.idx_inactive[j])
 
 			else:
 				b[j].vector()[:] = a[j].vector()[:]
@@ -632,6 +684,149 @@ class ControlFormHandler(FormHandler):
 
 
 
+class TimeSteppingFormHandler(ControlFormHandler):
+	"""Class for UFL form manipulation for time-dependent optimal control problems.
+
+	The forms are derived for a single time step only, where the state at the
+	previous time step enters the state equation as a coefficient. The adjoint
+	equation of a time step is coupled to the subsequent time step, which is
+	taken into account by an additional right-hand side evaluated with the
+	quantities of the subsequent time step. The controls of all time steps
+	are the optimization variables, so that all control type objects are
+	given for each time step.
+
+	See Also
+	--------
+	ControlFormHandler : Derives adjoint and gradient equations for optimal control problems
+	"""
+
+	def __init__(self, lagrangian, bcs_list, states, states_prev, step_controls, controls, adjoints, time, time_step, time_points,
+				 config, riesz_scalar_products, control_constraints, ksp_options, adjoint_ksp_options, require_control_constraints):
+		"""Initializes the TimeSteppingFormHandler class.
+
+		Parameters
+		----------
+		lagrangian : cashocs._forms.Lagrangian
+			The lagrangian of a single time step.
+		bcs_list : list[list[dolfin.fem.dirichletbc.DirichletBC]]
+			The list of DirichletBCs for the state equation.
+		states : list[dolfin.function.function.Function]
+			The function that acts as the state variable of the current time step.
+		states_prev : list[dolfin.function.function.Function]
+			The function that acts as the state variable of the previous time step.
+		step_controls : list[dolfin.function.function.Function]
+			The function that acts as the control variable of the current time step.
+		controls : list[dolfin.function.function.Function]
+			The controls of all time steps, ordered by the time steps.
+		adjoints : list[dolfin.function.function.Function]
+			The function that acts as the adjoint variable of the current time step.
+		time : dolfin.function.constant.Constant or None
+			The constant representing the current time.
+		time_step : dolfin.function.constant.Constant or None
+			The constant representing the current time step size.
+		time_points : numpy.ndarray
+			The time points of the discretization, including the initial time.
+		config : configparser.ConfigParser
+			The configparser object of the config file.
+		riesz_scalar_products : list[ufl.form.Form]
+			The UFL forms of the scalar products for the controls of a single time step.
+		control_constraints : list[list[dolfin.function.function.Function]]
+			The control constraints for the controls of a single time step.
+		ksp_options : list[list[list[str]]]
+			The list of command line options for the KSP for the
+			state systems.
+		adjoint_ksp_options : list[list[list[str]]]
+			The list of command line options for the KSP for the
+			adjoint systems.
+		require_control_constraints : list[bool]
+			A list of boolean flags that indicates, whether the i-th control
+			of a time step has actual control constraints present.
+		"""
+
+		ControlFormHandler.__init__(self, lagrangian, bcs_list, states, step_controls, adjoints, config, riesz_scalar_products,
+									control_constraints, ksp_options, adjoint_ksp_options, require_control_constraints)
+
+		self.states_prev = states_prev
+		self.time = time
+		self.time_step = time_step
+		self.time_points = time_points
+		self.number_of_steps = len(self.time_points) - 1
+
+		self.step_controls = self.controls
+		self.step_control_dim = self.control_dim
+
+		# the lhs of a (linear) state system can additionally depend on the previous state and on the time
+		if self.state_is_linear:
+			variables = self.step_controls + self.states + self.states_prev
+			if self.time is not None:
+				variables.append(self.time)
+			if self.time_step is not None and not np.allclose(np.diff(self.time_points), self.time_points[1] - self.time_points[0]):
+				variables.append(self.time_step)
+			self.state_lhs_is_constant = [not any(coeff in variables for coeff in self.state_eq_forms_lhs[i].coefficients())
+										  for i in range(self.state_dim)]
+
+		self.__compute_adjoint_coupling()
+
+		# control type objects are given for each time step
+		self.controls = controls
+		self.control_dim = len(self.controls)
+		self.control_spaces = self.control_spaces*self.number_of_steps
+		self.control_constraints = self.control_constraints*self.number_of_steps
+		self.require_control_constraints = self.require_control_constraints*self.number_of_steps
+		self.scalar_products_matrices = self.scalar_products_matrices*self.number_of_steps
+		self.riesz_projection_matrices = self.riesz_projection_matrices*self.number_of_steps
+
+
+
+	def __compute_adjoint_coupling(self):
+		"""Adds the coupling to the subsequent time step to the adjoint equations.
+
+		The derivative of the Lagrangian of the subsequent time step w.r.t. the
+		previous state is evaluated with the functions ``states_next``, ``controls_next``,
+		``adjoints_next`` (and the corresponding time), which have to be updated
+		during the backward sweep, and is switched off with the constant
+		``adjoint_coupling`` for the last time step.
+
+		Returns
+		-------
+		None
+		"""
+
+		self.states_next = [fenics.Function(V) for V in self.state_spaces]
+		self.adjoints_next = [fenics.Function(V) for V in self.adjoint_spaces]
+		self.controls_next = [fenics.Function(V) for V in self.control_spaces]
+
+		mapping_dict = {}
+		for i in range(self.state_dim):
+			mapping_dict[self.states_prev[i]] = self.states[i]
+			mapping_dict[self.states[i]] = self.states_next[i]
+			mapping_dict[self.adjoints[i]] = self.adjoints_next[i]
+		for j in range(self.step_control_dim):
+			mapping_dict[self.step_controls[j]] = self.controls_next[j]
+
+		self.time_next = None
+		if self.time is not None:
+			self.time_next = fenics.Constant(0.0)
+			mapping_dict[self.time] = self.time_next
+		self.time_step_next = None
+		if self.time_step is not None:
+			self.time_step_next = fenics.Constant(0.0)
+			mapping_dict[self.time_step] = self.time_step_next
+
+		# the coupling vanishes for the last time step
+		self.adjoint_coupling = fenics.Constant(1.0)
+		self.adjoint_coupling_forms = [self.adjoint_coupling*replace(fenics.derivative(self.lagrangian.lagrangian_form, self.states_prev[i], self.test_functions_adjoint[i]), mapping_dict)
+									   for i in range(self.state_dim)]
+
+		for i in range(self.state_dim):
+			self.adjoint_eq_rhs[i] = self.adjoint_eq_rhs[i] - self.adjoint_coupling_forms[i]
+			if self.state_is_picard:
+				self.adjoint_picard_forms[i] = self.adjoint_picard_forms[i] + self.adjoint_coupling_forms[i]
+
+
+
+
+
 class ShapeFormHandler(FormHandler):
 	"""Derives adjoint equations and shape derivatives.
 
@@ -803,7 +998,7 @@ class ShapeFormHandler(FormHandler):
 
 		if self.config.getboolean('ShapeGradient', 'inhomogeneous', fallback = False):
 			self.volumes = fenics.project(fenics.CellVolume(self.mesh), self.DG0)
-			vol_max = np.max(np.abs(self.volumes.vector()[:]))
+			vol_max = self.volumes.vector().norm('linf')
 			self.volumes.vector()[:] /= vol_max
 
 		else:
@@ -875,7 +1070,7 @@ class ShapeFormHandler(FormHandler):
 		if self.inhomogeneous_mu:
 
 			A, b = _assemble_petsc_system(self.a_mu, self.L_mu, self.bcs_mu)
-			x = _solve_linear_problem(self.ksp_mu, A, b)
+			x = _solve_linear_problem(self.ksp_mu, A, b, role='shape_gradient')
 
 			if self.config.getboolean('ShapeGradient', 'use_sqrt_mu', fallback=False):
 				self.mu_lame.vector()[:] = np.sqrt(x[:])
@@ -900,8 +1095,9 @@ class ShapeFormHandler(FormHandler):
 
 		self.__compute_mu_elas()
 
-		self.assembler.assemble(self.fe_scalar_product_matrix)
-		self.fe_scalar_product_matrix.ident_zeros()
+		with timer.phase('assembly'):
+			self.assembler.assemble(self.fe_scalar_product_matrix)
+			self.fe_scalar_product_matrix.ident_zeros()
 		self.scalar_product_matrix = fenics.as_backend_type(self.fe_scalar_product_matrix).mat()
 
 
@@ -930,3 +1126,182 @@ class ShapeFormHandler(FormHandler):
 		result = temp.dot(y)
 
 		return result
+
+
+
+
+
+class MeshTransfer:
+	"""Transfers functions, forms, and boundary conditions to a new mesh.
+
+	This is used for remeshing without restarting the python interpreter.
+	Functions are interpolated (with extrapolation) onto the corresponding
+	function spaces on the new mesh, and the integrals of UFL forms are
+	rebuilt on the new mesh, where subdomain data is replaced by the
+	new subdomains and boundaries.
+
+	Notes
+	-----
+	Only coefficients of type :py:class:`fenics.Function` are transferred.
+	Expressions which are defined on the old mesh (via the ``domain``
+	keyword) are not supported.
+	"""
+
+	def __init__(self, new_mesh, subdomains, boundaries):
+		"""Initializes the mesh transfer.
+
+		Parameters
+		----------
+		new_mesh : dolfin.cpp.mesh.Mesh
+			The new (remeshed) mesh.
+		subdomains : dolfin.cpp.mesh.MeshFunctionSizet
+			The subdomains of the new mesh.
+		boundaries : dolfin.cpp.mesh.MeshFunctionSizet
+			The boundaries of the new mesh.
+		"""
+
+		self.mesh = new_mesh
+		self.domain = new_mesh.ufl_domain()
+		self.subdomains = subdomains
+		self.boundaries = boundaries
+		self.tdim = new_mesh.topology().dim()
+
+		self.space_map = {}
+		self.function_map = {}
+
+
+
+	def transfer_space(self, V):
+		"""Creates the function space on the new mesh corresponding to V.
+
+		Parameters
+		----------
+		V : dolfin.function.functionspace.FunctionSpace or ufl.functionspace.FunctionSpace
+			A function space on the old mesh.
+
+		Returns
+		-------
+		dolfin.function.functionspace.FunctionSpace
+			The same function space, defined on the new mesh.
+		"""
+
+		# the spaces are identified by their element, as ufl function spaces (e.g. of arguments) have no id
+		element = V.ufl_element()
+		if element not in self.space_map.keys():
+			self.space_map[element] = fenics.FunctionSpace(self.mesh, element)
+
+		return self.space_map[element]
+
+
+
+	def transfer_function(self, u):
+		"""Interpolates a function to the new mesh.
+
+		Parameters
+		----------
+		u : dolfin.function.function.Function
+			A function on the old mesh.
+
+		Returns
+		-------
+		dolfin.function.function.Function
+			The interpolation of u on the new mesh.
+		"""
+
+		if u.id() not in self.function_map.keys():
+			V = self.transfer_space(u.function_space())
+			u_new = fenics.Function(V)
+			if V.ufl_element().family() == 'Real':
+				u_new.vector()[:] = u.vector()[:]
+			else:
+				u.set_allow_extrapolation(True)
+				u_new.interpolate(u)
+			u_new.rename(u.name(), u.label())
+			self.function_map[u.id()] = u_new
+
+		return self.function_map[u.id()]
+
+
+
+	def transfer_form(self, form):
+		"""Transfers a UFL form to the new mesh.
+
+		Parameters
+		----------
+		form : ufl.form.Form
+			A UFL form defined on the old mesh.
+
+		Returns
+		-------
+		ufl.form.Form
+			The same form, defined on the new mesh.
+		"""
+
+		mapping = {}
+		for coeff in form.coefficients():
+			if isinstance(coeff, fenics.Function):
+				mapping[coeff] = self.transfer_function(coeff)
+		for arg in form.arguments():
+			mapping[arg] = fenics.Argument(self.transfer_space(arg.ufl_function_space()), arg.number(), arg.part())
+		for integral in form.integrals():
+			for node in unique_pre_traversal(integral.integrand()):
+				if isinstance(node, GeometricQuantity):
+					mapping[node] = type(node)(self.domain)
+
+		new_form = replace(form, mapping)
+
+		integrals = []
+		for integral in new_form.integrals():
+			subdomain_data = integral.subdomain_data()
+			if subdomain_data is not None:
+				if subdomain_data.dim() == self.tdim:
+					subdomain_data = self.subdomains
+				else:
+					subdomain_data = self.boundaries
+			integrals.append(integral.reconstruct(domain=self.domain, subdomain_data=subdomain_data))
+
+		return Form(integrals)
+
+
+
+	def transfer_bcs(self, bcs_list, state_spaces):
+		"""Transfers the Dirichlet boundary conditions to the new mesh.
+
+		Parameters
+		----------
+		bcs_list : list[list[dolfin.fem.dirichletbc.DirichletBC]]
+			The boundary conditions on the old mesh.
+		state_spaces : list[dolfin.function.functionspace.FunctionSpace]
+			The (root) function spaces of the state variables on the old mesh.
+
+		Returns
+		-------
+		list[list[dolfin.fem.dirichletbc.DirichletBC]]
+			The boundary conditions on the new mesh.
+		"""
+
+		new_bcs_list = []
+		for i in range(len(bcs_list)):
+			W_root = self.transfer_space(state_spaces[i])
+			new_bcs = []
+			for bc in bcs_list[i]:
+				W = W_root
+				for num in _get_subdx(state_spaces[i], bc.function_space().id(), ls=[]):
+					W = W.sub(num)
+
+				value = bc.value()
+				if isinstance(value, fenics.cpp.function.Function):
+					value = self.transfer_function(fenics.Function(value))
+
+				try:
+					if bc.domain_args[0].dim() == self.tdim:
+						domain = self.subdomains
+					else:
+						domain = self.boundaries
+					new_bcs.append(fenics.DirichletBC(W, value, domain, bc.domain_args[1], method=bc.method()))
+				except AttributeError:
+					new_bcs.append(fenics.DirichletBC(W, value, bc.sub_domain, method=bc.method()))
+
+			new_bcs_list.append(new_bcs)
+
+		return new_bcs_list
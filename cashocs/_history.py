@@ -0,0 +1,212 @@
+# Copyright (C) 2020 Sebastian Blauth
+#
+# This file is part of CASHOCS.
+#
+# CASHOCS is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# CASHOCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CASHOCS.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Streaming history of the optimization algorithms.
+
+The history is written as JSON Lines file, i.e., each line is a json object.
+There are three kinds of records: An iteration record (containing the key
+``iteration``) stores the values of one iteration, a rollback record (containing
+the key ``rollback``) discards the last iteration records (e.g. when an
+iteration is repeated after remeshing), and a final record (containing the key
+``final``) stores the statistics written at the end of the optimization.
+"""
+
+import atexit
+import json
+import queue
+import threading
+
+
+
+class HistoryWriter:
+	"""Appends the records of the history to a JSON Lines file.
+
+	The records are written and flushed by a background thread, so that the
+	optimization algorithm is not blocked by the file system.
+	"""
+
+	def __init__(self, path, append=False):
+		"""Initializes the writer and starts the background thread.
+
+		Parameters
+		----------
+		path : str
+			The path to the history file.
+		append : bool, optional
+			If this is ``True``, the records are appended to an existing file,
+			e.g., when the optimization is continued after remeshing. Otherwise,
+			the file is overwritten (default is ``False``).
+		"""
+
+		self.path = path
+		self.queue = queue.Queue()
+		self.file = open(path, 'a' if append else 'w')
+
+		self.thread = threading.Thread(target=self.__write_records, daemon=True)
+		self.thread.start()
+		atexit.register(self.close)
+
+
+
+	def __write_records(self):
+		"""Writes the queued records to the file, until the writer is closed.
+
+		Returns
+		-------
+		None
+		"""
+
+		while True:
+			records = [self.queue.get()]
+			# write all records which are already queued before flushing the file
+			while not self.queue.empty():
+				records.append(self.queue.get())
+
+			for record in records:
+				if record is None:
+					self.file.close()
+					return
+				self.file.write(json.dumps(record) + '\n')
+
+			self.file.flush()
+
+
+
+	def write(self, record):
+		"""Queues a record for writing.
+
+		Parameters
+		----------
+		record : dict
+			The record, which has to be serializable as json.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.thread.is_alive():
+			self.queue.put(record)
+
+
+
+	def close(self):
+		"""Writes all queued records and closes the file.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.thread.is_alive():
+			self.queue.put(None)
+			self.thread.join()
+		atexit.unregister(self.close)
+
+
+
+def _append(history, record):
+	"""Appends the values of an iteration record to the (nested) lists of the history.
+
+	Parameters
+	----------
+	history : dict
+		The history, which is modified.
+	record : dict
+		The values of the iteration.
+
+	Returns
+	-------
+	None
+	"""
+
+	for key, value in record.items():
+		if isinstance(value, dict):
+			_append(history.setdefault(key, {}), value)
+		else:
+			history.setdefault(key, []).append(value)
+
+
+
+def _remove_last(history):
+	"""Removes the last entries of the (nested) lists of the history.
+
+	Parameters
+	----------
+	history : dict
+		The history, which is modified.
+
+	Returns
+	-------
+	None
+	"""
+
+	for value in history.values():
+		if isinstance(value, dict):
+			_remove_last(value)
+		elif len(value) > 0:
+			value.pop()
+
+
+
+def load_history(path):
+	"""Reconstructs the history of an optimization from a streamed history file.
+
+	The result has the same format as the history saved to history.json at the end
+	of the optimization (see the ``save_results`` parameter of the config file). As
+	this can also be used for a running or aborted optimization, the final statistics
+	(e.g. the number of state solves) are only available if the optimization has finished.
+
+	Parameters
+	----------
+	path : str
+		The path to the history file (written if ``stream_history`` is ``True``
+		in the Output section of the config file).
+
+	Returns
+	-------
+	dict
+		The history of the optimization.
+
+	Examples
+	--------
+	The history of an optimization can be monitored (even from another process) with ::
+
+	    import cashocs
+
+	    history = cashocs.load_history('./history.jsonl')
+	    print(history['cost_function_value'])
+	"""
+
+	history = {}
+	with open(path, 'r') as file:
+		for line in file:
+			try:
+				record = json.loads(line)
+			except ValueError:
+				# the last line may be incomplete if the file is currently written
+				continue
+
+			if 'iteration' in record.keys():
+				_append(history, {key : value for key, value in record.items() if key != 'iteration'})
+			elif 'rollback' in record.keys():
+				for i in range(record['rollback']):
+					_remove_last(history)
+			elif 'final' in record.keys():
+				history.update(record['final'])
+
+	return history
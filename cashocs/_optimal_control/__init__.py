@@ -22,8 +22,8 @@ It includes the optimization problem, the solution algorithms and
 the line search needed for this.
 """
 
-from .cost_functional import ReducedCostFunctional
+from .cost_functional import ReducedCostFunctional, TimeSteppingReducedCostFunctional
 from .line_search import ArmijoLineSearch
 from .optimization_algorithm import OptimizationAlgorithm
 
-__all__ = ['ReducedCostFunctional', 'ArmijoLineSearch', 'OptimizationAlgorithm']
+__all__ = ['ReducedCostFunctional', 'TimeSteppingReducedCostFunctional', 'ArmijoLineSearch', 'OptimizationAlgorithm']
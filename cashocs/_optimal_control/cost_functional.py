@@ -21,6 +21,8 @@
 
 import fenics
 
+from .._timing import timer
+
 
 
 class ReducedCostFunctional:
@@ -61,4 +63,30 @@ class ReducedCostFunctional:
 
 		self.state_problem.solve()
 
-		return fenics.assemble(self.form_handler.cost_functional_form)
+		with timer.phase('assembly'):
+			return fenics.assemble(self.form_handler.cost_functional_form)
+
+
+
+
+
+class TimeSteppingReducedCostFunctional(ReducedCostFunctional):
+	"""The reduced cost functional for time-dependent optimal control problems
+
+	The cost functional is given by the sum of the cost functional of a single
+	time step over all time steps, which is accumulated during the solution of
+	the state system.
+	"""
+
+	def evaluate(self):
+		"""Evaluates the reduced cost functional.
+
+		Returns
+		-------
+		float
+			the value of the reduced cost functional
+		"""
+
+		self.state_problem.solve()
+
+		return self.state_problem.cost_value
@@ -22,7 +22,9 @@
 import fenics
 import numpy as np
 
-from ..utils import _optimization_algorithm_configuration
+from .._timing import timer
+from .._pde_problems.state_cache import compute_cache_key
+from ..utils import _global_max, _optimization_algorithm_configuration
 
 
 
@@ -59,6 +61,14 @@ class ArmijoLineSearch:
 		self.controls_temp = self.optimization_algorithm.controls_temp
 		self.gradients = self.optimization_algorithm.gradients
 
+		self.state_problem = self.optimization_algorithm.state_problem
+		self.adjoint_problem = self.optimization_algorithm.adjoint_problem
+		self.extrapolate = (self.state_problem.warm_start.strategy == 'extrapolate')
+		if self.extrapolate:
+			self.trial_step = [fenics.Function(V) for V in self.optimization_problem.control_spaces]
+			self.last_step = [fenics.Function(V) for V in self.optimization_problem.control_spaces]
+			self.last_step_norm_squared = 0.0
+
 		self.is_newton_like = (_optimization_algorithm_configuration(self.config) == 'lbfgs')
 		self.is_newton = _optimization_algorithm_configuration(self.config) in ['newton']
 		self.is_steepest_descent = (_optimization_algorithm_configuration(self.config) == 'gradient_descent')
@@ -83,6 +93,40 @@ class ArmijoLineSearch:
 
 
 
+	def update_cache_key(self):
+		"""Sets the key of the current controls for the cache of state solutions.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.state_problem.cache.is_active:
+			self.state_problem.cache_key = compute_cache_key([control.vector()[:] for control in self.controls], self.form_handler.comm)
+
+
+
+	def update_warm_start_ratio(self):
+		"""Updates the extrapolation ratio of the warm start for the current trial step.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.extrapolate:
+			for j in range(self.form_handler.control_dim):
+				self.trial_step[j].vector()[:] = self.controls[j].vector()[:] - self.controls_temp[j].vector()[:]
+
+			if self.last_step_norm_squared > 0.0:
+				ratio = self.form_handler.scalar_product(self.trial_step, self.last_step) / self.last_step_norm_squared
+			else:
+				ratio = 0.0
+			self.state_problem.warm_start.ratio = ratio
+			self.adjoint_problem.warm_start.ratio = ratio
+
+
+
 	def search(self, search_directions, has_curvature_info):
 		"""Does a line search with the Armijo rule.
 
@@ -102,8 +146,22 @@ class ArmijoLineSearch:
 		None
 		"""
 
-		self.search_direction_inf = np.max([np.max(np.abs(search_directions[i].vector()[:])) for i in range(len(self.gradients))])
+		with timer.phase('line_search'):
+			self.__search(search_directions, has_curvature_info)
+
+
+
+	def __search(self, search_directions, has_curvature_info):
+		"""Performs the line search, see :py:meth:`search`.
+
+		"""
+
+		self.search_direction_inf = _global_max(np.max([np.max(np.abs(search_directions[i].vector()[:]), initial=0.0) for i in range(len(self.gradients))]),
+												self.form_handler.comm)
+		self.update_cache_key()
 		self.optimization_algorithm.objective_value = self.cost_functional.evaluate()
+		self.state_problem.warm_start.store()
+		self.adjoint_problem.warm_start.store()
 
 		if has_curvature_info:
 			self.stepsize = 1.0
@@ -128,9 +186,11 @@ class ArmijoLineSearch:
 				break
 
 			for j in range(len(self.controls)):
-				self.controls[j].vector()[:] += self.stepsize*search_directions[j].vector()[:]
+				self.controls[j].vector().axpy(self.stepsize, search_directions[j].vector())
 
 			self.form_handler.project_to_admissible_set(self.controls)
+			self.update_warm_start_ratio()
+			self.update_cache_key()
 
 			self.optimization_algorithm.state_problem.has_solution = False
 			self.objective_step = self.cost_functional.evaluate()
@@ -148,9 +208,16 @@ class ArmijoLineSearch:
 				for i in range(len(self.controls)):
 					self.controls[i].vector()[:] = self.controls_temp[i].vector()[:]
 
+		self.state_problem.cache_key = None
+
 		if not self.optimization_algorithm.line_search_broken:
 			self.optimization_algorithm.stepsize = self.stepsize
 			self.optimization_algorithm.objective_value = self.objective_step
 
+			if self.extrapolate:
+				for j in range(self.form_handler.control_dim):
+					self.last_step[j].vector()[:] = self.trial_step[j].vector()[:]
+				self.last_step_norm_squared = self.form_handler.scalar_product(self.last_step, self.last_step)
+
 		if not has_curvature_info:
 			self.stepsize *= self.beta_armijo
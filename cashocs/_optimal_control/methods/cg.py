@@ -22,6 +22,7 @@
 import fenics
 import numpy as np
 
+from ..._checkpoint import load_functions, store_functions
 from ..._exceptions import ConfigError, NotConvergedError
 from ..._optimal_control import ArmijoLineSearch, OptimizationAlgorithm
 
@@ -81,6 +82,46 @@ class CG(OptimizationAlgorithm):
 
 
 
+	def _checkpoint_data(self):
+		"""Collects the data which is saved in a checkpoint, including the previous search direction.
+
+		Returns
+		-------
+		arrays : dict
+			The arrays owned by the current process.
+		values : dict
+			The global values.
+		"""
+
+		arrays, values = OptimizationAlgorithm._checkpoint_data(self)
+		store_functions(arrays, 'search_directions', self.search_directions)
+		values['memory'] = self.memory
+
+		return arrays, values
+
+
+
+	def _restore_checkpoint_data(self, arrays, values):
+		"""Restores the data saved in a checkpoint, including the previous search direction.
+
+		Parameters
+		----------
+		arrays : dict
+			The arrays owned by the current process.
+		values : dict
+			The global values.
+
+		Returns
+		-------
+		None
+		"""
+
+		OptimizationAlgorithm._restore_checkpoint_data(self, arrays, values)
+		load_functions(arrays, 'search_directions', self.search_directions)
+		self.memory = values['memory']
+
+
+
 	def run(self):
 		"""Performs the optimization via the nonlinear cg method
 
@@ -95,8 +136,10 @@ class CG(OptimizationAlgorithm):
 		self.state_problem.has_solution = False
 		for i in range(len(self.gradients)):
 			self.gradients[i].vector()[:] = 1.0
+		self.restore_checkpoint()
 
 		while True:
+			self.save_checkpoint()
 
 			for i in range(self.form_handler.control_dim):
 				self.gradients_prev[i].vector()[:] = self.gradients[i].vector()[:]
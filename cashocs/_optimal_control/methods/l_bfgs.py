@@ -19,13 +19,12 @@
 
 """
 
-from _collections import deque
-
 import fenics
 import numpy as np
 
-from ..._exceptions import NotConvergedError
+from ..._exceptions import InputError, NotConvergedError
 from ..._optimal_control import ArmijoLineSearch, OptimizationAlgorithm
+from ...utils import _global_sum, _lbfgs_compact_product
 
 
 
@@ -58,17 +57,86 @@ class LBFGS(OptimizationAlgorithm):
 		self.has_curvature_info = False
 
 		if self.bfgs_memory_size > 0:
-			self.history_s = deque()
-			self.history_y = deque()
-			self.history_rho = deque()
+			# the history only contains the entries owned by the current process
+			self.control_offsets = np.cumsum([0] + [u.vector().local_size() for u in self.controls])
+			size = self.control_offsets[-1]
+
+			# ring buffers for the history, the newest pair is stored at self.history_position - 1
+			self.history_s = np.zeros((self.bfgs_memory_size, size))
+			self.history_y = np.zeros((self.bfgs_memory_size, size))
+			self.history_sm = np.zeros((self.bfgs_memory_size, size))
+			self.history_ym = np.zeros((self.bfgs_memory_size, size))
+			self.history_curvature = np.zeros(self.bfgs_memory_size)
+			self.history_position = 0
+			self.history_length = 0
+
+			self.metric_vecs = [self.form_handler.scalar_products_matrices[j].getVecs()[0] for j in range(self.form_handler.control_dim)]
 			self.gradients_prev = [fenics.Function(V) for V in self.optimization_problem.control_spaces]
 			self.y_k = [fenics.Function(V) for V in self.optimization_problem.control_spaces]
 			self.s_k = [fenics.Function(V) for V in self.optimization_problem.control_spaces]
 
 
 
+	def _to_array(self, functions):
+		"""Concatenates the coefficients of control type functions.
+
+		Parameters
+		----------
+		functions : list[dolfin.function.function.Function]
+			the control type functions
+
+		Returns
+		-------
+		numpy.ndarray
+			the concatenated coefficient vectors
+		"""
+
+		return np.concatenate([functions[j].vector()[:] for j in range(len(self.controls))])
+
+
+
+	def _apply_metric(self, functions, out):
+		"""Applies the matrices of the scalar products to control type functions.
+
+		Parameters
+		----------
+		functions : list[dolfin.function.function.Function]
+			the control type functions
+		out : numpy.ndarray
+			the storage for the concatenated result (is overwritten)
+
+		Returns
+		-------
+		None
+		"""
+
+		for j in range(self.form_handler.control_dim):
+			x = fenics.as_backend_type(functions[j].vector()).vec()
+			self.form_handler.scalar_products_matrices[j].mult(x, self.metric_vecs[j])
+			out[self.control_offsets[j]:self.control_offsets[j + 1]] = self.metric_vecs[j].getArray()
+
+
+
+	def _inactive_mask(self):
+		"""Computes a boolean mask of the inactive set of the concatenated controls.
+
+		Returns
+		-------
+		numpy.ndarray
+			an array which is ``True`` on the inactive set and ``False`` on the active one
+		"""
+
+		mask = np.ones(self.control_offsets[-1], dtype=bool)
+		for j in range(self.form_handler.control_dim):
+			if self.form_handler.require_control_constraints[j]:
+				mask[self.control_offsets[j] + np.asarray(self.form_handler.idx_active[j], dtype=int)] = False
+
+		return mask
+
+
+
 	def compute_search_direction(self, grad):
-		"""Computes the search direction for the BFGS method with a double loop
+		"""Computes the search direction for the BFGS method with the compact representation
 
 		Parameters
 		----------
@@ -81,40 +149,26 @@ class LBFGS(OptimizationAlgorithm):
 			a function corresponding to the current / next search direction
 		"""
 
-		if self.bfgs_memory_size > 0 and len(self.history_s) > 0:
-			history_alpha = deque()
-			for j in range(len(self.controls)):
-				self.search_directions[j].vector()[:] = grad[j].vector()[:]
-
-			self.form_handler.restrict_to_inactive_set(self.search_directions, self.search_directions)
+		if self.bfgs_memory_size > 0 and self.history_length > 0:
+			idx = (self.history_position - self.history_length + np.arange(self.history_length)) % self.bfgs_memory_size
+			newest = idx[-1]
 
-			for i, _ in enumerate(self.history_s):
-				alpha = self.history_rho[i]*self.form_handler.scalar_product(self.history_s[i], self.search_directions)
-				history_alpha.append(alpha)
-				for j in range(len(self.controls)):
-					self.search_directions[j].vector()[:] -= alpha * self.history_y[i][j].vector()[:]
+			mask = self._inactive_mask()
+			g = self._to_array(grad)
 
 			if self.use_bfgs_scaling and self.iteration > 0:
-				factor = self.form_handler.scalar_product(self.history_y[0], self.history_s[0]) / self.form_handler.scalar_product(self.history_y[0], self.history_y[0])
+				products = _global_sum(np.array([self.history_ym[newest].dot(self.history_s[newest]), self.history_ym[newest].dot(self.history_y[newest])]),
+									   self.form_handler.comm)
+				factor = products[0] / products[1]
 			else:
 				factor = 1.0
 
-			for j in range(len(self.controls)):
-				self.search_directions[j].vector()[:] *= factor
+			direction = _lbfgs_compact_product(mask*g, self.history_s[idx], self.history_y[idx], self.history_sm[idx], self.history_ym[idx],
+											   self.history_curvature[idx], factor, mask, self.form_handler.comm)
+			direction = np.where(mask, direction, g)
 
-			self.form_handler.restrict_to_inactive_set(self.search_directions, self.search_directions)
-
-			for i, _ in enumerate(self.history_s):
-				beta = self.history_rho[-1 - i]*self.form_handler.scalar_product(self.history_y[-1 - i], self.search_directions)
-
-				for j in range(len(self.controls)):
-					self.search_directions[j].vector()[:] += self.history_s[-1 - i][j].vector()[:] * (history_alpha[-1 - i] - beta)
-
-			self.form_handler.restrict_to_inactive_set(self.search_directions, self.search_directions)
-			self.form_handler.restrict_to_active_set(self.gradients, self.temp)
 			for j in range(len(self.controls)):
-				self.search_directions[j].vector()[:] += self.temp[j].vector()[:]
-				self.search_directions[j].vector()[:] *= -1
+				self.search_directions[j].vector()[:] = -direction[self.control_offsets[j]:self.control_offsets[j + 1]]
 
 		else:
 			for j in range(len(self.controls)):
@@ -124,6 +178,63 @@ class LBFGS(OptimizationAlgorithm):
 
 
 
+	def _checkpoint_data(self):
+		"""Collects the data which is saved in a checkpoint, including the history of the method.
+
+		Returns
+		-------
+		arrays : dict
+			The arrays owned by the current process.
+		values : dict
+			The global values.
+		"""
+
+		arrays, values = OptimizationAlgorithm._checkpoint_data(self)
+		values['bfgs_memory_size'] = self.bfgs_memory_size
+		if self.bfgs_memory_size > 0:
+			arrays['history_s'] = self.history_s
+			arrays['history_y'] = self.history_y
+			arrays['history_sm'] = self.history_sm
+			arrays['history_ym'] = self.history_ym
+			values['history_curvature'] = self.history_curvature.tolist()
+			values['history_position'] = self.history_position
+			values['history_length'] = self.history_length
+
+		return arrays, values
+
+
+
+	def _restore_checkpoint_data(self, arrays, values):
+		"""Restores the data saved in a checkpoint, including the history of the method.
+
+		Parameters
+		----------
+		arrays : dict
+			The arrays owned by the current process.
+		values : dict
+			The global values.
+
+		Returns
+		-------
+		None
+		"""
+
+		if values['bfgs_memory_size'] != self.bfgs_memory_size:
+			raise InputError('cashocs.OptimalControlProblem.solve', 'restart_from',
+							 'The checkpoint was written with a different bfgs_memory_size.')
+
+		OptimizationAlgorithm._restore_checkpoint_data(self, arrays, values)
+		if self.bfgs_memory_size > 0:
+			self.history_s[:] = arrays['history_s']
+			self.history_y[:] = arrays['history_y']
+			self.history_sm[:] = arrays['history_sm']
+			self.history_ym[:] = arrays['history_ym']
+			self.history_curvature[:] = values['history_curvature']
+			self.history_position = values['history_position']
+			self.history_length = values['history_length']
+
+
+
 	def run(self):
 		"""Performs the optimization via the limited memory BFGS method
 
@@ -136,17 +247,19 @@ class LBFGS(OptimizationAlgorithm):
 		self.relative_norm = 1.0
 		self.state_problem.has_solution = False
 
-		self.adjoint_problem.has_solution = False
-		self.gradient_problem.has_solution = False
-		self.gradient_problem.solve()
-		self.gradient_norm = np.sqrt(self.optimization_problem._stationary_measure_squared())
-		self.gradient_norm_initial = self.gradient_norm
-		if self.gradient_norm_initial == 0:
-			self.converged = True
-			self.print_results()
+		if not self.restore_checkpoint():
+			self.adjoint_problem.has_solution = False
+			self.gradient_problem.has_solution = False
+			self.gradient_problem.solve()
+			self.gradient_norm = np.sqrt(self.optimization_problem._stationary_measure_squared())
+			self.gradient_norm_initial = self.gradient_norm
+			if self.gradient_norm_initial == 0:
+				self.converged = True
+				self.print_results()
 		self.form_handler.compute_active_sets()
 
 		while not self.converged:
+			self.save_checkpoint()
 			self.search_directions = self.compute_search_direction(self.gradients)
 
 			self.directional_derivative = self.form_handler.scalar_product(self.search_directions, self.gradients)
@@ -196,26 +309,22 @@ class LBFGS(OptimizationAlgorithm):
 				self.form_handler.restrict_to_inactive_set(self.storage_y, self.y_k)
 				self.form_handler.restrict_to_inactive_set(self.storage_s, self.s_k)
 
-				self.history_y.appendleft([x.copy(True) for x in self.y_k])
-				self.history_s.appendleft([x.copy(True) for x in self.s_k])
 				self.curvature_condition = self.form_handler.scalar_product(self.y_k, self.s_k)
 
-
 				if self.curvature_condition <= 1e-14:
 				# if self.curvature_condition <= 0.0:
 				# if self.curvature_condition / self.form_handler.scalar_product(self.s_k, self.s_k) < 1e-7 * self.gradient_problem.return_norm_squared():
 					self.has_curvature_info = False
-
-					self.history_s = deque()
-					self.history_y = deque()
-					self.history_rho = deque()
+					self.history_length = 0
 
 				else:
 					self.has_curvature_info = True
-					rho = 1/self.curvature_condition
-					self.history_rho.appendleft(rho)
-
-				if len(self.history_s) > self.bfgs_memory_size:
-					self.history_s.pop()
-					self.history_y.pop()
-					self.history_rho.pop()
+					position = self.history_position
+					self.history_s[position] = self._to_array(self.s_k)
+					self.history_y[position] = self._to_array(self.y_k)
+					self._apply_metric(self.s_k, self.history_sm[position])
+					self._apply_metric(self.y_k, self.history_ym[position])
+					self.history_curvature[position] = self.curvature_condition
+
+					self.history_position = (position + 1) % self.bfgs_memory_size
+					self.history_length = min(self.history_length + 1, self.bfgs_memory_size)
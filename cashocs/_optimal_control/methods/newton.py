@@ -64,8 +64,10 @@ class Newton(OptimizationAlgorithm):
 		self.iteration = 0
 		self.relative_norm = 1.0
 		self.state_problem.has_solution = False
+		self.restore_checkpoint()
 
 		while True:
+			self.save_checkpoint()
 			self.adjoint_problem.has_solution = False
 			self.gradient_problem.has_solution = False
 			self.gradient_problem.solve()
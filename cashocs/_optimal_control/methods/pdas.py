@@ -25,6 +25,7 @@ import numpy as np
 from .pdas_inner_solvers import InnerCG, InnerGradientDescent, InnerLBFGS, InnerNewton
 from ..._exceptions import ConfigError, NotConvergedError
 from ..._optimal_control import OptimizationAlgorithm
+from ...utils import _global_all
 
 
 
@@ -85,10 +86,11 @@ class PDAS(OptimizationAlgorithm):
 		self.idx_active = [np.concatenate((self.idx_active_lower[j], self.idx_active_upper[j])) for j in range(self.optimization_problem.control_dim)]
 		[self.idx_active[j].sort() for j in range(self.optimization_problem.control_dim)]
 
-		self.idx_inactive = [np.setdiff1d(np.arange(self.optimization_problem.control_spaces[j].dim()), self.idx_active[j]) for j in range(self.optimization_problem.control_dim)]
+		self.idx_inactive = [np.setdiff1d(np.arange(self.optimization_problem.controls[j].vector().local_size()), self.idx_active[j]) for j in range(self.optimization_problem.control_dim)]
 
 		if self.initialized:
-			if all([np.array_equal(self.idx_active_upper[j], self.idx_active_upper_prev[j]) and np.array_equal(self.idx_active_lower[j], self.idx_active_lower_prev[j]) for j in range(self.optimization_problem.control_dim)]):
+			if _global_all(all([np.array_equal(self.idx_active_upper[j], self.idx_active_upper_prev[j]) and np.array_equal(self.idx_active_lower[j], self.idx_active_lower_prev[j])
+								for j in range(self.optimization_problem.control_dim)]), self.form_handler.comm):
 				self.converged = True
 
 		self.idx_active_upper_prev = [self.idx_active_upper[j] for j in range(self.optimization_problem.control_dim)]
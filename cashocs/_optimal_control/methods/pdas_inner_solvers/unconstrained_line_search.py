@@ -21,6 +21,9 @@
 
 import numpy as np
 
+from ...._timing import timer
+from ....utils import _global_max
+
 
 
 class UnconstrainedLineSearch:
@@ -95,7 +98,18 @@ class UnconstrainedLineSearch:
 		None
 		"""
 
-		self.search_direction_inf = np.max([np.max(np.abs(search_directions[i].vector()[:])) for i in range(len(self.gradients))])
+		with timer.phase('line_search'):
+			self.__search(search_directions)
+
+
+
+	def __search(self, search_directions):
+		"""Performs the line search, see :py:meth:`search`.
+
+		"""
+
+		self.search_direction_inf = _global_max(np.max([np.max(np.abs(search_directions[i].vector()[:]), initial=0.0) for i in range(len(self.gradients))]),
+												self.form_handler.comm)
 		self.optimization_algorithm.objective_value = self.cost_functional.evaluate()
 
 		# self.optimization_algorithm.print_results()
@@ -116,7 +130,7 @@ class UnconstrainedLineSearch:
 				break
 
 			for j in range(len(self.controls)):
-				self.controls[j].vector()[:] += self.stepsize*search_directions[j].vector()[:]
+				self.controls[j].vector().axpy(self.stepsize, search_directions[j].vector())
 
 
 			self.optimization_algorithm.state_problem.has_solution = False
@@ -27,8 +27,8 @@ from .._exceptions import ConfigError, InputError
 from .._forms import ControlFormHandler, Lagrangian
 from .._optimal_control import ReducedCostFunctional
 from .._pde_problems import (AdjointProblem, GradientProblem, HessianProblem, StateProblem, UnconstrainedHessianProblem)
-from ..optimization_problem import OptimizationProblem
-from ..utils import _optimization_algorithm_configuration
+from ..optimization_problem import OptimizationProblem, _collect_forms
+from ..utils import _global_all, _optimization_algorithm_configuration
 
 
 
@@ -202,11 +202,12 @@ class OptimalControlProblem(OptimizationProblem):
 		### Check whether the control constraints are feasible, and whether they are actually present
 		self.require_control_constraints = [False for i in range(self.control_dim)]
 		for idx, pair in enumerate(self.control_constraints):
-			if not np.alltrue(pair[0].vector()[:] < pair[1].vector()[:]):
+			comm = self.controls[idx].function_space().mesh().mpi_comm()
+			if not _global_all(np.alltrue(pair[0].vector()[:] < pair[1].vector()[:]), comm):
 				raise InputError('cashocs._optimization.optimal_control_problem.OptimalControlProblem', 'control_constraints',
 								 'The lower bound must always be smaller than the upper bound for the control_constraints.')
 
-			if np.max(pair[0].vector()[:]) == float('-inf') and np.min(pair[1].vector()[:]) == float('inf'):
+			if _global_all(np.alltrue(pair[0].vector()[:] == float('-inf')) and np.alltrue(pair[1].vector()[:] == float('inf')), comm):
 				# no control constraint for this component
 				pass
 			else:
@@ -221,6 +222,18 @@ class OptimalControlProblem(OptimizationProblem):
 			raise InputError('cashocs._optimization.optimal_control_problem.OptimalControlProblem', 'control_constraints', 'Length of controls does not match')
 		### end overloading
 
+		self._initialize_pde_problems()
+
+
+
+	def _initialize_pde_problems(self):
+		"""Initializes the form handler and the PDE problems of the optimal control problem.
+
+		Returns
+		-------
+		None
+		"""
+
 		self.lagrangian = Lagrangian(self.state_forms, self.cost_functional_form)
 		self.form_handler = ControlFormHandler(self.lagrangian, self.bcs_list, self.states, self.controls, self.adjoints, self.config,
 											   self.riesz_scalar_products, self.control_constraints, self.ksp_options, self.adjoint_ksp_options,
@@ -274,7 +287,7 @@ class OptimalControlProblem(OptimizationProblem):
 		"""Resets the memory of the PDE problems so that new solutions are computed.
 
 		This sets the value of has_solution to False for all relevant PDE problems,
-		where memory is stored.
+		where memory is stored, and clears the cache of state solutions.
 
 		Returns
 		-------
@@ -284,10 +297,11 @@ class OptimalControlProblem(OptimizationProblem):
 		self.state_problem.has_solution = False
 		self.adjoint_problem.has_solution = False
 		self.gradient_problem.has_solution = False
+		self.state_problem.cache.clear()
 
 
 
-	def solve(self, algorithm=None, rtol=None, atol=None, max_iter=None):
+	def solve(self, algorithm=None, rtol=None, atol=None, max_iter=None, restart_from=None):
 		r"""Solves the optimization problem by the method specified in the config file.
 
 		Updates / overwrites states, controls, and adjoints according
@@ -321,6 +335,14 @@ class OptimalControlProblem(OptimizationProblem):
 			can carry out before it is terminated. Overwrites the value
 			specified in the config file. If this is ``None``, the value from
 			the config file is taken. Default is ``None``.
+		restart_from : str or None, optional
+			The path to a checkpoint file (see ``checkpoint_interval`` in the Output
+			section of the config file), from which the optimization is restarted.
+			The checkpoint has to be written by the same algorithm and with the same
+			number of processes. This is available for the gradient descent,
+			nonlinear CG, L-BFGS, and Newton methods.
+			If this is ``None``, the optimization starts from the current
+			controls. Default is ``None``.
 
 		Returns
 		-------
@@ -346,6 +368,10 @@ class OptimalControlProblem(OptimizationProblem):
 
 		self.algorithm = _optimization_algorithm_configuration(self.config, algorithm)
 
+		if restart_from is not None and self.algorithm == 'pdas':
+			raise InputError('cashocs.OptimalControlProblem.solve', 'restart_from', 'Restarts are not available for the primal dual active set method.')
+		self.restart_from = restart_from
+
 		if self.algorithm == 'newton' or \
 				(self.algorithm == 'pdas' and self.config.get('AlgoPDAS', 'inner_pdas') == 'newton'):
 			self.form_handler._ControlFormHandler__compute_newton_forms()
@@ -382,11 +408,36 @@ class OptimalControlProblem(OptimizationProblem):
 			raise ConfigError('OptimizationRoutine', 'algorithm', 'Not a valid input. Needs to be one '
 							  'of \'gradient_descent\' (\'gd\'), \'lbfgs\' (\'bfgs\'), \'conjugate_gradient\' (\'cg\'), \'newton\', or \'primal_dual_active_set\' (\'pdas\').')
 
+		self.state_problem.cache.clear()
 		self.solver.run()
 		self.solver.finalize()
 
 
 
+	def _forms_to_compile(self, algorithm=None):
+		"""Collects the forms which are needed for solving the problem.
+
+		Parameters
+		----------
+		algorithm : str or None, optional
+			The optimization algorithm, see :py:meth:`solve`.
+
+		Returns
+		-------
+		list[tuple[str, ufl.form.Form]]
+			The names and UFL forms of the problem.
+		"""
+
+		algorithm = _optimization_algorithm_configuration(self.config, algorithm)
+
+		if algorithm == 'newton' or \
+				(algorithm == 'pdas' and self.config.get('AlgoPDAS', 'inner_pdas') == 'newton'):
+			self.form_handler._ControlFormHandler__compute_newton_forms()
+
+		return _collect_forms(self.form_handler, 'form_handler') + OptimizationProblem._forms_to_compile(self, algorithm)
+
+
+
 	def compute_gradient(self):
 		"""Solves the Riesz problem to determine the gradient.
 
@@ -24,6 +24,13 @@ import json
 import fenics
 import numpy as np
 
+from .._checkpoint import h5py_is_available, load_functions, read_checkpoint, store_functions, write_checkpoint
+from .._exceptions import ConfigError, InputError
+from .._history import HistoryWriter
+from .._output import StateWriter
+from .._telemetry import telemetry
+from .._timing import timer
+
 
 
 class OptimizationAlgorithm:
@@ -88,6 +95,30 @@ class OptimizationAlgorithm:
 		self.maximum_iterations = self.config.getint('OptimizationRoutine', 'maximum_iterations', fallback=100)
 		self.soft_exit = self.config.getboolean('OptimizationRoutine', 'soft_exit', fallback=False)
 		self.save_pvd = self.config.getboolean('Output', 'save_pvd', fallback=False)
+		self.save_xdmf = self.config.getboolean('Output', 'save_xdmf', fallback=False)
+		self.output_stride = self.config.getint('Output', 'output_stride', fallback=1)
+		if self.output_stride < 1:
+			raise ConfigError('Output', 'output_stride', 'This has to be a positive integer.')
+		self.timings = self.config.getboolean('Output', 'timings', fallback=False)
+		self.ksp_telemetry = self.config.getboolean('Output', 'ksp_telemetry', fallback=False)
+		self.stream_history = self.config.getboolean('Output', 'stream_history', fallback=False)
+		self.checkpoint_interval = self.config.getint('Output', 'checkpoint_interval', fallback=0)
+		if self.checkpoint_interval < 0:
+			raise ConfigError('Output', 'checkpoint_interval', 'This has to be a non-negative integer.')
+		if self.checkpoint_interval > 0 and not h5py_is_available():
+			raise ConfigError('Output', 'checkpoint_interval', 'Checkpoints require h5py, which can be installed with pip install cashocs[checkpoint].')
+		self.checkpoint_file = self.config.get('Output', 'checkpoint_file', fallback='./checkpoint.h5')
+		self.checkpoint_iteration = 0
+		# in parallel, only the first process writes to the console and the history
+		self.is_root = (self.form_handler.comm.Get_rank() == 0)
+
+		if self.stream_history and self.is_root:
+			self.history_writer = HistoryWriter('./history.jsonl')
+		else:
+			self.history_writer = None
+
+		timer.reset(self.timings)
+		telemetry.reset(self.ksp_telemetry)
 
 
 
@@ -101,6 +132,9 @@ class OptimizationAlgorithm:
 				else:
 					self.state_pvd_list.append(fenics.File('./pvd/state_' + str(i) + '.pvd'))
 
+		if self.save_xdmf:
+			self.state_writer = StateWriter(self.form_handler.states, './xdmf')
+
 
 
 	def print_results(self):
@@ -129,8 +163,17 @@ class OptimizationAlgorithm:
 		self.output_dict['cost_function_value'].append(self.objective_value)
 		self.output_dict['gradient_norm'].append(self.relative_norm)
 		self.output_dict['stepsize'].append(self.stepsize)
+		timer.record()
+		telemetry.record()
 
-		if self.save_pvd:
+		if self.history_writer is not None:
+			record = {'iteration' : self.iteration, 'cost_function_value' : self.objective_value,
+					  'gradient_norm' : self.relative_norm, 'stepsize' : self.stepsize}
+			if self.timings:
+				record['timings'] = {name : values[-1] for name, values in timer.history.items()}
+			self.history_writer.write(record)
+
+		if self.save_pvd and self.iteration % self.output_stride == 0:
 			for i in range(self.form_handler.state_dim):
 				if self.form_handler.state_spaces[i].num_sub_spaces() > 0:
 					for j in range(self.form_handler.state_spaces[i].num_sub_spaces()):
@@ -138,7 +181,10 @@ class OptimizationAlgorithm:
 				else:
 					self.state_pvd_list[i] << self.form_handler.states[i], self.iteration
 
-		if self.verbose:
+		if self.save_xdmf and self.iteration % self.output_stride == 0:
+			self.state_writer.write(self.iteration)
+
+		if self.verbose and self.is_root:
 			print(output)
 
 
@@ -154,21 +200,152 @@ class OptimizationAlgorithm:
 		None
 		"""
 
-		if self.verbose:
+		if self.verbose and self.is_root:
 			print('')
 			print('Statistics --- Total iterations: ' + format(self.iteration, '4d') + ' --- Final objective value:  ' + format(self.objective_value, '.3e') +
 				  ' --- Final gradient norm:  ' + format(self.relative_norm, '.3e') + ' (rel)')
 			print('           --- State equations solved: ' + str(self.state_problem.number_of_solves) +
 				  ' --- Adjoint equations solved: ' + str(self.adjoint_problem.number_of_solves))
+			if self.state_problem.form_handler.state_is_picard:
+				print('           --- Picard sweeps (state): ' + str(self.state_problem.anderson.number_of_sweeps) +
+					  ' --- Picard sweeps (adjoint): ' + str(self.adjoint_problem.anderson.number_of_sweeps))
 			print('')
 
 		self.output_dict['state_solves'] = self.state_problem.number_of_solves
 		self.output_dict['adjoint_solves'] = self.adjoint_problem.number_of_solves
+		if self.state_problem.form_handler.state_is_picard:
+			self.output_dict['state_picard_sweeps'] = self.state_problem.anderson.number_of_sweeps
+			self.output_dict['adjoint_picard_sweeps'] = self.adjoint_problem.anderson.number_of_sweeps
 		self.output_dict['iterations'] = self.iteration
-		if self.save_results:
+		if self.timings:
+			self.output_dict['timings'] = timer.history
+			self.output_dict['timings_total'] = timer.summary()
+		if self.ksp_telemetry:
+			self.output_dict['ksp_telemetry'] = telemetry.summary()
+			self.output_dict['ksp_solves'] = telemetry.state()['records']
+		if self.save_results and self.is_root:
 			with open('./history.json', 'w') as file:
 				json.dump(self.output_dict, file)
 
+		if self.save_xdmf:
+			self.state_writer.close()
+
+		if self.history_writer is not None:
+			streamed_keys = ['cost_function_value', 'gradient_norm', 'stepsize', 'timings']
+			self.history_writer.write({'final' : {key : value for key, value in self.output_dict.items() if key not in streamed_keys}})
+			self.history_writer.close()
+
+
+
+	def _checkpoint_data(self):
+		"""Collects the data which is saved in a checkpoint.
+
+		This is extended by the specific optimization algorithms, e.g., by
+		the history of the L-BFGS method.
+
+		Returns
+		-------
+		arrays : dict
+			The arrays owned by the current process.
+		values : dict
+			The global values.
+		"""
+
+		arrays = dict()
+		store_functions(arrays, 'controls', self.controls)
+		store_functions(arrays, 'states', self.form_handler.states)
+		store_functions(arrays, 'adjoints', self.form_handler.adjoints)
+		store_functions(arrays, 'gradients', self.gradients)
+
+		values = {'algorithm' : type(self).__name__, 'iteration' : self.iteration, 'objective_value' : self.objective_value,
+				  'gradient_norm_initial' : self.gradient_norm_initial, 'relative_norm' : self.relative_norm,
+				  'stepsize' : self.stepsize, 'has_curvature_info' : self.has_curvature_info,
+				  'line_search_stepsize' : self.line_search.stepsize, 'armijo_stepsize_initial' : self.line_search.armijo_stepsize_initial,
+				  'state_solves' : self.state_problem.number_of_solves, 'adjoint_solves' : self.adjoint_problem.number_of_solves,
+				  'output_dict' : self.output_dict}
+
+		return arrays, values
+
+
+
+	def _restore_checkpoint_data(self, arrays, values):
+		"""Restores the data saved in a checkpoint.
+
+		Parameters
+		----------
+		arrays : dict
+			The arrays owned by the current process.
+		values : dict
+			The global values.
+
+		Returns
+		-------
+		None
+		"""
+
+		if values['algorithm'] != type(self).__name__:
+			raise InputError('cashocs.OptimalControlProblem.solve', 'restart_from',
+							 'The checkpoint was written by the algorithm ' + values['algorithm'] + ', but ' + type(self).__name__ + ' is used for the restart.')
+
+		load_functions(arrays, 'controls', self.controls)
+		load_functions(arrays, 'states', self.form_handler.states)
+		load_functions(arrays, 'adjoints', self.form_handler.adjoints)
+		load_functions(arrays, 'gradients', self.gradients)
+		# the states and adjoints are used as initial guesses for the next solves
+		self.state_problem.warm_start.store()
+		self.adjoint_problem.warm_start.store()
+
+		self.iteration = values['iteration']
+		self.objective_value = values['objective_value']
+		self.gradient_norm_initial = values['gradient_norm_initial']
+		self.relative_norm = values['relative_norm']
+		self.stepsize = values['stepsize']
+		self.has_curvature_info = values['has_curvature_info']
+		self.line_search.stepsize = values['line_search_stepsize']
+		self.line_search.armijo_stepsize_initial = values['armijo_stepsize_initial']
+		self.state_problem.number_of_solves = values['state_solves']
+		self.adjoint_problem.number_of_solves = values['adjoint_solves']
+		for key, value in values['output_dict'].items():
+			self.output_dict[key] = value
+
+
+
+	def save_checkpoint(self):
+		"""Saves a checkpoint, if one is due in the current iteration.
+
+		This is called at the beginning of each iteration of the optimization
+		algorithms, before the gradient is computed.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.checkpoint_interval > 0 and self.iteration > self.checkpoint_iteration and self.iteration % self.checkpoint_interval == 0:
+			arrays, values = self._checkpoint_data()
+			write_checkpoint(self.checkpoint_file, self.form_handler.comm, arrays, values)
+			self.checkpoint_iteration = self.iteration
+
+
+
+	def restore_checkpoint(self):
+		"""Restores the checkpoint specified by the ``restart_from`` argument of the solve call.
+
+		Returns
+		-------
+		bool
+			``True`` if a checkpoint was restored, ``False`` otherwise.
+		"""
+
+		if self.optimization_problem.restart_from is None:
+			return False
+
+		arrays, values = read_checkpoint(self.optimization_problem.restart_from, self.form_handler.comm)
+		self._restore_checkpoint_data(arrays, values)
+		self.checkpoint_iteration = self.iteration
+
+		return True
+
 
 
 	def run(self):
@@ -0,0 +1,358 @@
+# Copyright (C) 2020 Sebastian Blauth
+#
+# This file is part of CASHOCS.
+#
+# CASHOCS is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# CASHOCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CASHOCS.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Class representing an optimal control problem with a time-dependent state system.
+
+"""
+
+import fenics
+import numpy as np
+
+from .optimal_control_problem import OptimalControlProblem
+from .._exceptions import ConfigError, InputError
+from .._forms import Lagrangian, TimeSteppingFormHandler
+from .._optimal_control import TimeSteppingReducedCostFunctional
+from .._pde_problems import TimeSteppingAdjointProblem, TimeSteppingGradientProblem, TimeSteppingStateProblem
+from ..utils import _optimization_algorithm_configuration
+
+
+
+class TimeDependentOptimalControlProblem(OptimalControlProblem):
+	r"""Implements an optimal control problem with a time-dependent state system.
+
+	Instead of the full space-time system, only the weak form of a single time step
+	of the state system and the cost functional of a single time step have to be specified.
+	These are given in terms of the states, controls, and adjoints of the current time step,
+	and the states of the previous time step. For the time steps :math:`t_1, \dots, t_N`,
+	the state system reads
+
+	.. math:: e(y_k, y_{k-1}, u_k; t_k) = 0 \quad \text{ for } k = 1, \dots, N,
+
+	where :math:`y_0` is given by the initial condition, and the cost functional is given by
+
+	.. math:: J = \sum_{k=1}^N j(y_k, u_k; t_k).
+
+	Hence, the forms have to be compiled only once, and the state system is
+	solved by time stepping. The adjoint system is solved backwards in time, where
+	the states are recomputed from a number of checkpoints with a binomial
+	checkpointing schedule, which can be specified in the config file.
+
+	The optimization variables are the controls of all time steps, which are
+	available as ``controls``, where the controls of the time step :math:`t_k`
+	are given by ``controls[(k - 1)*m:k*m]`` for :math:`m` controls per time step.
+	"""
+
+	def __init__(self, state_forms, bcs_list, cost_functional_form, states, states_prev, controls, adjoints, time_points, config,
+				 initial_states=None, time=None, time_step=None, riesz_scalar_products=None, control_constraints=None,
+				 initial_guess=None, ksp_options=None, adjoint_ksp_options=None):
+		r"""This is used to generate all classes and functionalities. First ensures
+		consistent input, afterwards, the solution algorithm is initialized.
+
+		Parameters
+		----------
+		state_forms : ufl.form.Form or list[ufl.form.Form]
+			The weak form of the state equation for a single time step (user implemented).
+			Can be either a single UFL form, or a (ordered) list of UFL forms.
+		bcs_list : list[dolfin.fem.dirichletbc.DirichletBC] or list[list[dolfin.fem.dirichletbc.DirichletBC]] or dolfin.fem.dirichletbc.DirichletBC or None
+			The list of DirichletBC objects describing Dirichlet (essential) boundary conditions.
+			If this is ``None``, then no Dirichlet boundary conditions are imposed.
+		cost_functional_form : ufl.form.Form
+			UFL form of the cost functional of a single time step.
+		states : dolfin.function.function.Function or list[dolfin.function.function.Function]
+			The state variable(s) of the current time step, can either be a :py:class:`fenics.Function`, or a list of these.
+		states_prev : dolfin.function.function.Function or list[dolfin.function.function.Function]
+			The state variable(s) of the previous time step, can either be a :py:class:`fenics.Function`, or a list of these.
+		controls : dolfin.function.function.Function or list[dolfin.function.function.Function]
+			The control variable(s) of the current time step, can either be a :py:class:`fenics.Function`,
+			or a list of these. Their values are used as initial guess for the controls of all time steps.
+		adjoints : dolfin.function.function.Function or list[dolfin.function.function.Function]
+			The adjoint variable(s) of the current time step, can either be a :py:class:`fenics.Function`, or a (ordered) list of these.
+		time_points : list[float] or numpy.ndarray
+			The (strictly increasing) time points :math:`t_0, t_1, \dots, t_N`, where :math:`t_0` is
+			the initial time.
+		config : configparser.ConfigParser
+			The config file for the problem, generated via :py:func:`cashocs.create_config`.
+		initial_states : dolfin.function.function.Function or list[dolfin.function.function.Function] or None, optional
+			The initial conditions of the states. If this is ``None``, zero initial conditions
+			are used (default is ``None``).
+		time : dolfin.function.constant.Constant or None, optional
+			A constant which is set to the current time :math:`t_k` in each time step, and can
+			be used in the forms (default is ``None``).
+		time_step : dolfin.function.constant.Constant or None, optional
+			A constant which is set to the current time step size :math:`t_k - t_{k-1}` in each time
+			step, and can be used in the forms (default is ``None``).
+		riesz_scalar_products : None or ufl.form.Form or list[ufl.form.Form], optional
+			The scalar products of the control space of a single time step. Can either be None,
+			a single UFL form, or a (ordered) list of UFL forms. If ``None``, the :math:`L^2(\Omega)`
+			product is used (default is ``None``).
+		control_constraints : None or list[dolfin.function.function.Function] or list[float] or list[list[dolfin.function.function.Function]] or list[list[float]], optional
+			Box constraints posed on the controls of each time step, ``None`` means that there are none
+			(default is ``None``). The (inner) lists should contain two elements of the form ``[u_a, u_b]``,
+			where ``u_a`` is the lower, and ``u_b`` the upper bound.
+		initial_guess : list[dolfin.function.function.Function], optional
+			List of functions that act as initial guess for the state variables in each time step,
+			should be valid input for :py:func:`fenics.assign`. Defaults to ``None``, which means
+			that the state of the previous time step is used.
+		ksp_options : list[list[str]] or list[list[list[str]]] or None, optional
+			A list of strings corresponding to command line options for PETSc,
+			used to solve the state systems. If this is ``None``, then the direct solver
+			mumps is used (default is ``None``).
+		adjoint_ksp_options : list[list[str]] or list[list[list[str]]] or None
+			A list of strings corresponding to command line options for PETSc,
+			used to solve the adjoint systems. If this is ``None``, then the same options
+			as for the state systems are used (default is ``None``).
+
+		Notes
+		-----
+		Only the gradient based algorithms, i.e., gradient descent, nonlinear CG, and
+		L-BFGS methods, are available for time-dependent problems.
+
+		Examples
+		--------
+		Examples how to use this class can be found in the :ref:`tutorial <tutorial_index>`.
+		"""
+
+		### states_prev
+		try:
+			if type(states_prev) == list and len(states_prev) > 0:
+				for i in range(len(states_prev)):
+					if states_prev[i].__module__ == 'dolfin.function.function' and type(states_prev[i]).__name__ == 'Function':
+						pass
+					else:
+						raise InputError('cashocs._optimal_control.time_dependent_problem.TimeDependentOptimalControlProblem', 'states_prev', 'states_prev have to be fenics Functions.')
+
+				self.states_prev = states_prev
+
+			elif states_prev.__module__ == 'dolfin.function.function' and type(states_prev).__name__ == 'Function':
+				self.states_prev = [states_prev]
+			else:
+				raise InputError('cashocs._optimal_control.time_dependent_problem.TimeDependentOptimalControlProblem', 'states_prev', 'Type of states_prev is wrong.')
+		except:
+			raise InputError('cashocs._optimal_control.time_dependent_problem.TimeDependentOptimalControlProblem', 'states_prev', 'Type of states_prev is wrong.')
+
+		### time_points
+		try:
+			self.time_points = np.array(time_points, dtype=float).flatten()
+		except:
+			raise InputError('cashocs._optimal_control.time_dependent_problem.TimeDependentOptimalControlProblem', 'time_points', 'time_points have to be a list of floats.')
+		if len(self.time_points) < 2 or not np.all(np.diff(self.time_points) > 0.0):
+			raise InputError('cashocs._optimal_control.time_dependent_problem.TimeDependentOptimalControlProblem', 'time_points',
+							 'time_points have to contain at least two strictly increasing values.')
+
+		### time and time_step
+		for name, constant in [('time', time), ('time_step', time_step)]:
+			if constant is not None and not (constant.__module__ == 'dolfin.function.constant' and type(constant).__name__ == 'Constant'):
+				raise InputError('cashocs._optimal_control.time_dependent_problem.TimeDependentOptimalControlProblem', name, name + ' has to be a fenics Constant.')
+		self.time = time
+		self.time_step = time_step
+
+		### initial_states
+		if initial_states is None:
+			self.initial_states = [fenics.Function(y.function_space()) for y in self.states_prev]
+		else:
+			try:
+				if type(initial_states) == list:
+					self.initial_states = initial_states
+				elif initial_states.__module__ == 'dolfin.function.function' and type(initial_states).__name__ == 'Function':
+					self.initial_states = [initial_states]
+				else:
+					raise InputError('cashocs._optimal_control.time_dependent_problem.TimeDependentOptimalControlProblem', 'initial_states', 'initial_states have to be fenics Functions.')
+			except:
+				raise InputError('cashocs._optimal_control.time_dependent_problem.TimeDependentOptimalControlProblem', 'initial_states', 'initial_states have to be fenics Functions.')
+
+		if not len(self.initial_states) == len(self.states_prev):
+			raise InputError('cashocs._optimal_control.time_dependent_problem.TimeDependentOptimalControlProblem', 'initial_states', 'Length of states does not match')
+
+		OptimalControlProblem.__init__(self, state_forms, bcs_list, cost_functional_form, states, controls, adjoints, config,
+									   riesz_scalar_products, control_constraints, initial_guess, ksp_options, adjoint_ksp_options)
+
+
+
+	def _initialize_pde_problems(self):
+		"""Initializes the form handler and the time-dependent PDE problems.
+
+		Returns
+		-------
+		None
+		"""
+
+		if not len(self.states_prev) == self.state_dim:
+			raise InputError('cashocs._optimal_control.time_dependent_problem.TimeDependentOptimalControlProblem', 'states_prev', 'Length of states does not match')
+
+		self.number_of_steps = len(self.time_points) - 1
+		self.step_controls = self.controls
+		self.controls = []
+		for k in range(self.number_of_steps):
+			for u in self.step_controls:
+				control = fenics.Function(u.function_space())
+				control.vector()[:] = u.vector()[:]
+				self.controls.append(control)
+
+		self.lagrangian = Lagrangian(self.state_forms, self.cost_functional_form)
+		self.form_handler = TimeSteppingFormHandler(self.lagrangian, self.bcs_list, self.states, self.states_prev, self.step_controls, self.controls,
+													self.adjoints, self.time, self.time_step, self.time_points, self.config, self.riesz_scalar_products,
+													self.control_constraints, self.ksp_options, self.adjoint_ksp_options, self.require_control_constraints)
+
+		self.control_dim = self.form_handler.control_dim
+		self.control_constraints = self.form_handler.control_constraints
+		self.require_control_constraints = self.form_handler.require_control_constraints
+
+		self.state_spaces = self.form_handler.state_spaces
+		self.control_spaces = self.form_handler.control_spaces
+		self.adjoint_spaces = self.form_handler.adjoint_spaces
+
+		self.projected_difference = [fenics.Function(V) for V in self.control_spaces]
+
+		self.state_problem = TimeSteppingStateProblem(self.form_handler, self.initial_guess, self.initial_states)
+		self.adjoint_problem = TimeSteppingAdjointProblem(self.form_handler, self.state_problem)
+		self.gradient_problem = TimeSteppingGradientProblem(self.form_handler, self.state_problem, self.adjoint_problem)
+
+		self.algorithm = _optimization_algorithm_configuration(self.config)
+
+		self.reduced_cost_functional = TimeSteppingReducedCostFunctional(self.form_handler, self.state_problem)
+
+		self.gradients = self.gradient_problem.gradients
+		self.objective_value = 1.0
+
+
+
+	def __check_algorithm(self, algorithm=None):
+		"""Checks, whether the optimization algorithm can be used for time-dependent problems.
+
+		Parameters
+		----------
+		algorithm : str or None, optional
+			The optimization algorithm, see :py:meth:`solve`.
+
+		Returns
+		-------
+		None
+		"""
+
+		if _optimization_algorithm_configuration(self.config, algorithm) in ['newton', 'pdas']:
+			raise ConfigError('OptimizationRoutine', 'algorithm', 'Not a valid input for time-dependent problems. Needs to be one '
+							  'of \'gradient_descent\' (\'gd\'), \'lbfgs\' (\'bfgs\'), or \'conjugate_gradient\' (\'cg\').')
+
+
+
+	def __check_output(self):
+		"""Checks, whether the output of the states is disabled.
+
+		During the optimization, the states only hold the ones of the first time step, so
+		they cannot be saved as the solution. Instead, the states of all time steps
+		can be recomputed with :py:meth:`compute_states` after the optimization.
+
+		Returns
+		-------
+		None
+		"""
+
+		for key in ['save_pvd', 'save_xdmf']:
+			if self.config.getboolean('Output', key, fallback=False):
+				raise ConfigError('Output', key, 'The states cannot be saved for time-dependent problems, '
+								  'use compute_states after the optimization instead.')
+
+
+
+	def solve(self, algorithm=None, rtol=None, atol=None, max_iter=None, restart_from=None):
+		"""Solves the optimization problem by the method specified in the config file.
+
+		Updates / overwrites the controls of all time steps. After the solution, the
+		states and adjoints correspond to the first time step, the states of all time
+		steps can be recomputed with :py:meth:`compute_states`. Therefore, the
+		options ``save_pvd`` and ``save_xdmf`` of the section Output of the
+		config file are not available for time-dependent problems.
+
+		Parameters
+		----------
+		algorithm : str or None, optional
+			Selects the optimization algorithm. Valid choices are
+			``'gradient_descent'`` or ``'gd'`` for a gradient descent method,
+			``'conjugate_gradient'``, ``'nonlinear_cg'``, ``'ncg'`` or ``'cg'``
+			for nonlinear conjugate gradient methods, and ``'lbfgs'`` or ``'bfgs'`` for
+			limited memory BFGS methods. This overwrites the value specified in the
+			config file. If this is ``None``, then the value in the config file is used.
+			Default is ``None``.
+		rtol : float or None, optional
+			The relative tolerance used for the termination criterion, see
+			:py:meth:`OptimalControlProblem.solve <cashocs.OptimalControlProblem.solve>`.
+			Default is ``None``.
+		atol : float or None, optional
+			The absolute tolerance used for the termination criterion, see
+			:py:meth:`OptimalControlProblem.solve <cashocs.OptimalControlProblem.solve>`.
+			Default is ``None``.
+		max_iter : int or None, optional
+			The maximum number of iterations the optimization algorithm
+			can carry out before it is terminated. Default is ``None``.
+		restart_from : str or None, optional
+			The path to a checkpoint file from which the optimization is restarted, see
+			:py:meth:`OptimalControlProblem.solve <cashocs.OptimalControlProblem.solve>`.
+			The controls of all time steps are restored. Default is ``None``.
+
+		Returns
+		-------
+		None
+		"""
+
+		self.__check_algorithm(algorithm)
+		self.__check_output()
+		OptimalControlProblem.solve(self, algorithm, rtol, atol, max_iter, restart_from)
+
+
+
+	def _forms_to_compile(self, algorithm=None):
+		"""Collects the forms which are needed for solving the problem.
+
+		Parameters
+		----------
+		algorithm : str or None, optional
+			The optimization algorithm, see :py:meth:`solve`.
+
+		Returns
+		-------
+		list[tuple[str, ufl.form.Form]]
+			The names and UFL forms of the problem.
+		"""
+
+		self.__check_algorithm(algorithm)
+
+		return OptimalControlProblem._forms_to_compile(self, algorithm)
+
+
+
+	def compute_states(self, callback=None):
+		"""Solves the time-dependent state system for the current controls.
+
+		Parameters
+		----------
+		callback : function or None, optional
+			A function with signature ``callback(k, t)``, which is called after the
+			state system of the time step :math:`t_k` has been solved, so that the
+			states (and controls) of the time step can be post-processed,
+			e.g., saved to a file. If this is ``None``, only the states at the
+			final time are available after the call (default is ``None``).
+
+		Returns
+		-------
+		None
+		"""
+
+		self.state_problem.load(0)
+		for k in range(1, self.number_of_steps + 1):
+			self.state_problem.advance(k)
+			if callback is not None:
+				callback(k, self.time_points[k])
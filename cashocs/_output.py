@@ -0,0 +1,190 @@
+# Copyright (C) 2020 Sebastian Blauth
+#
+# This file is part of CASHOCS.
+#
+# CASHOCS is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# CASHOCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CASHOCS.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Output of the state variables as XDMF time series.
+
+"""
+
+import atexit
+import queue
+import threading
+
+import fenics
+
+
+
+class StateWriter:
+	"""Writes the state variables of each iteration to XDMF files.
+
+	For each state variable, one XDMF (and HDF5) file is written, which contains
+	all iterations as time series, where the mesh is only written once. The
+	coefficient vectors of the states are copied (as numpy arrays) to a bounded
+	queue, and written by a background thread, so that the optimization algorithm
+	only has to wait if the queue is full. The files and the functions used for
+	the output are only accessed by this thread, so that the HDF5 output is
+	serialized. In parallel, the states are written directly, as the output
+	requires collective communication.
+	"""
+
+	def __init__(self, states, directory, queue_size=2):
+		"""Initializes the writer.
+
+		Parameters
+		----------
+		states : list[dolfin.function.function.Function]
+			The state variables.
+		directory : str
+			The directory in which the files are saved.
+		queue_size : int, optional
+			The maximum number of iterations which are queued for writing (default is 2).
+		"""
+
+		self.states = states
+		self.comm = self.states[0].function_space().mesh().mpi_comm()
+
+		self.files = []
+		# the functions which are written, for mixed spaces one for each (collapsed) sub space
+		self.buffers = []
+		for i, state in enumerate(self.states):
+			file = fenics.XDMFFile(self.comm, directory + '/state_' + str(i) + '.xdmf')
+			file.parameters['rewrite_function_mesh'] = False
+			file.parameters['functions_share_mesh'] = True
+			file.parameters['flush_output'] = True
+			self.files.append(file)
+
+			no_sub_spaces = state.function_space().num_sub_spaces()
+			if no_sub_spaces > 0:
+				buffers = [fenics.Function(state.sub(j, True).function_space()) for j in range(no_sub_spaces)]
+				for j in range(no_sub_spaces):
+					buffers[j].rename('state_' + str(i) + '_' + str(j), 'state_' + str(i) + '_' + str(j))
+			else:
+				buffers = [fenics.Function(state.function_space())]
+				buffers[0].rename('state_' + str(i), 'state_' + str(i))
+			self.buffers.append(buffers)
+
+		self.is_asynchronous = (self.comm.Get_size() == 1)
+		if self.is_asynchronous:
+			self.queue = queue.Queue(maxsize=queue_size)
+			self.thread = threading.Thread(target=self.__write_snapshots, daemon=True)
+			self.thread.start()
+			atexit.register(self.close)
+
+		self.is_closed = False
+
+
+
+	def __snapshot(self):
+		"""Copies the coefficients of the current states.
+
+		Returns
+		-------
+		list[list[numpy.ndarray]]
+			The local coefficients of the states, split into the sub spaces.
+		"""
+
+		arrays = []
+		for state in self.states:
+			no_sub_spaces = state.function_space().num_sub_spaces()
+			if no_sub_spaces > 0:
+				arrays.append([state.sub(j, True).vector().get_local() for j in range(no_sub_spaces)])
+			else:
+				arrays.append([state.vector().get_local()])
+
+		return arrays
+
+
+
+	def __write_snapshots(self):
+		"""Writes the queued states, until the writer is closed.
+
+		Returns
+		-------
+		None
+		"""
+
+		while True:
+			snapshot = self.queue.get()
+			if snapshot is None:
+				return
+			self.__write(*snapshot)
+
+
+
+	def __write(self, arrays, iteration):
+		"""Writes the states of an iteration to the files.
+
+		Parameters
+		----------
+		arrays : list[list[numpy.ndarray]]
+			The coefficients of the states, see :py:meth:`__snapshot`.
+		iteration : int
+			The iteration, which is used as time for the time series.
+
+		Returns
+		-------
+		None
+		"""
+
+		for i in range(len(self.states)):
+			for buffer, array in zip(self.buffers[i], arrays[i]):
+				buffer.vector().set_local(array)
+				buffer.vector().apply('')
+				self.files[i].write(buffer, float(iteration))
+
+
+
+	def write(self, iteration):
+		"""Saves the current states.
+
+		Parameters
+		----------
+		iteration : int
+			The current iteration of the optimization algorithm.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.is_closed:
+			return
+
+		arrays = self.__snapshot()
+		if self.is_asynchronous:
+			self.queue.put((arrays, iteration))
+		else:
+			self.__write(arrays, iteration)
+
+
+
+	def close(self):
+		"""Writes all queued states and closes the files.
+
+		Returns
+		-------
+		None
+		"""
+
+		if not self.is_closed:
+			self.is_closed = True
+			if self.is_asynchronous:
+				self.queue.put(None)
+				self.thread.join()
+				atexit.unregister(self.close)
+
+			for file in self.files:
+				file.close()
@@ -24,8 +24,10 @@ from .gradient_problem import GradientProblem
 from .hessian_problems import HessianProblem, UnconstrainedHessianProblem
 from .shape_gradient_problem import ShapeGradientProblem
 from .state_problem import StateProblem
+from .time_stepping import TimeSteppingAdjointProblem, TimeSteppingGradientProblem, TimeSteppingStateProblem
 
 
 
 __all__ = ['AdjointProblem', 'GradientProblem', 'HessianProblem',
-		   'ShapeGradientProblem', 'StateProblem', 'UnconstrainedHessianProblem']
+		   'ShapeGradientProblem', 'StateProblem', 'TimeSteppingAdjointProblem', 'TimeSteppingGradientProblem',
+		   'TimeSteppingStateProblem', 'UnconstrainedHessianProblem']
@@ -24,10 +24,18 @@ import numpy as np
 from petsc4py import PETSc
 
 from .._exceptions import NotConvergedError
+from .._timing import timer
+from .anderson import AndersonAcceleration
+from .warm_start import WarmStart
 from ..utils import _assemble_petsc_system, _setup_petsc_options, _solve_linear_problem
 
 
 
+# preconditioners which can be applied to the transposed operator
+_transpose_pc_types = ['lu', 'ilu', 'jacobi', 'none']
+
+
+
 class AdjointProblem:
 	"""The adjoint problem.
 
@@ -59,10 +67,27 @@ class AdjointProblem:
 		self.atol = self.config.getfloat('StateSystem', 'picard_atol', fallback=1e-12)
 		self.maxiter = self.config.getint('StateSystem', 'picard_iter', fallback=50)
 		self.picard_verbose = self.config.getboolean('StateSystem', 'picard_verbose', fallback=False)
+		self.picard_anderson_depth = self.config.getint('StateSystem', 'picard_anderson_depth', fallback=0)
+
+		self.anderson = AndersonAcceleration(self.adjoints, self.picard_anderson_depth if self.form_handler.state_is_picard else 0)
 
 		self.ksps = [PETSc.KSP().create() for i in range(self.form_handler.state_dim)]
 		_setup_petsc_options(self.ksps, self.form_handler.adjoint_ksp_options)
 
+		self.warm_start = WarmStart(self.adjoints, self.config.get('StateSystem', 'warm_start', fallback='none'))
+		if self.warm_start.is_active:
+			for ksp in self.ksps:
+				if not ksp.getType() == 'preonly':
+					ksp.setInitialGuessNonzero(True)
+
+		# the adjoint operator of a linear state system is the transpose of the state operator,
+		# so its (cached) matrix and factorization can be reused
+		self.reuse_state_lhs = [self.state_problem.lhs_is_constant[i] and self.form_handler.state_adjoint_equal_spaces
+								and self.form_handler.adjoint_ksp_options[i] == self.form_handler.state_ksp_options[i]
+								for i in range(self.form_handler.state_dim)]
+		self.state_lhs_is_symmetric = [None for i in range(self.form_handler.state_dim)]
+		self.rhs_vectors = [fenics.PETScVector() for i in range(self.form_handler.state_dim)]
+
 		try:
 			self.number_of_solves = self.temp_dict['output_dict'].get('adjoint_solves', 0)
 		except TypeError:
@@ -83,16 +108,19 @@ class AdjointProblem:
 		self.state_problem.solve()
 
 		if not self.has_solution:
+			self.warm_start.apply()
+
 			if not self.form_handler.state_is_picard or self.form_handler.state_dim == 1:
 				for i in range(self.form_handler.state_dim):
-					A, b = _assemble_petsc_system(self.form_handler.adjoint_eq_lhs[-1 - i], self.form_handler.adjoint_eq_rhs[-1 - i], self.bcs_list_ad[-1 - i])
-					_solve_linear_problem(self.ksps[-1 - i], A, b, self.adjoints[-1 - i].vector().vec())
+					self.__solve_adjoint_equation(self.form_handler.state_dim - 1 - i)
 
 			else:
+				self.anderson.reset()
 				for i in range(self.maxiter + 1):
 					res = 0.0
 					for j in range(self.form_handler.state_dim):
-						res_j = fenics.assemble(self.form_handler.adjoint_picard_forms[j])
+						with timer.phase('assembly'):
+							res_j = fenics.assemble(self.form_handler.adjoint_picard_forms[j])
 						[bc.apply(res_j) for bc in self.form_handler.bcs_list_ad[j]]
 						res += pow(res_j.norm('l2'), 2)
 
@@ -113,9 +141,10 @@ class AdjointProblem:
 					if i==self.maxiter:
 						raise NotConvergedError('Picard iteration for the adjoint system')
 
+					self.anderson.start_sweep()
 					for j in range(self.form_handler.state_dim):
-						A, b = _assemble_petsc_system(self.form_handler.adjoint_eq_lhs[-1 - j], self.form_handler.adjoint_eq_rhs[-1 - j], self.bcs_list_ad[-1 - j])
-						_solve_linear_problem(self.ksps[-1 - j], A, b, self.adjoints[-1 - j].vector().vec())
+						self.__solve_adjoint_equation(self.form_handler.state_dim - 1 - j)
+					self.anderson.accelerate()
 
 			if self.picard_verbose and self.form_handler.state_is_picard:
 				print('')
@@ -123,3 +152,42 @@ class AdjointProblem:
 			self.number_of_solves += 1
 
 		return self.adjoints
+
+
+
+	def __solve_adjoint_equation(self, i):
+		"""Solves the i-th adjoint equation.
+
+		In case the state system is linear and its left-hand side is only assembled
+		once, the adjoint system is solved with the matrix and factorization of the
+		state system. For symmetric matrices, this is a usual solve, otherwise,
+		the transposed system is solved, provided that the preconditioner supports
+		this. Otherwise, the adjoint operator is assembled.
+
+		Parameters
+		----------
+		i : int
+			The index of the adjoint equation.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.reuse_state_lhs[i] and self.state_problem.state_matrices[i] is not None and self.state_lhs_is_symmetric[i] is None:
+			A = self.state_problem.state_matrices[i]
+			self.state_lhs_is_symmetric[i] = A.isSymmetric() or A.isSymmetric(1e-12)
+			# many preconditioners (e.g. hypre) cannot be applied transposed, then the adjoint operator is assembled
+			if not self.state_lhs_is_symmetric[i] and self.state_problem.ksps[i].getPC().getType() not in _transpose_pc_types:
+				self.reuse_state_lhs[i] = False
+
+		if self.reuse_state_lhs[i] and self.state_problem.state_matrices[i] is not None:
+			with timer.phase('assembly'):
+				fenics.assemble(self.form_handler.adjoint_eq_rhs[i], tensor=self.rhs_vectors[i])
+			[bc.apply(self.rhs_vectors[i]) for bc in self.bcs_list_ad[i]]
+			b = fenics.as_backend_type(self.rhs_vectors[i]).vec()
+			_solve_linear_problem(self.state_problem.ksps[i], None, b, self.adjoints[i].vector().vec(), transpose=not self.state_lhs_is_symmetric[i], role='adjoint')
+
+		else:
+			A, b = _assemble_petsc_system(self.form_handler.adjoint_eq_lhs[i], self.form_handler.adjoint_eq_rhs[i], self.bcs_list_ad[i])
+			_solve_linear_problem(self.ksps[i], A, b, self.adjoints[i].vector().vec(), role='adjoint')
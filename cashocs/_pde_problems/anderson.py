@@ -0,0 +1,157 @@
+# Copyright (C) 2020 Sebastian Blauth
+#
+# This file is part of CASHOCS.
+#
+# CASHOCS is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# CASHOCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CASHOCS.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Anderson acceleration for Picard iterations.
+
+"""
+
+import numpy as np
+
+from .._exceptions import ConfigError
+from ..utils import _global_sum
+
+
+
+class AndersonAcceleration:
+	r"""Anderson acceleration of a fixed point iteration.
+
+	For a fixed point iteration :math:`x_{k+1} = G(x_k)`, which is a single sweep
+	of the Picard iteration here, the accelerated iterate is given by
+
+	.. math:: x_{k+1} = G(x_k) - \sum_{i=1}^{m_k} \gamma_i \left( G(x_{k-m_k+i}) - G(x_{k-m_k+i-1}) \right),
+
+	where the coefficients :math:`\gamma` minimize the linear combination of the
+	corresponding differences of the residuals :math:`f_k = G(x_k) - x_k` in a
+	least squares sense, and :math:`m_k` is bounded by the depth. The differences
+	are stored in contiguous arrays, which are used as ring buffers. A depth of
+	``0`` corresponds to the plain Picard iteration.
+	"""
+
+	def __init__(self, functions, depth=0):
+		"""Initializes the Anderson acceleration.
+
+		Parameters
+		----------
+		functions : list[dolfin.function.function.Function]
+			The functions (e.g. states or adjoints) which are computed by the
+			Picard iteration.
+		depth : int, optional
+			The maximum number of previous iterates used (default is ``0``).
+		"""
+
+		if depth < 0:
+			raise ConfigError('StateSystem', 'picard_anderson_depth', 'Not a valid input. Needs to be non-negative.')
+
+		self.functions = functions
+		self.comm = self.functions[0].function_space().mesh().mpi_comm()
+		self.depth = depth
+		self.is_active = (self.depth > 0)
+
+		self.number_of_sweeps = 0
+
+		if self.is_active:
+			size = sum([u.vector().local_size() for u in self.functions])
+			self.residual_differences = np.zeros((self.depth, size))
+			self.iterate_differences = np.zeros((self.depth, size))
+			self.reset()
+
+
+
+	def reset(self):
+		"""Deletes the history, e.g., before a new Picard iteration is started.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.is_active:
+			self.position = 0
+			self.length = 0
+			self.residual_prev = None
+			self.iterate_prev = None
+			self.x = None
+
+
+
+	def __to_array(self):
+		"""Concatenates the coefficients of the functions.
+
+		Returns
+		-------
+		numpy.ndarray
+			The concatenated coefficient vectors.
+		"""
+
+		return np.concatenate([u.vector()[:] for u in self.functions])
+
+
+
+	def start_sweep(self):
+		"""Stores the current iterate before a sweep of the Picard iteration.
+
+		Returns
+		-------
+		None
+		"""
+
+		self.number_of_sweeps += 1
+		if self.is_active:
+			self.x = self.__to_array()
+
+
+
+	def accelerate(self):
+		"""Overwrites the result of the sweep with the accelerated iterate.
+
+		Returns
+		-------
+		None
+		"""
+
+		if not self.is_active:
+			return
+
+		g = self.__to_array()
+		f = g - self.x
+
+		if self.residual_prev is not None:
+			self.residual_differences[self.position] = f - self.residual_prev
+			self.iterate_differences[self.position] = g - self.iterate_prev
+			self.position = (self.position + 1) % self.depth
+			self.length = min(self.length + 1, self.depth)
+
+		self.residual_prev = f
+		self.iterate_prev = g
+
+		if self.length > 0:
+			idx = (self.position - self.length + np.arange(self.length)) % self.depth
+			differences = self.residual_differences[idx]
+			if self.comm.Get_size() > 1:
+				# the residuals are distributed, so the normal equations of the least squares problem are used
+				k = self.length
+				products = _global_sum(np.concatenate([(differences @ differences.T).ravel(), differences @ f]), self.comm)
+				gamma = np.linalg.lstsq(products[:k*k].reshape(k, k), products[k*k:], rcond=None)[0]
+			else:
+				gamma = np.linalg.lstsq(differences.T, f, rcond=None)[0]
+			x_new = g - self.iterate_differences[idx].T @ gamma
+
+			offset = 0
+			for u in self.functions:
+				size = u.vector().local_size()
+				u.vector()[:] = x_new[offset:offset + size]
+				offset += size
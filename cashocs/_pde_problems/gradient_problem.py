@@ -25,6 +25,7 @@ the gradient of the reduced cost functional.
 import fenics
 from petsc4py import PETSc
 
+from .._timing import timer
 from ..utils import _setup_petsc_options, _solve_linear_problem
 
 
@@ -55,7 +56,7 @@ class GradientProblem:
 		self.config = self.form_handler.config
 
 		# Initialize the PETSc Krylov solver for the Riesz projection problems
-		self.ksps = [PETSc.KSP().create() for i in range(self.form_handler.control_dim)]
+		self.ksps = [PETSc.KSP().create() for i in range(self._number_of_riesz_problems())]
 
 		# option = [
 		# 		['ksp_type', 'preonly'],
@@ -74,7 +75,7 @@ class GradientProblem:
 			['ksp_max_it', 100]
 		]
 		riesz_ksp_options = []
-		for i in range(self.form_handler.control_dim):
+		for i in range(len(self.ksps)):
 			riesz_ksp_options.append(option)
 
 		_setup_petsc_options(self.ksps, riesz_ksp_options)
@@ -85,6 +86,19 @@ class GradientProblem:
 
 
 
+	def _number_of_riesz_problems(self):
+		"""Returns the number of Riesz problems, each of which gets its own KSP object.
+
+		Returns
+		-------
+		int
+			The number of Riesz projection matrices.
+		"""
+
+		return self.form_handler.control_dim
+
+
+
 	def solve(self):
 		"""Solves the Riesz projection problem to obtain the gradient of the (reduced) cost functional.
 
@@ -98,9 +112,11 @@ class GradientProblem:
 		self.adjoint_problem.solve()
 
 		if not self.has_solution:
-			for i in range(self.form_handler.control_dim):
-				b = fenics.as_backend_type(fenics.assemble(self.form_handler.gradient_forms_rhs[i])).vec()
-				_solve_linear_problem(ksp=self.ksps[i], b=b, x=self.gradients[i].vector().vec())
+			with timer.phase('riesz'):
+				for i in range(self.form_handler.control_dim):
+					with timer.phase('assembly'):
+						b = fenics.as_backend_type(fenics.assemble(self.form_handler.gradient_forms_rhs[i])).vec()
+					_solve_linear_problem(ksp=self.ksps[i], b=b, x=self.gradients[i].vector().vec(), role='riesz')
 
 			self.has_solution = True
 
@@ -24,10 +24,13 @@ method.
 
 import fenics
 import numpy as np
+import scipy.linalg
 from petsc4py import PETSc
 
 from .._exceptions import ConfigError, NotConvergedError, CashocsException
-from ..utils import _assemble_petsc_system, _setup_petsc_options, _solve_linear_problem
+from .._timing import timer
+from .anderson import AndersonAcceleration
+from ..utils import _assemble_petsc_system, _global_sum, _setup_petsc_options, _solve_linear_problem, _solve_multiple_rhs
 
 
 
@@ -88,8 +91,21 @@ class BaseHessianProblem:
 		self.atol = self.config.getfloat('StateSystem', 'picard_atol', fallback=1e-12)
 		self.maxiter = self.config.getint('StateSystem', 'picard_iter', fallback=50)
 		self.picard_verbose = self.config.getboolean('StateSystem', 'picard_verbose', fallback=False)
+		self.picard_anderson_depth = self.config.getint('StateSystem', 'picard_anderson_depth', fallback=0)
+
+		anderson_depth = self.picard_anderson_depth if self.form_handler.state_is_picard else 0
+		self.state_anderson = AndersonAcceleration(self.form_handler.states_prime, anderson_depth)
+		self.adjoint_anderson = AndersonAcceleration(self.form_handler.adjoints_prime, anderson_depth)
 
 		self.no_sensitivity_solves = 0
+
+		# the sensitivity operators only depend on the state (and control), so that
+		# they (and their factorizations) are reused until the state changes
+		self.state_problem = self.gradient_problem.state_problem
+		self.operators_revision = None
+		self.sensitivity_matrices = [None for i in range(self.state_dim)]
+		self.adjoint_sensitivity_matrices = [None for i in range(self.state_dim)]
+
 		self.state_ksps = [PETSc.KSP().create() for i in range(self.form_handler.state_dim)]
 		_setup_petsc_options(self.state_ksps, self.form_handler.state_ksp_options)
 		self.adjoint_ksps = [PETSc.KSP().create() for i in range(self.form_handler.state_dim)]
@@ -117,6 +133,81 @@ class BaseHessianProblem:
 
 
 
+	def __update_operators(self):
+		"""Assembles the operators of the sensitivity equations, if the state has changed.
+
+		The operators are set for the KSP objects, so that their factorizations
+		(or preconditioners) are reused for all Hessian applications with the
+		same state.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.operators_revision != self.state_problem.revision:
+			for i in range(self.state_dim):
+				self.sensitivity_matrices[i], _ = _assemble_petsc_system(self.form_handler.sensitivity_eqs_lhs[i],
+																		 self.form_handler.sensitivity_eqs_rhs[i], self.form_handler.bcs_list_ad[i])
+				self.state_ksps[i].setOperators(self.sensitivity_matrices[i])
+
+				self.adjoint_sensitivity_matrices[i], _ = _assemble_petsc_system(self.form_handler.adjoint_sensitivity_eqs_lhs[i],
+																				 self.form_handler.w_1[i], self.form_handler.bcs_list_ad[i])
+				self.adjoint_ksps[i].setOperators(self.adjoint_sensitivity_matrices[i])
+
+			self.operators_revision = self.state_problem.revision
+
+
+
+	def __assemble_sensitivity_rhs(self, rhs_form, bcs):
+		"""Assembles the right-hand side of a sensitivity equation.
+
+		Parameters
+		----------
+		rhs_form : ufl.form.Form
+			The right-hand side of the sensitivity equation.
+		bcs : list[dolfin.fem.dirichletbc.DirichletBC]
+			The (homogeneous) Dirichlet boundary conditions.
+
+		Returns
+		-------
+		petsc4py.PETSc.Vec
+			The assembled right-hand side.
+		"""
+
+		# as the boundary conditions are homogeneous, this is consistent with a symmetric assembly
+		with timer.phase('assembly'):
+			b = fenics.as_backend_type(fenics.assemble(rhs_form))
+		for bc in bcs:
+			bc.apply(b)
+
+		return b.vec()
+
+
+
+	def __solve_sensitivity_equation(self, ksp, rhs_form, bcs, x):
+		"""Solves a sensitivity equation with the operator stored in the KSP object.
+
+		Parameters
+		----------
+		ksp : petsc4py.PETSc.KSP
+			The KSP object, whose operator is set by :py:meth:`__update_operators`.
+		rhs_form : ufl.form.Form
+			The right-hand side of the sensitivity equation.
+		bcs : list[dolfin.fem.dirichletbc.DirichletBC]
+			The (homogeneous) Dirichlet boundary conditions.
+		x : petsc4py.PETSc.Vec
+			The vector, into which the solution is written.
+
+		Returns
+		-------
+		None
+		"""
+
+		_solve_linear_problem(ksp, None, self.__assemble_sensitivity_rhs(rhs_form, bcs), x, role='hessian')
+
+
+
 	def hessian_application(self, h, out):
 		r"""Computes the application of the Hessian to some element
 
@@ -145,21 +236,23 @@ class BaseHessianProblem:
 		self.adjoints_prime = self.form_handler.adjoints_prime
 		self.bcs_list_ad = self.form_handler.bcs_list_ad
 
+		self.__update_operators()
+
 		if not self.form_handler.state_is_picard or self.form_handler.state_dim == 1:
 
 			for i in range(self.state_dim):
-				A, b = _assemble_petsc_system(self.form_handler.sensitivity_eqs_lhs[i], self.form_handler.sensitivity_eqs_rhs[i], self.bcs_list_ad[i])
-				_solve_linear_problem(self.state_ksps[i], A, b, self.states_prime[i].vector().vec())
+				self.__solve_sensitivity_equation(self.state_ksps[i], self.form_handler.sensitivity_eqs_rhs[i], self.bcs_list_ad[i], self.states_prime[i].vector().vec())
 
 			for i in range(self.state_dim):
-				A, b = _assemble_petsc_system(self.form_handler.adjoint_sensitivity_eqs_lhs[-1 - i], self.form_handler.w_1[-1 - i], self.bcs_list_ad[-1 - i])
-				_solve_linear_problem(self.adjoint_ksps[-1 - i], A, b, self.adjoints_prime[-1 - i].vector().vec())
+				self.__solve_sensitivity_equation(self.adjoint_ksps[-1 - i], self.form_handler.w_1[-1 - i], self.bcs_list_ad[-1 - i], self.adjoints_prime[-1 - i].vector().vec())
 
 		else:
+			self.state_anderson.reset()
 			for i in range(self.maxiter + 1):
 				res = 0.0
 				for j in range(self.form_handler.state_dim):
-					res_j = fenics.assemble(self.form_handler.sensitivity_eqs_picard[j])
+					with timer.phase('assembly'):
+						res_j = fenics.assemble(self.form_handler.sensitivity_eqs_picard[j])
 					[bc.apply(res_j) for bc in self.form_handler.bcs_list_ad[j]]
 					res += pow(res_j.norm('l2'), 2)
 
@@ -180,17 +273,20 @@ class BaseHessianProblem:
 				if i==self.maxiter:
 					raise NotConvergedError('Picard iteration for the computation of the state sensitivity', 'Maximum number of iterations were exceeded.')
 
+				self.state_anderson.start_sweep()
 				for j in range(self.form_handler.state_dim):
-					A, b = _assemble_petsc_system(self.form_handler.sensitivity_eqs_lhs[j], self.form_handler.sensitivity_eqs_rhs[j], self.bcs_list_ad[j])
-					_solve_linear_problem(self.state_ksps[j], A, b, self.states_prime[j].vector().vec())
+					self.__solve_sensitivity_equation(self.state_ksps[j], self.form_handler.sensitivity_eqs_rhs[j], self.bcs_list_ad[j], self.states_prime[j].vector().vec())
+				self.state_anderson.accelerate()
 
 			if self.picard_verbose:
 				print('')
 
+			self.adjoint_anderson.reset()
 			for i in range(self.maxiter + 1):
 				res = 0.0
 				for j in range(self.form_handler.state_dim):
-					res_j = fenics.assemble(self.form_handler.adjoint_sensitivity_eqs_picard[j])
+					with timer.phase('assembly'):
+						res_j = fenics.assemble(self.form_handler.adjoint_sensitivity_eqs_picard[j])
 					[bc.apply(res_j) for bc in self.form_handler.bcs_list_ad[j]]
 					res += pow(res_j.norm('l2'), 2)
 
@@ -211,22 +307,96 @@ class BaseHessianProblem:
 				if i==self.maxiter:
 					raise NotConvergedError('Picard iteration for the computation of the adjoint sensitivity', 'Maximum number of iterations were exceeded.')
 
+				self.adjoint_anderson.start_sweep()
 				for j in range(self.form_handler.state_dim):
-					A, b = _assemble_petsc_system(self.form_handler.adjoint_sensitivity_eqs_lhs[-1 - j], self.form_handler.w_1[-1 - j], self.bcs_list_ad[-1 - j])
-					_solve_linear_problem(self.adjoint_ksps[-1 - j], A, b, self.adjoints_prime[-1 - j].vector().vec())
+					self.__solve_sensitivity_equation(self.adjoint_ksps[-1 - j], self.form_handler.w_1[-1 - j], self.bcs_list_ad[-1 - j], self.adjoints_prime[-1 - j].vector().vec())
+				self.adjoint_anderson.accelerate()
 
 			if self.picard_verbose:
 				print('')
 
-		for i in range(self.control_dim):
-			b = fenics.as_backend_type(fenics.assemble(self.form_handler.hessian_rhs[i])).vec()
+		with timer.phase('riesz'):
+			for i in range(self.control_dim):
+				with timer.phase('assembly'):
+					b = fenics.as_backend_type(fenics.assemble(self.form_handler.hessian_rhs[i])).vec()
 
-			_solve_linear_problem(self.ksps[i], b=b, x=out[i].vector().vec())
+				_solve_linear_problem(self.ksps[i], b=b, x=out[i].vector().vec(), role='hessian')
 
 		self.no_sensitivity_solves += 2
 
 
 
+	def hessian_application_block(self, hs, outs):
+		r"""Computes the application of the Hessian to several directions at once.
+
+		This is equivalent to calling :py:meth:`hessian_application` for each
+		direction, but the sensitivity equations are solved for all directions
+		with a single (multiple right-hand side) solve, so that, e.g., a
+		factorization is used for all back substitutions at once.
+
+		Parameters
+		----------
+		hs : list[list[dolfin.function.function.Function]]
+			The directions to which the Hessian is applied.
+		outs : list[list[dolfin.function.function.Function]]
+			The lists of functions into which the results are saved.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.form_handler.state_is_picard and self.form_handler.state_dim > 1:
+			for h, out in zip(hs, outs):
+				self.hessian_application(h, out)
+			return
+
+		self.states_prime = self.form_handler.states_prime
+		self.adjoints_prime = self.form_handler.adjoints_prime
+		self.bcs_list_ad = self.form_handler.bcs_list_ad
+
+		self.__update_operators()
+
+		no_directions = len(hs)
+		state_blocks = [np.zeros((no_directions, self.states_prime[i].vector().local_size())) for i in range(self.state_dim)]
+		adjoint_blocks = [np.zeros((no_directions, self.adjoints_prime[i].vector().local_size())) for i in range(self.state_dim)]
+
+		def set_direction(k):
+			for j in range(self.control_dim):
+				self.test_directions[j].vector()[:] = hs[k][j].vector()[:]
+			for j in range(self.state_dim):
+				self.states_prime[j].vector()[:] = state_blocks[j][k]
+				self.adjoints_prime[j].vector()[:] = adjoint_blocks[j][k]
+
+		for i in range(self.state_dim):
+			rhs = []
+			for k in range(no_directions):
+				set_direction(k)
+				rhs.append(self.__assemble_sensitivity_rhs(self.form_handler.sensitivity_eqs_rhs[i], self.bcs_list_ad[i]))
+			state_blocks[i] = _solve_multiple_rhs(self.state_ksps[i], rhs, role='hessian')
+
+		for i in reversed(range(self.state_dim)):
+			rhs = []
+			for k in range(no_directions):
+				set_direction(k)
+				rhs.append(self.__assemble_sensitivity_rhs(self.form_handler.w_1[i], self.bcs_list_ad[i]))
+			adjoint_blocks[i] = _solve_multiple_rhs(self.adjoint_ksps[i], rhs, role='hessian')
+
+		with timer.phase('riesz'):
+			for j in range(self.control_dim):
+				rhs = []
+				for k in range(no_directions):
+					set_direction(k)
+					with timer.phase('assembly'):
+						rhs.append(fenics.as_backend_type(fenics.assemble(self.form_handler.hessian_rhs[j])).vec())
+				solutions = _solve_multiple_rhs(self.ksps[j], rhs, role='hessian')
+				for k in range(no_directions):
+					outs[k][j].vector()[:] = solutions[k]
+
+		self.no_sensitivity_solves += 2*no_directions
+
+
+
 	def newton_solve(self, idx_active=None):
 
 		self.gradient_problem.solve()
@@ -277,6 +447,144 @@ class HessianProblem(BaseHessianProblem):
 
 		BaseHessianProblem.__init__(self, form_handler, gradient_problem)
 
+		self.explicit_hessian = self.config.getboolean('AlgoTNM', 'explicit_hessian', fallback=False)
+		self.explicit_hessian_threshold = self.config.getfloat('AlgoTNM', 'explicit_hessian_threshold', fallback=0.0)
+
+		if self.explicit_hessian:
+			# the dense Hessian uses the global numbering, every process owns a contiguous range of it
+			self.control_offsets = np.cumsum([0] + [V.dim() for V in self.form_handler.control_spaces])
+			self.local_ranges = [u.vector().local_range() for u in self.form_handler.controls]
+			self.hessian_matrix = None
+			self.hessian_revision = None
+			self.hessian_variables = None
+			self.hessian_assemblies = 0
+			# the LU factorization of the reduced Hessian, together with the assembly and active set it belongs to
+			self.hessian_factorization = None
+			self.factorized_assembly = None
+			self.factorized_mask = None
+			self.hessian_factorizations = 0
+
+			# the basis functions of the control space and their images under the Hessian are reused for every assembly
+			size = self.control_offsets[-1]
+			self.hessian_basis = [[fenics.Function(V) for V in self.form_handler.control_spaces] for k in range(size)]
+			self.hessian_actions = [[fenics.Function(V) for V in self.form_handler.control_spaces] for k in range(size)]
+			for j in range(self.control_dim):
+				start, end = self.local_ranges[j]
+				for k in range(self.control_offsets[j], self.control_offsets[j + 1]):
+					# only the owner of the global index sets the entry, but all processes take part in the update
+					values = np.zeros(end - start)
+					index = k - self.control_offsets[j]
+					if start <= index < end:
+						values[index - start] = 1.0
+					self.hessian_basis[k][j].vector().set_local(values)
+					self.hessian_basis[k][j].vector().apply('')
+
+
+
+	def __pde_variables(self):
+		"""Concatenates the coefficients of the state and adjoint variables.
+
+		Returns
+		-------
+		numpy.ndarray
+			The concatenated coefficient vectors.
+		"""
+
+		return np.concatenate([x.vector()[:] for x in self.form_handler.states + self.form_handler.adjoints])
+
+
+
+	def __gather(self, arrays):
+		"""Gathers the local parts of control type vectors on all processes.
+
+		Parameters
+		----------
+		arrays : list[numpy.ndarray]
+			The local parts of the vectors (or of blocks of vectors, stored
+			row-wise) for each control.
+
+		Returns
+		-------
+		numpy.ndarray
+			The concatenated global vectors (in the global numbering).
+		"""
+
+		if self.form_handler.comm.Get_size() == 1:
+			return np.concatenate(arrays)
+		else:
+			return np.concatenate([np.concatenate(self.form_handler.comm.allgather(array)) for array in arrays])
+
+
+
+	def __update_hessian_matrix(self):
+		"""Assembles the Hessian matrix, if the state and adjoint variables have changed significantly.
+
+		The Hessian is applied to all basis functions of the control space at once,
+		with :py:meth:`hessian_application_block`. It is only reassembled, if the
+		relative change of the state and adjoint variables since its last
+		assembly exceeds ``explicit_hessian_threshold``.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.hessian_revision == self.state_problem.revision:
+			return
+
+		variables = self.__pde_variables()
+		if self.hessian_matrix is not None and self.explicit_hessian_threshold > 0.0:
+			norms_squared = _global_sum(np.array([np.sum(self.hessian_variables**2), np.sum((variables - self.hessian_variables)**2)]),
+										self.form_handler.comm)
+			if norms_squared[0] > 0.0 and np.sqrt(norms_squared[1]) <= self.explicit_hessian_threshold*np.sqrt(norms_squared[0]):
+				self.hessian_revision = self.state_problem.revision
+				return
+
+		size = self.control_offsets[-1]
+		self.hessian_application_block(self.hessian_basis, self.hessian_actions)
+		self.hessian_matrix = self.__gather([np.column_stack([self.hessian_actions[k][j].vector()[:] for k in range(size)]) for j in range(self.control_dim)])
+
+		self.hessian_revision = self.state_problem.revision
+		self.hessian_variables = variables
+		self.hessian_assemblies += 1
+
+
+
+	def __explicit_newton_solve(self):
+		"""Solves the Newton system with the explicit (dense) reduced Hessian.
+
+		The LU factorization of the reduced Hessian is reused as long as neither
+		the Hessian nor the active set change.
+
+		Returns
+		-------
+		None
+		"""
+
+		self.__update_hessian_matrix()
+
+		local_masks = [np.ones(end - start, dtype=bool) for start, end in self.local_ranges]
+		for j in range(self.control_dim):
+			if self.form_handler.require_control_constraints[j]:
+				local_masks[j][np.asarray(self.form_handler.idx_active[j], dtype=int)] = False
+		mask = self.__gather(local_masks)
+
+		# the reduced Hessian is only refactorized if the Hessian or the active set have changed
+		if self.factorized_assembly != self.hessian_assemblies or not np.array_equal(self.factorized_mask, mask):
+			reduced_hessian = self.hessian_matrix*np.outer(mask, mask) + np.diag(np.logical_not(mask).astype(float))
+			# the assembled Hessian is neither exactly symmetric nor necessarily definite, so a LU factorization is used
+			self.hessian_factorization = scipy.linalg.lu_factor(reduced_hessian, overwrite_a=True, check_finite=False)
+			self.factorized_assembly = self.hessian_assemblies
+			self.factorized_mask = mask
+			self.hessian_factorizations += 1
+
+		gradient = self.__gather([self.gradients[j].vector()[:] for j in range(self.control_dim)])
+		solution = scipy.linalg.lu_solve(self.hessian_factorization, -gradient, check_finite=False)
+
+		for j in range(self.control_dim):
+			start, end = self.local_ranges[j]
+			self.delta_control[j].vector()[:] = solution[self.control_offsets[j] + start:self.control_offsets[j] + end]
+
 
 
 	def reduced_hessian_application(self, h, out):
@@ -299,6 +607,13 @@ class HessianProblem(BaseHessianProblem):
 		if idx_active is not None:
 			raise CashocsException('Must not pass idx_active to HessianProblem.')
 
+		if self.explicit_hessian:
+			self.gradient_problem.solve()
+			self.form_handler.compute_active_sets()
+			self.__explicit_newton_solve()
+
+			return self.delta_control
+
 		return BaseHessianProblem.newton_solve(self)
 
 
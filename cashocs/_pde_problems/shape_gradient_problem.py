@@ -24,6 +24,7 @@ shape derivative to the shape gradient with a Riesz projection.
 import fenics
 from petsc4py import PETSc
 
+from .._timing import timer
 from ..utils import _setup_petsc_options, _solve_linear_problem
 
 
@@ -86,10 +87,12 @@ class ShapeGradientProblem:
 
 		if not self.has_solution:
 
-			self.shape_form_handler.regularization.update_geometric_quantities()
-			self.shape_form_handler.assembler.assemble(self.shape_form_handler.fe_shape_derivative_vector)
-			b = fenics.as_backend_type(self.shape_form_handler.fe_shape_derivative_vector).vec()
-			_solve_linear_problem(self.ksp, self.shape_form_handler.scalar_product_matrix, b, self.gradient.vector().vec())
+			with timer.phase('riesz'):
+				self.shape_form_handler.regularization.update_geometric_quantities()
+				with timer.phase('assembly'):
+					self.shape_form_handler.assembler.assemble(self.shape_form_handler.fe_shape_derivative_vector)
+				b = fenics.as_backend_type(self.shape_form_handler.fe_shape_derivative_vector).vec()
+				_solve_linear_problem(self.ksp, self.shape_form_handler.scalar_product_matrix, b, self.gradient.vector().vec(), role='shape_gradient')
 
 			self.has_solution = True
 
@@ -0,0 +1,151 @@
+# Copyright (C) 2020 Sebastian Blauth
+#
+# This file is part of CASHOCS.
+#
+# CASHOCS is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# CASHOCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CASHOCS.  If not, see <https://www.gnu.org/licenses/>.
+
+"""A least recently used cache for solutions of the state system.
+
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+
+
+def compute_cache_key(arrays, comm=None):
+	"""Computes a hash for a list of numpy arrays.
+
+	Parameters
+	----------
+	arrays : list[numpy.ndarray]
+		The arrays (e.g. control vectors or mesh coordinates) which determine
+		the solution of the state system.
+	comm : mpi4py.MPI.Comm or None, optional
+		The communicator, in case the arrays are the local parts of distributed
+		vectors. Then, the hashes of all processes are combined, so that
+		every process obtains the same key (and the same cache hits). ``None``
+		means that the arrays are not distributed (default is ``None``).
+
+	Returns
+	-------
+	str
+		The hash of the arrays.
+	"""
+
+	sha = hashlib.sha1()
+	for array in arrays:
+		sha.update(np.ascontiguousarray(array).tobytes())
+
+	if comm is not None and comm.Get_size() > 1:
+		return hashlib.sha1(''.join(comm.allgather(sha.hexdigest())).encode()).hexdigest()
+	else:
+		return sha.hexdigest()
+
+
+
+
+
+class StateCache:
+	"""An LRU cache for the solutions of the state system.
+
+	The solutions are stored for keys, computed with :py:func:`compute_cache_key`
+	from the controls (or mesh coordinates), so that repeated evaluations for the
+	same configuration do not require a new solve of the state system.
+	"""
+
+	def __init__(self, states, size=0):
+		"""Initializes the cache.
+
+		Parameters
+		----------
+		states : list[dolfin.function.function.Function]
+			The state variables.
+		size : int, optional
+			The maximum number of stored solutions. A size of ``0`` disables
+			the cache (default is ``0``).
+		"""
+
+		self.states = states
+		self.size = size
+		self.is_active = (self.size > 0)
+
+		self.storage = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+
+
+	def load(self, key):
+		"""Loads the solution for the given key into the states, if available.
+
+		Parameters
+		----------
+		key : str
+			The key of the current configuration.
+
+		Returns
+		-------
+		bool
+			``True`` if the solution was found in the cache, ``False`` otherwise.
+		"""
+
+		if not self.is_active:
+			return False
+
+		if key in self.storage:
+			self.storage.move_to_end(key)
+			for i in range(len(self.states)):
+				self.states[i].vector()[:] = self.storage[key][i]
+			self.hits += 1
+			return True
+
+		else:
+			self.misses += 1
+			return False
+
+
+
+	def store(self, key):
+		"""Stores the current states for the given key.
+
+		Parameters
+		----------
+		key : str
+			The key of the current configuration.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.is_active:
+			self.storage[key] = [state.vector()[:] for state in self.states]
+			self.storage.move_to_end(key)
+			if len(self.storage) > self.size:
+				self.storage.popitem(last=False)
+
+
+
+	def clear(self):
+		"""Removes all stored solutions.
+
+		Returns
+		-------
+		None
+		"""
+
+		self.storage.clear()
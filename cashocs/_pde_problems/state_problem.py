@@ -24,8 +24,12 @@ import numpy as np
 from petsc4py import PETSc
 
 from .._exceptions import NotConvergedError
-from ..nonlinear_solvers import damped_newton_solve
-from ..utils import _assemble_petsc_system, _setup_petsc_options, _solve_linear_problem
+from .._timing import timer
+from ..nonlinear_solvers import DampedNewtonSolver
+from .anderson import AndersonAcceleration
+from .state_cache import StateCache
+from .warm_start import WarmStart
+from ..utils import _assemble_petsc_system, _global_sum, _setup_petsc_options, _solve_linear_problem
 
 
 
@@ -59,27 +63,65 @@ class StateProblem:
 		self.atol = self.config.getfloat('StateSystem', 'picard_atol', fallback=1e-20)
 		self.maxiter = self.config.getint('StateSystem', 'picard_iter', fallback=50)
 		self.picard_verbose = self.config.getboolean('StateSystem', 'picard_verbose', fallback=False)
+		self.picard_anderson_depth = self.config.getint('StateSystem', 'picard_anderson_depth', fallback=0)
 		self.newton_rtol = self.config.getfloat('StateSystem', 'newton_rtol', fallback=1e-11)
 		self.newton_atol = self.config.getfloat('StateSystem', 'newton_atol', fallback=1e-13)
 		self.newton_damped = self.config.getboolean('StateSystem', 'newton_damped', fallback=True)
 		self.newton_verbose = self.config.getboolean('StateSystem', 'newton_verbose', fallback=False)
 		self.newton_iter = self.config.getint('StateSystem', 'newton_iter', fallback=50)
+		self.newton_inexact = self.config.getboolean('StateSystem', 'newton_inexact', fallback=False)
+		self.newton_forcing_choice = self.config.getint('StateSystem', 'newton_forcing_choice', fallback=1)
+		self.newton_frozen_jacobian = self.config.getboolean('StateSystem', 'newton_frozen_jacobian', fallback=False)
+		self.newton_refresh_threshold = self.config.getfloat('StateSystem', 'newton_refresh_threshold', fallback=0.5)
 
 		self.newton_atols = [1 for i in range(self.form_handler.state_dim)]
 
+		self.anderson = AndersonAcceleration(self.states, self.picard_anderson_depth if self.form_handler.state_is_picard else 0)
+
+		# the lhs of control independent linear systems is only assembled (and factorized) once,
+		# and reassembled only if one of its constants or (data) functions changes
+		self.reuse_lhs = self.config.getboolean('StateSystem', 'reuse_lhs', fallback=False)
+		self.lhs_is_constant = [self.reuse_lhs and self.form_handler.state_is_linear and self.form_handler.state_lhs_is_constant[i]
+								for i in range(self.form_handler.state_dim)]
+		self.state_matrices = [None for i in range(self.form_handler.state_dim)]
+		self.lhs_coefficients = [None for i in range(self.form_handler.state_dim)]
+		self.rhs_assemblers = [None for i in range(self.form_handler.state_dim)]
+		self.rhs_vectors = [None for i in range(self.form_handler.state_dim)]
+
 		self.ksps = [PETSc.KSP().create() for i in range(self.form_handler.state_dim)]
 		_setup_petsc_options(self.ksps, self.form_handler.state_ksp_options)
 
+		self.warm_start = WarmStart(self.states, self.config.get('StateSystem', 'warm_start', fallback='none'))
+
+		# the cache is only used when a key for the current controls / mesh is set (by the line searches)
+		self.cache = StateCache(self.states, self.config.getint('StateSystem', 'cache_size', fallback=0))
+		self.cache_key = None
+		if self.warm_start.is_active and self.form_handler.state_is_linear:
+			for ksp in self.ksps:
+				if not ksp.getType() == 'preonly':
+					ksp.setInitialGuessNonzero(True)
+
 		# adapt the tolerances so that the Newton system can be solved sucessfully
 		if not self.form_handler.state_is_linear:
 			for ksp in self.ksps:
 				ksp.setTolerances(rtol=self.newton_rtol/100, atol=self.newton_atol/100)
 
+			self.newton_solvers = [DampedNewtonSolver(self.form_handler.state_eq_forms[i], self.states[i], self.bcs_list[i],
+													  rtol=self.newton_rtol, atol=self.newton_atol, max_iter=self.newton_iter,
+													  damped=self.newton_damped, verbose=self.newton_verbose, ksp=self.ksps[i],
+													  inexact=self.newton_inexact, forcing_choice=self.newton_forcing_choice,
+													  frozen_jacobian=self.newton_frozen_jacobian, refresh_threshold=self.newton_refresh_threshold)
+								   for i in range(self.form_handler.state_dim)]
+
 		try:
 			self.number_of_solves = self.temp_dict['output_dict'].get('state_solves', 0)
 		except TypeError:
 			self.number_of_solves = 0
 		self.has_solution = False
+		# incremented whenever the states change, used to detect outdated operators
+		self.revision = 0
+		# total number of Jacobian updates of the (modified) Newton method
+		self.jacobian_refreshes = 0
 
 
 
@@ -93,30 +135,36 @@ class StateProblem:
 		"""
 
 		if not self.has_solution:
-			if self.initial_guess is not None:
+			if self.cache_key is not None and self.cache.load(self.cache_key):
+				self.has_solution = True
+				self.revision += 1
+				return self.states
+
+			warm_started = self.warm_start.apply()
+			if self.initial_guess is not None and not warm_started:
 				for j in range(self.form_handler.state_dim):
 					fenics.assign(self.states[j], self.initial_guess[j])
 
 			if not self.form_handler.state_is_picard or self.form_handler.state_dim == 1:
 				if self.form_handler.state_is_linear:
 					for i in range(self.form_handler.state_dim):
-						A, b = _assemble_petsc_system(self.form_handler.state_eq_forms_lhs[i], self.form_handler.state_eq_forms_rhs[i], self.bcs_list[i])
-						_solve_linear_problem(self.ksps[i], A, b, self.states[i].vector().vec())
+						self.__solve_linear_state_equation(i)
 
 				else:
 					for i in range(self.form_handler.state_dim):
-						if self.initial_guess is not None:
+						if self.initial_guess is not None and not warm_started:
 							fenics.assign(self.states[i], self.initial_guess[i])
 
-						self.states[i] = damped_newton_solve(self.form_handler.state_eq_forms[i], self.states[i], self.bcs_list[i],
-															 rtol=self.newton_rtol, atol=self.newton_atol, max_iter=self.newton_iter,
-															 damped=self.newton_damped, verbose=self.newton_verbose, ksp=self.ksps[i])
+						self.states[i] = self.newton_solvers[i].solve()
+						self.jacobian_refreshes += self.newton_solvers[i].jacobian_refreshes
 
 			else:
+				self.anderson.reset()
 				for i in range(self.maxiter + 1):
 					res = 0.0
 					for j in range(self.form_handler.state_dim):
-						res_j = fenics.assemble(self.form_handler.state_picard_forms[j])
+						with timer.phase('assembly'):
+							res_j = fenics.assemble(self.form_handler.state_picard_forms[j])
 
 						[bc.apply(res_j) for bc  in self.form_handler.bcs_list_ad[j]]
 
@@ -140,24 +188,99 @@ class StateProblem:
 					if i==self.maxiter:
 						raise NotConvergedError('Picard iteration for the state system')
 
+					self.anderson.start_sweep()
 					for j in range(self.form_handler.state_dim):
-						if self.initial_guess is not None:
+						if self.initial_guess is not None and not warm_started:
 							fenics.assign(self.states[j], self.initial_guess[j])
 
 						# adapt tolerances so that a solution is possible
 						if not self.form_handler.state_is_linear:
 							self.ksps[j].setTolerances(rtol=np.minimum(0.9*res, 0.9)/100, atol=self.newton_atols[j]/100)
 
-							self.states[j] = damped_newton_solve(self.form_handler.state_eq_forms[j], self.states[j], self.bcs_list[j],
-																 rtol=np.minimum(0.9*res, 0.9), atol=self.newton_atols[j], max_iter=self.newton_iter,
-																 damped=self.newton_damped, verbose=self.newton_verbose, ksp=self.ksps[j])
+							self.states[j] = self.newton_solvers[j].solve(rtol=np.minimum(0.9*res, 0.9), atol=self.newton_atols[j])
+							self.jacobian_refreshes += self.newton_solvers[j].jacobian_refreshes
 						else:
-							A, b = _assemble_petsc_system(self.form_handler.state_eq_forms_lhs[j], self.form_handler.state_eq_forms_rhs[j], self.bcs_list[j])
-							_solve_linear_problem(self.ksps[j], A, b, self.states[j].vector().vec())
+							self.__solve_linear_state_equation(j)
+					self.anderson.accelerate()
 
 			if self.picard_verbose and self.form_handler.state_is_picard:
 				print('')
 			self.has_solution = True
 			self.number_of_solves += 1
+			self.revision += 1
+
+			if self.cache_key is not None:
+				self.cache.store(self.cache_key)
 
 		return self.states
+
+
+
+	def __lhs_coefficients_changed(self, i):
+		"""Checks, whether the constants or functions of the i-th lhs have changed since its assembly.
+
+		Expressions are not checked, as their values cannot be compared.
+
+		Parameters
+		----------
+		i : int
+			The index of the state equation.
+
+		Returns
+		-------
+		bool
+			``True`` if a coefficient has changed (or for the first call), ``False`` otherwise.
+		"""
+
+		values = []
+		for coeff in self.form_handler.state_eq_forms_lhs[i].coefficients():
+			if isinstance(coeff, fenics.Function):
+				values.append(coeff.vector().get_local())
+			elif isinstance(coeff, fenics.Constant):
+				values.append(coeff.values())
+
+		if self.lhs_coefficients[i] is None or len(values) != len(self.lhs_coefficients[i]):
+			changed = 1
+		else:
+			changed = int(not all([np.array_equal(new, old) for new, old in zip(values, self.lhs_coefficients[i])]))
+		self.lhs_coefficients[i] = values
+
+		# all processes have to take part in the assembly
+		return _global_sum(changed, self.form_handler.comm) > 0
+
+
+
+	def __solve_linear_state_equation(self, i):
+		"""Solves the i-th (linear) state equation.
+
+		If the left-hand side does not depend on the controls or states, it is
+		assembled only once and its factorization (or preconditioner) is kept in
+		the KSP object, so that only the right-hand side is assembled in subsequent solves.
+		The left-hand side is reassembled if one of its constants or functions has changed.
+
+		Parameters
+		----------
+		i : int
+			The index of the state equation.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.lhs_is_constant[i]:
+			lhs_has_changed = self.__lhs_coefficients_changed(i)
+			if self.state_matrices[i] is None or lhs_has_changed:
+				self.state_matrices[i], _ = _assemble_petsc_system(self.form_handler.state_eq_forms_lhs[i], self.form_handler.state_eq_forms_rhs[i], self.bcs_list[i])
+				self.ksps[i].setOperators(self.state_matrices[i])
+				self.rhs_assemblers[i] = fenics.SystemAssembler(self.form_handler.state_eq_forms_lhs[i], self.form_handler.state_eq_forms_rhs[i], self.bcs_list[i])
+				self.rhs_vectors[i] = fenics.PETScVector()
+
+			with timer.phase('assembly'):
+				self.rhs_assemblers[i].assemble(self.rhs_vectors[i])
+			b = fenics.as_backend_type(self.rhs_vectors[i]).vec()
+			_solve_linear_problem(self.ksps[i], None, b, self.states[i].vector().vec(), role='state')
+
+		else:
+			A, b = _assemble_petsc_system(self.form_handler.state_eq_forms_lhs[i], self.form_handler.state_eq_forms_rhs[i], self.bcs_list[i])
+			_solve_linear_problem(self.ksps[i], A, b, self.states[i].vector().vec(), role='state')
@@ -0,0 +1,508 @@
+# Copyright (C) 2020 Sebastian Blauth
+#
+# This file is part of CASHOCS.
+#
+# CASHOCS is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# CASHOCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CASHOCS.  If not, see <https://www.gnu.org/licenses/>.
+
+"""State, adjoint and gradient problems for time-dependent state systems.
+
+The state system is solved by stepping a single time step problem forward in time.
+The adjoint system is solved backwards in time, where the states needed for this
+are recomputed from checkpoints with a binomial (revolve) schedule, so that only
+a bounded number of states has to be stored.
+"""
+
+import fenics
+
+from .._timing import timer
+from .adjoint_problem import AdjointProblem
+from .gradient_problem import GradientProblem
+from .state_cache import StateCache
+from .state_problem import StateProblem
+from .warm_start import WarmStart
+from ..utils import _solve_linear_problem
+
+
+
+def _binomial(n, k):
+	"""Computes the binomial coefficient n choose k.
+
+	Parameters
+	----------
+	n : int
+		The size of the set.
+	k : int
+		The size of the subsets.
+
+	Returns
+	-------
+	int
+		The binomial coefficient.
+	"""
+
+	result = 1
+	for i in range(1, k + 1):
+		result = result * (n - k + i) // i
+
+	return result
+
+
+
+def _checkpoint_offset(steps, snapshots):
+	"""Computes the position of the next checkpoint of a binomial schedule.
+
+	For the reversal of ``steps`` time steps with ``snapshots`` available
+	snapshots (including the one at the start), the repetition number
+	:math:`r` is the smallest number with :math:`\\binom{s + r}{s} \\geq l`.
+	The checkpoint is then placed such that the remaining steps can be reversed
+	with one snapshot less and the same repetition number (cf. Griewank and Walther,
+	Algorithm 799: revolve).
+
+	Parameters
+	----------
+	steps : int
+		The number of time steps which have to be reversed (at least 2).
+	snapshots : int
+		The number of snapshots which can be used (at least 2).
+
+	Returns
+	-------
+	int
+		The offset of the checkpoint from the start.
+	"""
+
+	repetitions = 0
+	while _binomial(snapshots + repetitions, snapshots) < steps:
+		repetitions += 1
+
+	return max(1, steps - _binomial(snapshots - 1 + repetitions, snapshots - 1))
+
+
+
+
+
+class TimeSteppingStateProblem:
+	"""The time-dependent state system.
+
+	The state system of a single time step is solved successively with a
+	:py:class:`StateProblem <cashocs._pde_problems.StateProblem>`, and the
+	(reduced) cost functional is accumulated over the time steps.
+	"""
+
+	def __init__(self, form_handler, initial_guess, initial_states, temp_dict=None):
+		"""Initializes the time-dependent state system.
+
+		Parameters
+		----------
+		form_handler : cashocs._forms.TimeSteppingFormHandler
+			The FormHandler of the optimization problem.
+		initial_guess : list[dolfin.function.function.Function] or None
+			An initial guess for the state variables, used to initialize them in each time step.
+			If this is ``None``, the state of the previous time step is used.
+		initial_states : list[dolfin.function.function.Function]
+			The initial conditions of the states.
+		temp_dict : dict
+			A dict used for reinitialization when remeshing is performed.
+		"""
+
+		self.form_handler = form_handler
+		self.initial_states = initial_states
+		self.temp_dict = temp_dict
+
+		self.config = self.form_handler.config
+		self.states = self.form_handler.states
+		self.states_prev = self.form_handler.states_prev
+		self.time_points = self.form_handler.time_points
+		self.number_of_steps = self.form_handler.number_of_steps
+
+		self.step_problem = StateProblem(self.form_handler, initial_guess)
+		self.anderson = self.step_problem.anderson
+		if hasattr(self.step_problem, 'newton_solvers'):
+			self.newton_solvers = self.step_problem.newton_solvers
+
+		# the states of the time steps are initialized with the previous one, instead
+		self.warm_start = WarmStart(self.states, 'none')
+		self.cache = StateCache(self.states, 0)
+		self.cache_key = None
+
+		# the number of stored states, 0 means that all of them are stored
+		self.checkpoints = self.config.getint('TimeStepping', 'checkpoints', fallback=0)
+		self.store_all = (self.checkpoints <= 0 or self.checkpoints >= self.number_of_steps - 1)
+		if self.store_all:
+			self.forward_checkpoints = set(range(1, self.number_of_steps + 1))
+		else:
+			# the checkpoints of the first branch of the schedule are already stored in the forward sweep
+			self.forward_checkpoints = set()
+			start = 0
+			free = self.checkpoints
+			while free > 0 and self.number_of_steps - start > 1:
+				start += _checkpoint_offset(self.number_of_steps - start, free + 1)
+				self.forward_checkpoints.add(start)
+				free -= 1
+		self.snapshots = {}
+
+		try:
+			self.number_of_solves = self.temp_dict['output_dict'].get('state_solves', 0)
+		except TypeError:
+			self.number_of_solves = 0
+		# total number of solved time steps, including the recomputations of the backward sweep
+		self.number_of_steps_solved = 0
+		self.has_solution = False
+		self.revision = 0
+		self.cost_value = 0.0
+
+
+
+	def load(self, k):
+		"""Loads the state at time step k (from a snapshot).
+
+		Parameters
+		----------
+		k : int
+			The index of the time step, where 0 corresponds to the initial condition.
+
+		Returns
+		-------
+		None
+		"""
+
+		for i in range(self.form_handler.state_dim):
+			if k == 0:
+				self.states[i].vector()[:] = self.initial_states[i].vector()[:]
+			else:
+				self.states[i].vector().set_local(self.snapshots[k][i])
+				self.states[i].vector().apply('')
+
+
+
+	def store(self, k):
+		"""Stores the current states as snapshot of time step k.
+
+		Parameters
+		----------
+		k : int
+			The index of the time step.
+
+		Returns
+		-------
+		None
+		"""
+
+		self.snapshots[k] = [self.states[i].vector().get_local() for i in range(self.form_handler.state_dim)]
+
+
+
+	def prepare_step(self, k):
+		"""Sets the previous states, the controls and the time for time step k.
+
+		The states have to contain the solution of time step k - 1.
+
+		Parameters
+		----------
+		k : int
+			The index of the time step (starting at 1).
+
+		Returns
+		-------
+		None
+		"""
+
+		for i in range(self.form_handler.state_dim):
+			self.states_prev[i].vector()[:] = self.states[i].vector()[:]
+
+		for j in range(self.form_handler.step_control_dim):
+			self.form_handler.step_controls[j].vector()[:] = self.form_handler.controls[(k - 1)*self.form_handler.step_control_dim + j].vector()[:]
+
+		if self.form_handler.time is not None:
+			self.form_handler.time.assign(self.time_points[k])
+		if self.form_handler.time_step is not None:
+			self.form_handler.time_step.assign(self.time_points[k] - self.time_points[k - 1])
+
+
+
+	def advance(self, k):
+		"""Solves the state system of time step k.
+
+		The states have to contain the solution of time step k - 1, and are
+		overwritten by the one of time step k.
+
+		Parameters
+		----------
+		k : int
+			The index of the time step (starting at 1).
+
+		Returns
+		-------
+		None
+		"""
+
+		self.prepare_step(k)
+		self.step_problem.has_solution = False
+		self.step_problem.solve()
+		self.number_of_steps_solved += 1
+
+
+
+	def recompute(self, start, k):
+		"""Restores the states of time step k from the snapshot at time step start.
+
+		Parameters
+		----------
+		start : int
+			The index of a time step with a stored snapshot (or 0).
+		k : int
+			The index of the time step which shall be restored.
+
+		Returns
+		-------
+		None
+		"""
+
+		if k in self.snapshots and (k - 1 == 0 or k - 1 in self.snapshots):
+			self.load(k - 1)
+			self.prepare_step(k)
+			self.load(k)
+			self.step_problem.has_solution = True
+			self.step_problem.revision += 1
+
+		else:
+			self.load(start)
+			for i in range(start + 1, k + 1):
+				self.advance(i)
+
+
+
+	def solve(self):
+		"""Solves the time-dependent state system with a forward sweep.
+
+		Returns
+		-------
+		states : list[dolfin.function.function.Function]
+			The states at the final time step.
+		"""
+
+		if not self.has_solution:
+			self.snapshots = {}
+			self.cost_value = 0.0
+
+			self.load(0)
+			for k in range(1, self.number_of_steps + 1):
+				self.advance(k)
+				with timer.phase('assembly'):
+					self.cost_value += fenics.assemble(self.form_handler.cost_functional_form)
+				if k in self.forward_checkpoints:
+					self.store(k)
+
+			self.has_solution = True
+			self.number_of_solves += 1
+			self.revision += 1
+
+		return self.states
+
+
+
+
+
+class TimeSteppingAdjointProblem:
+	"""The time-dependent adjoint system.
+
+	The adjoint system is solved with a backward sweep, where the states are
+	recomputed from the snapshots of the state problem, following a binomial
+	checkpointing schedule. As the adjoints are not stored, the right-hand
+	sides of the gradient problems are assembled during the sweep.
+	"""
+
+	def __init__(self, form_handler, state_problem, temp_dict=None):
+		"""Initializes the time-dependent adjoint system.
+
+		Parameters
+		----------
+		form_handler : cashocs._forms.TimeSteppingFormHandler
+			The FormHandler object for the optimization problem.
+		state_problem : cashocs._pde_problems.TimeSteppingStateProblem
+			The time-dependent state problem.
+		temp_dict : dict
+			A dictionary used for reinitializations when remeshing is performed.
+		"""
+
+		self.form_handler = form_handler
+		self.state_problem = state_problem
+		self.temp_dict = temp_dict
+
+		self.config = self.form_handler.config
+		self.adjoints = self.form_handler.adjoints
+		self.time_points = self.form_handler.time_points
+		self.number_of_steps = self.form_handler.number_of_steps
+
+		self.step_problem = AdjointProblem(self.form_handler, self.state_problem.step_problem)
+		self.anderson = self.step_problem.anderson
+		self.warm_start = WarmStart(self.adjoints, 'none')
+
+		self.gradient_rhs = [fenics.PETScVector() for j in range(self.form_handler.control_dim)]
+
+		try:
+			self.number_of_solves = self.temp_dict['output_dict'].get('adjoint_solves', 0)
+		except TypeError:
+			self.number_of_solves = 0
+		self.has_solution = False
+
+
+
+	def __adjoint_step(self, start, k):
+		"""Solves the adjoint system of time step k.
+
+		Parameters
+		----------
+		start : int
+			The index of a time step with a stored snapshot, from which the
+			states are recomputed.
+		k : int
+			The index of the time step.
+
+		Returns
+		-------
+		None
+		"""
+
+		self.state_problem.recompute(start, k)
+
+		self.step_problem.has_solution = False
+		self.step_problem.solve()
+
+		m = self.form_handler.step_control_dim
+		with timer.phase('assembly'):
+			for j in range(m):
+				fenics.assemble(self.form_handler.gradient_forms_rhs[j], tensor=self.gradient_rhs[(k - 1)*m + j])
+
+		# the current time step is the subsequent one for the next adjoint step
+		self.form_handler.adjoint_coupling.assign(1.0)
+		for i in range(self.form_handler.state_dim):
+			self.form_handler.states_next[i].vector()[:] = self.form_handler.states[i].vector()[:]
+			self.form_handler.adjoints_next[i].vector()[:] = self.adjoints[i].vector()[:]
+		for j in range(m):
+			self.form_handler.controls_next[j].vector()[:] = self.form_handler.step_controls[j].vector()[:]
+		if self.form_handler.time_next is not None:
+			self.form_handler.time_next.assign(self.time_points[k])
+		if self.form_handler.time_step_next is not None:
+			self.form_handler.time_step_next.assign(self.time_points[k] - self.time_points[k - 1])
+
+
+
+	def __reverse(self, start, end, free):
+		"""Solves the adjoint systems of the time steps end, ..., start + 1.
+
+		Parameters
+		----------
+		start : int
+			The index of a time step with a stored snapshot.
+		end : int
+			The index of the last time step, for which the adjoint system is solved.
+		free : int
+			The number of snapshots which may still be stored.
+
+		Returns
+		-------
+		None
+		"""
+
+		if free == 0 or end - start == 1:
+			for k in range(end, start, -1):
+				self.__adjoint_step(start, k)
+			return
+
+		middle = start + _checkpoint_offset(end - start, free + 1)
+		if middle not in self.state_problem.snapshots:
+			self.state_problem.recompute(start, middle)
+			self.state_problem.store(middle)
+
+		self.__reverse(middle, end, free - 1)
+		del self.state_problem.snapshots[middle]
+		self.__reverse(start, middle, free)
+
+
+
+	def solve(self):
+		"""Solves the time-dependent adjoint system with a backward sweep.
+
+		Returns
+		-------
+		adjoints : list[dolfin.function.function.Function]
+			The adjoints at the first time step (the states are also
+			overwritten by the ones of the first time step).
+		"""
+
+		self.state_problem.solve()
+
+		if not self.has_solution:
+			self.form_handler.adjoint_coupling.assign(0.0)
+
+			if self.state_problem.store_all:
+				for k in range(self.number_of_steps, 0, -1):
+					self.__adjoint_step(k - 1, k)
+			else:
+				self.__reverse(0, self.number_of_steps, self.state_problem.checkpoints)
+
+			self.has_solution = True
+			self.number_of_solves += 1
+
+		return self.adjoints
+
+
+
+
+
+class TimeSteppingGradientProblem(GradientProblem):
+	"""The Riesz problems for the gradients of all time steps.
+
+	The Riesz projections of all time steps share the KSP objects of the
+	controls of a single time step.
+	"""
+
+	def _number_of_riesz_problems(self):
+		"""Returns the number of Riesz problems, i.e., the number of controls of a single time step.
+
+		Returns
+		-------
+		int
+			The number of controls of a single time step.
+		"""
+
+		return self.form_handler.step_control_dim
+
+
+
+	def solve(self):
+		"""Solves the Riesz projection problems to obtain the gradient of the (reduced) cost functional.
+
+		Returns
+		-------
+		gradients : list[dolfin.function.function.Function]
+			The list of gradients of the cost functional, ordered by the time steps.
+		"""
+
+		self.state_problem.solve()
+		self.adjoint_problem.solve()
+
+		if not self.has_solution:
+			m = self.form_handler.step_control_dim
+			with timer.phase('riesz'):
+				for i in range(self.form_handler.control_dim):
+					b = fenics.as_backend_type(self.adjoint_problem.gradient_rhs[i]).vec()
+					_solve_linear_problem(ksp=self.ksps[i % m], b=b, x=self.gradients[i].vector().vec(), role='riesz')
+
+			self.has_solution = True
+
+			self.gradient_norm_squared = self.form_handler.scalar_product(self.gradients, self.gradients)
+
+		return self.gradients
@@ -0,0 +1,103 @@
+# Copyright (C) 2020 Sebastian Blauth
+#
+# This file is part of CASHOCS.
+#
+# CASHOCS is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# CASHOCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CASHOCS.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Warm starts for the solution of the state and adjoint systems.
+
+"""
+
+import fenics
+
+from .._exceptions import ConfigError
+
+
+
+class WarmStart:
+	"""Initial guesses for PDE solves, based on previously accepted solutions.
+
+	The strategy ``'last'`` uses the solution at the last accepted iterate
+	of the optimization algorithm as initial guess, and the strategy ``'extrapolate'``
+	extrapolates linearly from the solutions at the last two accepted iterates,
+	i.e., the initial guess is given by
+
+	.. math:: y_k + \\theta (y_k - y_{k-1}),
+
+	where :math:`\\theta` is the ratio of the current step and the previous one,
+	projected onto the previous step. The strategy ``'none'`` disables warm starts.
+	"""
+
+	def __init__(self, functions, strategy='none'):
+		"""Initializes the warm start.
+
+		Parameters
+		----------
+		functions : list[dolfin.function.function.Function]
+			The functions (states or adjoints) which shall be initialized.
+		strategy : {'none', 'last', 'extrapolate'}, optional
+			The warm start strategy (default is ``'none'``).
+		"""
+
+		if not strategy in ['none', 'last', 'extrapolate']:
+			raise ConfigError('StateSystem', 'warm_start', 'Not a valid input. Needs to be one of \'none\', \'last\', or \'extrapolate\'.')
+
+		self.functions = functions
+		self.strategy = strategy
+		self.is_active = (self.strategy != 'none')
+
+		if self.is_active:
+			self.accepted = [fenics.Function(u.function_space()) for u in self.functions]
+			self.accepted_prev = [fenics.Function(u.function_space()) for u in self.functions]
+		self.number_of_accepted = 0
+		self.ratio = 0.0
+
+
+
+	def store(self):
+		"""Stores the current functions as solution at an accepted iterate.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.is_active:
+			for i in range(len(self.functions)):
+				self.accepted_prev[i].vector()[:] = self.accepted[i].vector()[:]
+				self.accepted[i].vector()[:] = self.functions[i].vector()[:]
+			self.number_of_accepted += 1
+
+
+
+	def apply(self):
+		"""Overwrites the functions with the initial guess of the strategy.
+
+		Returns
+		-------
+		bool
+			``True`` if an initial guess was set, ``False`` otherwise (i.e.
+			if no solution has been accepted so far).
+		"""
+
+		if not self.is_active or self.number_of_accepted == 0:
+			return False
+
+		for i in range(len(self.functions)):
+			if self.strategy == 'extrapolate' and self.number_of_accepted > 1:
+				self.functions[i].vector()[:] = (1 + self.ratio)*self.accepted[i].vector()[:] - self.ratio*self.accepted_prev[i].vector()[:]
+			else:
+				self.functions[i].vector()[:] = self.accepted[i].vector()[:]
+
+		return True
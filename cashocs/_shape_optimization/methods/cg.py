@@ -22,6 +22,7 @@
 import fenics
 import numpy as np
 
+from ..._checkpoint import load_functions, store_functions
 from ..._exceptions import ConfigError, NotConvergedError
 from ..._shape_optimization import ArmijoLineSearch, ShapeOptimizationAlgorithm
 
@@ -57,6 +58,46 @@ class CG(ShapeOptimizationAlgorithm):
 
 
 
+	def _checkpoint_data(self):
+		"""Collects the data which is saved in a checkpoint, including the previous search direction.
+
+		Returns
+		-------
+		arrays : dict
+			The arrays owned by the current process.
+		values : dict
+			The global values.
+		"""
+
+		arrays, values = ShapeOptimizationAlgorithm._checkpoint_data(self)
+		store_functions(arrays, 'search_direction', [self.search_direction])
+		values['memory'] = self.memory
+
+		return arrays, values
+
+
+
+	def _restore_checkpoint_data(self, arrays, values):
+		"""Restores the data saved in a checkpoint, including the previous search direction.
+
+		Parameters
+		----------
+		arrays : dict
+			The arrays owned by the current process.
+		values : dict
+			The global values.
+
+		Returns
+		-------
+		None
+		"""
+
+		ShapeOptimizationAlgorithm._restore_checkpoint_data(self, arrays, values)
+		load_functions(arrays, 'search_direction', [self.search_direction])
+		self.memory = values['memory']
+
+
+
 	def run(self):
 		"""Performs the optimization via the nonlinear cg method
 
@@ -77,8 +118,10 @@ class CG(ShapeOptimizationAlgorithm):
 		self.relative_norm = 1.0
 		self.state_problem.has_solution = False
 		self.gradient.vector()[:] = 1.0
+		self.restore_checkpoint()
 
 		while True:
+			self.save_checkpoint()
 
 			self.gradient_prev.vector()[:] = self.gradient.vector()[:]
 
@@ -160,7 +203,9 @@ class CG(ShapeOptimizationAlgorithm):
 
 			self.line_search.search(self.search_direction, self.has_curvature_info)
 			if self.line_search_broken:
-				if self.soft_exit:
+				if self.requires_remeshing:
+					break
+				elif self.soft_exit:
 					print('Armijo rule failed.')
 					break
 				else:
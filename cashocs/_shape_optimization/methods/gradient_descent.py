@@ -65,8 +65,10 @@ class GradientDescent(ShapeOptimizationAlgorithm):
 			self.gradient_norm_initial = 0.0
 		self.relative_norm = 1.0
 		self.state_problem.has_solution = False
+		self.restore_checkpoint()
 
 		while True:
+			self.save_checkpoint()
 
 			self.adjoint_problem.has_solution = False
 			self.shape_gradient_problem.has_solution = False
@@ -88,7 +90,9 @@ class GradientDescent(ShapeOptimizationAlgorithm):
 
 			self.line_search.search(self.search_direction, self.has_curvature_info)
 			if self.line_search_broken:
-				if self.soft_exit:
+				if self.requires_remeshing:
+					break
+				elif self.soft_exit:
 					print('Armijo rule failed.')
 					break
 				else:
@@ -19,13 +19,13 @@
 
 """
 
-from _collections import deque
-
 import fenics
 import numpy as np
+from petsc4py import PETSc
 
-from ..._exceptions import NotConvergedError
+from ..._exceptions import InputError, NotConvergedError
 from ..._shape_optimization import ArmijoLineSearch, ShapeOptimizationAlgorithm
+from ...utils import _global_sum, _lbfgs_compact_product
 
 
 
@@ -53,17 +53,47 @@ class LBFGS(ShapeOptimizationAlgorithm):
 		self.has_curvature_info = False
 
 		if self.bfgs_memory_size > 0:
-			self.history_s = deque()
-			self.history_y = deque()
-			self.history_rho = deque()
+			# the history only contains the entries owned by the current process
+			size = self.gradient.vector().local_size()
+
+			# ring buffer for the history, the newest pair is stored at self.history_position - 1
+			# the steps are in the first, the gradient differences in the second half of the columns
+			self.history = np.zeros((size, 2*self.bfgs_memory_size), order='F')
+			self.history_curvature = np.zeros(self.bfgs_memory_size)
+			self.history_position = 0
+			self.history_length = 0
+
 			self.gradient_prev = fenics.Function(self.shape_form_handler.deformation_space)
 			self.y_k = fenics.Function(self.shape_form_handler.deformation_space)
 			self.s_k = fenics.Function(self.shape_form_handler.deformation_space)
 
 
 
+	def _apply_metric(self, vectors):
+		"""Applies the (current) matrix of the scalar product to a block of vectors.
+
+		Parameters
+		----------
+		vectors : numpy.ndarray
+			the vectors, stored column-wise
+
+		Returns
+		-------
+		numpy.ndarray
+			the images of the vectors, stored row-wise
+		"""
+
+		matrix = self.shape_form_handler.scalar_product_matrix
+		block = PETSc.Mat().createDense([(vectors.shape[0], PETSc.DECIDE), (PETSc.DECIDE, vectors.shape[1])],
+										array=np.asfortranarray(vectors), comm=matrix.getComm())
+		product = matrix.matMult(block)
+
+		return product.getDenseArray().T.copy()
+
+
+
 	def compute_search_direction(self, grad):
-		"""Computes the search direction for the BFGS method with the so-called double loop
+		"""Computes the search direction for the BFGS method with the compact representation
 
 		Parameters
 		----------
@@ -77,28 +107,25 @@ class LBFGS(ShapeOptimizationAlgorithm):
 
 		"""
 
-		if self.bfgs_memory_size > 0 and len(self.history_s) > 0:
-			history_alpha = deque()
-			self.search_direction.vector()[:] = grad.vector()[:]
+		if self.bfgs_memory_size > 0 and self.history_length > 0:
+			idx = (self.history_position - self.history_length + np.arange(self.history_length)) % self.bfgs_memory_size
+			columns = np.concatenate([idx, self.bfgs_memory_size + idx])
+			k = self.history_length
 
-			for i, _ in enumerate(self.history_s):
-				alpha = self.history_rho[i]*self.shape_form_handler.scalar_product(self.history_s[i], self.search_direction)
-				history_alpha.append(alpha)
-				self.search_direction.vector()[:] -= alpha * self.history_y[i].vector()[:]
+			# the metric changes with the mesh, so the images are recomputed in a single product
+			history = self.history[:, columns].T
+			images = self._apply_metric(self.history[:, columns])
+			S, Y = history[:k], history[k:]
+			SM, YM = images[:k], images[k:]
 
 			if self.use_bfgs_scaling and self.iteration > 0:
-				factor = self.shape_form_handler.scalar_product(self.history_y[0], self.history_s[0]) / self.shape_form_handler.scalar_product(self.history_y[0], self.history_y[0])
+				products = _global_sum(np.array([YM[-1].dot(S[-1]), YM[-1].dot(Y[-1])]), self.shape_form_handler.comm)
+				factor = products[0] / products[1]
 			else:
 				factor = 1.0
 
-			self.search_direction.vector()[:] *= factor
-
-			for i, _ in enumerate(self.history_s):
-				beta = self.history_rho[-1 - i]*self.shape_form_handler.scalar_product(self.history_y[-1 - i], self.search_direction)
-
-				self.search_direction.vector()[:] += self.history_s[-1 - i].vector()[:] * (history_alpha[-1 -i] - beta)
-
-			self.search_direction.vector()[:] *= -1
+			self.search_direction.vector()[:] = -_lbfgs_compact_product(grad.vector()[:], S, Y, SM, YM, self.history_curvature[idx], factor,
+																		comm=self.shape_form_handler.comm)
 
 		else:
 			self.search_direction.vector()[:] = -grad.vector()[:]
@@ -107,6 +134,57 @@ class LBFGS(ShapeOptimizationAlgorithm):
 
 
 
+	def _checkpoint_data(self):
+		"""Collects the data which is saved in a checkpoint, including the history of the method.
+
+		Returns
+		-------
+		arrays : dict
+			The arrays owned by the current process.
+		values : dict
+			The global values.
+		"""
+
+		arrays, values = ShapeOptimizationAlgorithm._checkpoint_data(self)
+		values['bfgs_memory_size'] = self.bfgs_memory_size
+		if self.bfgs_memory_size > 0:
+			arrays['history'] = self.history
+			values['history_curvature'] = self.history_curvature.tolist()
+			values['history_position'] = self.history_position
+			values['history_length'] = self.history_length
+
+		return arrays, values
+
+
+
+	def _restore_checkpoint_data(self, arrays, values):
+		"""Restores the data saved in a checkpoint, including the history of the method.
+
+		Parameters
+		----------
+		arrays : dict
+			The arrays owned by the current process.
+		values : dict
+			The global values.
+
+		Returns
+		-------
+		None
+		"""
+
+		if values['bfgs_memory_size'] != self.bfgs_memory_size:
+			raise InputError('cashocs.ShapeOptimizationProblem.solve', 'restart_from',
+							 'The checkpoint was written with a different bfgs_memory_size.')
+
+		ShapeOptimizationAlgorithm._restore_checkpoint_data(self, arrays, values)
+		if self.bfgs_memory_size > 0:
+			self.history[:] = arrays['history']
+			self.history_curvature[:] = values['history_curvature']
+			self.history_position = values['history_position']
+			self.history_length = values['history_length']
+
+
+
 	def run(self):
 		"""Performs the optimization via the limited memory BFGS method
 
@@ -125,22 +203,24 @@ class LBFGS(ShapeOptimizationAlgorithm):
 			self.gradient_norm_initial = 0.0
 		self.state_problem.has_solution = False
 
-		self.adjoint_problem.has_solution = False
-		self.shape_gradient_problem.has_solution = False
-		self.shape_gradient_problem.solve()
-		self.gradient_norm = np.sqrt(self.shape_gradient_problem.gradient_norm_squared)
+		if not self.restore_checkpoint():
+			self.adjoint_problem.has_solution = False
+			self.shape_gradient_problem.has_solution = False
+			self.shape_gradient_problem.solve()
+			self.gradient_norm = np.sqrt(self.shape_gradient_problem.gradient_norm_squared)
 
-		if self.gradient_norm_initial > 0.0:
-			self.relative_norm = self.gradient_norm / self.gradient_norm_initial
-		else:
-			self.gradient_norm_initial = self.gradient_norm
-			self.relative_norm = 1.0
+			if self.gradient_norm_initial > 0.0:
+				self.relative_norm = self.gradient_norm / self.gradient_norm_initial
+			else:
+				self.gradient_norm_initial = self.gradient_norm
+				self.relative_norm = 1.0
 
 		# if self.gradient_norm_initial == 0:
 		# 	self.converged = True
 		# 	self.print_results()
 
 		while not self.converged:
+			self.save_checkpoint()
 			self.search_direction = self.compute_search_direction(self.gradient)
 
 			self.directional_derivative = self.shape_form_handler.scalar_product(self.search_direction, self.gradient)
@@ -150,7 +230,9 @@ class LBFGS(ShapeOptimizationAlgorithm):
 
 			self.line_search.search(self.search_direction, self.has_curvature_info)
 			if self.line_search_broken:
-				if self.soft_exit:
+				if self.requires_remeshing:
+					break
+				elif self.soft_exit:
 					print('Armijo rule failed.')
 					break
 				else:
@@ -183,26 +265,20 @@ class LBFGS(ShapeOptimizationAlgorithm):
 				self.y_k.vector()[:] = self.gradient.vector()[:] - self.gradient_prev.vector()[:]
 				self.s_k.vector()[:] = self.stepsize*self.search_direction.vector()[:]
 
-				self.history_y.appendleft(self.y_k.copy(True))
-				self.history_s.appendleft(self.s_k.copy(True))
-
 				self.curvature_condition = self.shape_form_handler.scalar_product(self.y_k, self.s_k)
 
 				# if self.curvature_condition <= 1e-14:
 				if self.curvature_condition <= 0.0:
 				# if self.curvature_condition / self.form_handler.scalar_product(self.s_k, self.s_k) < 1e-7 * self.gradient_problem.return_norm_squared():
 					self.has_curvature_info = False
-
-					self.history_s = deque()
-					self.history_y = deque()
-					self.history_rho = deque()
+					self.history_length = 0
 
 				else:
 					self.has_curvature_info = True
-					rho = 1/self.curvature_condition
-					self.history_rho.appendleft(rho)
+					position = self.history_position
+					self.history[:, position] = self.s_k.vector()[:]
+					self.history[:, self.bfgs_memory_size + position] = self.y_k.vector()[:]
+					self.history_curvature[position] = self.curvature_condition
 
-				if len(self.history_s) > self.bfgs_memory_size:
-					self.history_s.pop()
-					self.history_y.pop()
-					self.history_rho.pop()
+					self.history_position = (position + 1) % self.bfgs_memory_size
+					self.history_length = min(self.history_length + 1, self.bfgs_memory_size)
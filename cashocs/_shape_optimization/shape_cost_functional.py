@@ -21,6 +21,8 @@
 
 import fenics
 
+from .._timing import timer
+
 
 
 class ReducedShapeCostFunctional:
@@ -58,4 +60,5 @@ class ReducedShapeCostFunctional:
 		self.state_problem.solve()
 		# self.regularization.update_geometric_quantities()
 
-		return fenics.assemble(self.shape_form_handler.cost_functional_form) + self.regularization.compute_objective()
+		with timer.phase('assembly'):
+			return fenics.assemble(self.shape_form_handler.cost_functional_form) + self.regularization.compute_objective()
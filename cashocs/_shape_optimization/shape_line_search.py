@@ -20,8 +20,9 @@
 """
 
 import fenics
-import numpy as np
 
+from .._timing import timer
+from .._pde_problems.state_cache import compute_cache_key
 from ..utils import _optimization_algorithm_configuration
 
 
@@ -53,6 +54,13 @@ class ArmijoLineSearch:
 
 		self.gradient = self.optimization_algorithm.gradient
 
+		self.state_problem = self.optimization_algorithm.state_problem
+		self.adjoint_problem = self.optimization_algorithm.adjoint_problem
+		self.extrapolate = (self.state_problem.warm_start.strategy == 'extrapolate')
+		if self.extrapolate:
+			self.last_deformation = fenics.Function(self.shape_form_handler.deformation_space)
+			self.last_deformation_norm_squared = 0.0
+
 		self.algorithm = _optimization_algorithm_configuration(self.config)
 		self.is_newton_like = (self.algorithm == 'lbfgs')
 		self.is_newton = self.algorithm in ['newton']
@@ -80,6 +88,37 @@ class ArmijoLineSearch:
 
 
 
+	def update_cache_key(self):
+		"""Sets the key of the current mesh for the cache of state solutions.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.state_problem.cache.is_active:
+			self.state_problem.cache_key = compute_cache_key([self.mesh_handler.mesh.coordinates()], self.mesh_handler.comm)
+
+
+
+	def update_warm_start_ratio(self):
+		"""Updates the extrapolation ratio of the warm start for the current trial deformation.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.extrapolate:
+			if self.last_deformation_norm_squared > 0.0:
+				ratio = self.shape_form_handler.scalar_product(self.deformation, self.last_deformation) / self.last_deformation_norm_squared
+			else:
+				ratio = 0.0
+			self.state_problem.warm_start.ratio = ratio
+			self.adjoint_problem.warm_start.ratio = ratio
+
+
+
 	def search(self, search_direction, has_curvature_info):
 		"""Performs the line search along the entered search direction
 
@@ -95,8 +134,21 @@ class ArmijoLineSearch:
 		None
 		"""
 
-		self.search_direction_inf = np.max(np.abs(search_direction.vector()[:]))
+		with timer.phase('line_search'):
+			self.__search(search_direction, has_curvature_info)
+
+
+
+	def __search(self, search_direction, has_curvature_info):
+		"""Performs the line search, see :py:meth:`search`.
+
+		"""
+
+		self.search_direction_inf = search_direction.vector().norm('linf')
+		self.update_cache_key()
 		self.optimization_algorithm.objective_value = self.cost_functional.evaluate()
+		self.state_problem.warm_start.store()
+		self.adjoint_problem.warm_start.store()
 
 		if has_curvature_info:
 			self.stepsize = 1.0
@@ -117,6 +169,7 @@ class ArmijoLineSearch:
 				break
 
 			self.deformation.vector()[:] = self.stepsize*search_direction.vector()[:]
+			self.update_warm_start_ratio()
 
 			if self.mesh_handler.move_mesh(self.deformation):
 				if self.mesh_handler.current_mesh_quality < self.mesh_handler.mesh_quality_tol_lower:
@@ -124,6 +177,7 @@ class ArmijoLineSearch:
 					self.mesh_handler.revert_transformation()
 					continue
 
+				self.update_cache_key()
 				self.optimization_algorithm.state_problem.has_solution = False
 				self.objective_step = self.cost_functional.evaluate()
 
@@ -135,6 +189,10 @@ class ArmijoLineSearch:
 						if self.mesh_handler.do_remesh:
 							print('\nMesh Quality too low. Perform a remeshing operation.')
 							self.mesh_handler.remesh()
+							if self.mesh_handler.remesh_in_process:
+								self.optimization_algorithm.requires_remeshing = True
+								self.optimization_algorithm.line_search_broken = True
+								break
 						else:
 							print('Mesh Quality is too low.')
 							self.optimization_algorithm.line_search_broken = True
@@ -151,9 +209,15 @@ class ArmijoLineSearch:
 			else:
 				self.stepsize /= self.beta_armijo
 
+		self.state_problem.cache_key = None
+
 		if not self.optimization_algorithm.line_search_broken:
 			self.optimization_algorithm.stepsize = self.stepsize
 			self.optimization_algorithm.objective_value = self.objective_step
 
+			if self.extrapolate:
+				self.last_deformation.vector()[:] = self.deformation.vector()[:]
+				self.last_deformation_norm_squared = self.shape_form_handler.scalar_product(self.last_deformation, self.last_deformation)
+
 		if not has_curvature_info:
 			self.stepsize *= self.beta_armijo
@@ -27,11 +27,11 @@ import warnings
 
 from .methods import CG, GradientDescent, LBFGS
 from .._exceptions import ConfigError, InputError, CashocsException
-from .._forms import Lagrangian, ShapeFormHandler
+from .._forms import Lagrangian, MeshTransfer, ShapeFormHandler
 from .._pde_problems import AdjointProblem, ShapeGradientProblem, StateProblem
 from .._shape_optimization import ReducedShapeCostFunctional
-from ..geometry import _MeshHandler
-from ..optimization_problem import OptimizationProblem
+from ..geometry import _MeshHandler, import_mesh
+from ..optimization_problem import OptimizationProblem, _collect_forms
 from ..utils import _optimization_algorithm_configuration
 
 
@@ -90,28 +90,41 @@ class ShapeOptimizationProblem(OptimizationProblem):
 
 		### Initialize the remeshing behavior, and a temp file
 		self.do_remesh = config.getboolean('Mesh', 'remesh', fallback=False)
+		self.remesh_in_process = config.getboolean('Mesh', 'remesh_in_process', fallback=False)
 		self.temp_dict = None
 		if self.do_remesh:
+			comm = self.states[0].function_space().mesh().mpi_comm()
 
-			if not os.path.isfile(os.path.realpath(sys.argv[0])):
-				raise CashocsException('Not a valid configuration. The script has to be the first command line argument.')
+			if not self.remesh_in_process and comm.Get_size() > 1:
+				raise ConfigError('Mesh', 'remesh_in_process', 'Remeshing with a restart of the python interpreter is not possible in parallel. Use remesh_in_process = True.')
 
-			try:
-				if __IPYTHON__:
-					warnings.warn('You are running a shape optimization problem with remeshing from ipython. Rather run this using the python command')
-			except NameError:
-				pass
+			if not self.remesh_in_process:
+				if not os.path.isfile(os.path.realpath(sys.argv[0])):
+					raise CashocsException('Not a valid configuration. The script has to be the first command line argument.')
 
-			try:
-				if not self.states[0].function_space().mesh()._cashocs_generator == 'config':
+				try:
+					if __IPYTHON__:
+						warnings.warn('You are running a shape optimization problem with remeshing from ipython. Rather run this using the python command')
+				except NameError:
+					pass
+
+				try:
+					if not self.states[0].function_space().mesh()._cashocs_generator == 'config':
+						raise InputError('cashocs.import_mesh', 'arg', 'You must specify a config file as input for remeshing.')
+				except AttributeError:
 					raise InputError('cashocs.import_mesh', 'arg', 'You must specify a config file as input for remeshing.')
-			except AttributeError:
-				raise InputError('cashocs.import_mesh', 'arg', 'You must specify a config file as input for remeshing.')
 
 			if not ('_cashocs_remesh_flag' in sys.argv):
-				self.directory = os.path.dirname(os.path.realpath(sys.argv[0]))
-				self.__clean_previous_temp_files()
-				self.temp_dir = tempfile.mkdtemp(prefix='._cashocs_remesh_temp_', dir=self.directory)
+				if self.remesh_in_process:
+					self.directory = os.getcwd()
+				else:
+					self.directory = os.path.dirname(os.path.realpath(sys.argv[0]))
+				if comm.Get_rank() == 0:
+					self.__clean_previous_temp_files()
+					self.temp_dir = tempfile.mkdtemp(prefix='._cashocs_remesh_temp_', dir=self.directory)
+				else:
+					self.temp_dir = None
+				self.temp_dir = comm.bcast(self.temp_dir, root=0)
 				self.__change_except_hook()
 				self.temp_dict = {'temp_dir' : self.temp_dir, 'gmsh_file' : self.config.get('Mesh', 'gmsh_file'),
 								  'geo_file' : self.config.get('Mesh', 'geo_file'),
@@ -130,6 +143,18 @@ class ShapeOptimizationProblem(OptimizationProblem):
 		else:
 			raise InputError('cashocs._shape_optimization.shape_optimization_problem.ShapeOptimizationProblem', 'boundaries', 'Not a valid type for boundaries.')
 
+		self.__initialize_problem()
+
+
+
+	def __initialize_problem(self):
+		"""Initializes the form handler, mesh handler, and PDE problems.
+
+		Returns
+		-------
+		None
+		"""
+
 		self.lagrangian = Lagrangian(self.state_forms, self.cost_functional_form)
 		self.shape_form_handler = ShapeFormHandler(self.lagrangian, self.bcs_list, self.states, self.adjoints,
 												   self.boundaries, self.config, self.ksp_options, self.adjoint_ksp_options)
@@ -153,7 +178,7 @@ class ShapeOptimizationProblem(OptimizationProblem):
 		"""Resets the memory of the PDE problems so that new solutions are computed.
 
 		This sets the value of has_solution to False for all relevant PDE problems,
-		where memory is stored.
+		where memory is stored, and clears the cache of state solutions.
 
 		Returns
 		-------
@@ -165,10 +190,11 @@ class ShapeOptimizationProblem(OptimizationProblem):
 		self.state_problem.has_solution = False
 		self.adjoint_problem.has_solution = False
 		self.shape_gradient_problem.has_solution = False
+		self.state_problem.cache.clear()
 
 
 
-	def solve(self, algorithm=None, rtol=None, atol=None, max_iter=None):
+	def solve(self, algorithm=None, rtol=None, atol=None, max_iter=None, restart_from=None):
 		r"""Solves the optimization problem by the method specified in the config file.
 
 		Parameters
@@ -196,6 +222,14 @@ class ShapeOptimizationProblem(OptimizationProblem):
 			can carry out before it is terminated. Overwrites the value
 			specified in the config file. If this is ``None``, the value from
 			the config file is taken. Default is ``None``.
+		restart_from : str or None, optional
+			The path to a checkpoint file (see ``checkpoint_interval`` in the Output
+			section of the config file), from which the optimization is restarted.
+			The checkpoint has to be written by the same algorithm and with the same
+			number of processes. This is available for the gradient descent,
+			nonlinear CG, and L-BFGS methods.
+			If this is ``None``, the optimization starts from the current
+			controls. Default is ``None``.
 
 		Returns
 		-------
@@ -221,6 +255,10 @@ class ShapeOptimizationProblem(OptimizationProblem):
 
 		self.algorithm = _optimization_algorithm_configuration(self.config, algorithm)
 
+		if restart_from is not None and self.mesh_handler.do_remesh:
+			raise InputError('cashocs.ShapeOptimizationProblem.solve', 'restart_from', 'Restarts are not available in combination with remeshing.')
+		self.restart_from = restart_from
+
 		if (rtol is not None) and (atol is None):
 			self.config.set('OptimizationRoutine', 'rtol', str(rtol))
 			self.config.set('OptimizationRoutine', 'atol', str(0.0))
@@ -243,11 +281,49 @@ class ShapeOptimizationProblem(OptimizationProblem):
 		else:
 			raise ConfigError('OptimizationRoutine', 'algorithm', 'Not a valid input. Needs to be one of \'gradient_descent\' (\'gd\'), \'lbfgs\' (\'bfgs\'), or \'conjugate_gradient\' (\'cg\').')
 
+		self.state_problem.cache.clear()
 		self.solver.run()
+		while self.solver.requires_remeshing:
+			self.__reinitialize_on_new_mesh()
+			self.solver = type(self.solver)(self)
+			self.solver.run()
 		self.solver.finalize()
 
 
 
+	def __reinitialize_on_new_mesh(self):
+		"""Transfers the problem to the remeshed geometry without a restart.
+
+		The state forms, cost functional, boundary conditions, and state and
+		adjoint variables are transferred to the new mesh, and the problem
+		is re-initialized with them. Afterwards, the attributes ``states``,
+		``adjoints``, and ``mesh_handler.mesh`` refer to the new mesh.
+
+		Returns
+		-------
+		None
+		"""
+
+		mesh, subdomains, boundaries, _, _, _ = import_mesh(self.temp_dict['mesh_file'])
+		mesh_transfer = MeshTransfer(mesh, subdomains, boundaries)
+
+		state_forms = [mesh_transfer.transfer_form(form) for form in self.state_forms]
+		cost_functional_form = mesh_transfer.transfer_form(self.cost_functional_form)
+		bcs_list = mesh_transfer.transfer_bcs(self.bcs_list, self.state_spaces)
+		states = [mesh_transfer.transfer_function(state) for state in self.states]
+		adjoints = [mesh_transfer.transfer_function(adjoint) for adjoint in self.adjoints]
+		if self.initial_guess is not None:
+			initial_guess = [mesh_transfer.transfer_function(guess) for guess in self.initial_guess]
+		else:
+			initial_guess = None
+
+		OptimizationProblem.__init__(self, state_forms, bcs_list, cost_functional_form, states, adjoints, self.config,
+									 initial_guess, self.ksp_options, self.adjoint_ksp_options)
+		self.boundaries = boundaries
+		self.__initialize_problem()
+
+
+
 	def __change_except_hook(self):
 		"""Ensures that temp files are deleted when an exception occurs.
 
@@ -276,6 +352,26 @@ class ShapeOptimizationProblem(OptimizationProblem):
 
 
 
+	def _forms_to_compile(self, algorithm=None):
+		"""Collects the forms which are needed for solving the problem.
+
+		Parameters
+		----------
+		algorithm : str or None, optional
+			The optimization algorithm, see :py:meth:`solve`.
+
+		Returns
+		-------
+		list[tuple[str, ufl.form.Form]]
+			The names and UFL forms of the problem.
+		"""
+
+		return _collect_forms(self.shape_form_handler, 'shape_form_handler') \
+			   + _collect_forms(self.shape_form_handler.regularization, 'shape_form_handler.regularization') \
+			   + OptimizationProblem._forms_to_compile(self, algorithm)
+
+
+
 	def compute_shape_gradient(self):
 		"""Solves the Riesz problem to determine the shape gradient.
 
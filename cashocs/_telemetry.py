@@ -0,0 +1,315 @@
+# Copyright (C) 2020 Sebastian Blauth
+#
+# This file is part of CASHOCS.
+#
+# CASHOCS is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# CASHOCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CASHOCS.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Convergence telemetry of the PETSc KSP solves.
+
+For each solve of a linear system, the number of iterations, the final residual
+norm, the converged reason as well as the setup and solve times are recorded
+by the (module level) :py:data:`telemetry`, which is activated by the optimization
+algorithms via the config file. The records are grouped by the role of the
+solver (e.g. state, adjoint, or Riesz projection) and are tagged with the
+iteration of the optimization algorithm.
+"""
+
+from time import perf_counter
+
+import numpy as np
+
+
+
+_record_type = np.dtype([('iteration', 'i4'), ('ksp_iterations', 'i4'), ('converged_reason', 'i2'),
+						 ('residual_norm', 'f8'), ('setup_time', 'f8'), ('solve_time', 'f8')])
+
+
+
+class _NoMonitor:
+	"""A context manager which does nothing, used if the telemetry is inactive.
+
+	"""
+
+	__slots__ = ()
+
+	def __enter__(self):
+		pass
+
+
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		return False
+
+
+
+
+
+class _Monitor:
+	"""A context manager which records a single KSP solve.
+
+	"""
+
+	__slots__ = ('telemetry', 'ksp', 'role', 'setup_time', 'start')
+
+	def __init__(self, telemetry, ksp, role):
+		"""Initializes the monitor.
+
+		Parameters
+		----------
+		telemetry : KSPTelemetry
+			The telemetry which collects the records.
+		ksp : petsc4py.PETSc.KSP
+			The KSP object which is monitored.
+		role : str
+			The role of the solver.
+		"""
+
+		self.telemetry = telemetry
+		self.ksp = ksp
+		self.role = role
+		self.setup_time = 0.0
+		self.start = 0.0
+
+
+
+	def __enter__(self):
+		# the setup (e.g. the factorization) is done explicitly, so that it is timed separately
+		start = perf_counter()
+		self.ksp.setUp()
+		self.start = perf_counter()
+		self.setup_time = self.start - start
+
+
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		if exc_type is None:
+			solve_time = perf_counter() - self.start
+			self.telemetry.add(self.role, self.ksp.getIterationNumber(), self.ksp.getConvergedReason(),
+							   self.ksp.getResidualNorm(), self.setup_time, solve_time)
+
+		return False
+
+
+
+
+
+class KSPTelemetry:
+	"""Records the convergence of the PETSc KSP solves.
+
+	The records of each role are stored in a (growing) structured numpy array.
+	When the telemetry is inactive, no records are created and the solves
+	are not monitored.
+	"""
+
+	fields = list(_record_type.names)
+
+	def __init__(self):
+		"""Initializes the (inactive) telemetry.
+
+		"""
+
+		self.__inactive = _NoMonitor()
+		self.reset(False)
+
+
+
+	def reset(self, active, state=None):
+		"""Deletes all records.
+
+		Parameters
+		----------
+		active : bool
+			Whether the telemetry is active.
+		state : dict or None, optional
+			The records of a previous telemetry, obtained by :py:meth:`state`,
+			which are restored (e.g. after remeshing). If this is ``None``, the
+			records start empty (default is ``None``).
+
+		Returns
+		-------
+		None
+		"""
+
+		self.is_active = active
+		self.iteration = 0
+		self.records = {}
+		self.sizes = {}
+
+		if state is not None:
+			self.iteration = state['iteration']
+			for role, columns in state['records'].items():
+				size = len(columns['iteration'])
+				self.records[role] = np.zeros(max(size, 16), dtype=_record_type)
+				for field in self.fields:
+					self.records[role][field][:size] = columns[field]
+				self.sizes[role] = size
+
+
+
+	def monitor(self, ksp, role):
+		"""Returns a context manager which records a KSP solve.
+
+		Parameters
+		----------
+		ksp : petsc4py.PETSc.KSP
+			The KSP object which is used for the solve.
+		role : str
+			The role of the solver, e.g., ``'state'`` or ``'adjoint'``.
+
+		Returns
+		-------
+		_Monitor or _NoMonitor
+			The context manager, which does nothing if the telemetry is inactive.
+		"""
+
+		if self.is_active:
+			return _Monitor(self, ksp, role)
+		else:
+			return self.__inactive
+
+
+
+	def add(self, role, ksp_iterations, converged_reason, residual_norm, setup_time, solve_time):
+		"""Adds a record for a KSP solve.
+
+		Parameters
+		----------
+		role : str
+			The role of the solver.
+		ksp_iterations : int
+			The number of iterations of the KSP.
+		converged_reason : int
+			The converged reason of the KSP.
+		residual_norm : float
+			The (preconditioned) residual norm after the solve.
+		setup_time : float
+			The time needed for the setup of the KSP, e.g., for the preconditioner.
+		solve_time : float
+			The time needed for the solve.
+
+		Returns
+		-------
+		None
+		"""
+
+		if role not in self.records.keys():
+			self.records[role] = np.zeros(16, dtype=_record_type)
+			self.sizes[role] = 0
+
+		size = self.sizes[role]
+		if size == len(self.records[role]):
+			self.records[role] = np.concatenate([self.records[role], np.zeros(size, dtype=_record_type)])
+
+		self.records[role][size] = (self.iteration, ksp_iterations, converged_reason, residual_norm, setup_time, solve_time)
+		self.sizes[role] = size + 1
+
+
+
+	def record(self):
+		"""Starts a new iteration of the optimization algorithm.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.is_active:
+			self.iteration += 1
+
+
+
+	def rollback(self):
+		"""Adds the solves of the last iteration to the current one again.
+
+		This is used when an iteration is repeated, e.g., after remeshing.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.is_active and self.iteration > 0:
+			self.iteration -= 1
+			for role in self.records.keys():
+				data = self.records[role][:self.sizes[role]]
+				data['iteration'][data['iteration'] > self.iteration] = self.iteration
+
+
+
+	def data(self, role):
+		"""Returns the records of a role.
+
+		Parameters
+		----------
+		role : str
+			The role of the solver.
+
+		Returns
+		-------
+		numpy.ndarray
+			A structured array with the fields :py:attr:`fields`, one entry per solve.
+		"""
+
+		return self.records[role][:self.sizes[role]]
+
+
+
+	def state(self):
+		"""Returns the records as lists, which can be saved as json.
+
+		Returns
+		-------
+		dict
+			The current iteration and, for each role, the records stored column-wise.
+		"""
+
+		records = {role : {field : self.data(role)[field].tolist() for field in self.fields} for role in self.records.keys()}
+
+		return {'iteration' : self.iteration, 'records' : records}
+
+
+
+	def summary(self):
+		"""Aggregates the records per role and iteration of the optimization algorithm.
+
+		Returns
+		-------
+		dict
+			For each role, the number of solves, the total number of KSP iterations,
+			the maximum final residual norm, and the total setup and solve times
+			per iteration of the optimization algorithm. Solves after the last
+			iteration are added to the last one.
+		"""
+
+		no_iterations = max(self.iteration, 1)
+		summary = {}
+		for role in self.records.keys():
+			data = self.data(role)
+			iterations = np.minimum(data['iteration'], no_iterations - 1)
+			maximum_residuals = np.zeros(no_iterations)
+			np.maximum.at(maximum_residuals, iterations, data['residual_norm'])
+
+			summary[role] = {
+				'solves' : np.bincount(iterations, minlength=no_iterations).tolist(),
+				'ksp_iterations' : np.bincount(iterations, weights=data['ksp_iterations'], minlength=no_iterations).astype(int).tolist(),
+				'residual_norm' : maximum_residuals.tolist(),
+				'setup_time' : np.bincount(iterations, weights=data['setup_time'], minlength=no_iterations).tolist(),
+				'solve_time' : np.bincount(iterations, weights=data['solve_time'], minlength=no_iterations).tolist()
+			}
+
+		return summary
+
+
+
+telemetry = KSPTelemetry()
@@ -0,0 +1,214 @@
+# Copyright (C) 2020 Sebastian Blauth
+#
+# This file is part of CASHOCS.
+#
+# CASHOCS is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# CASHOCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CASHOCS.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Timers for the phases of the optimization algorithms.
+
+The timings are collected by the (module level) :py:data:`timer`, which is
+activated by the optimization algorithms via the config file, and are
+aggregated per iteration of the optimization algorithm.
+"""
+
+from time import perf_counter
+
+
+
+class _Phase:
+	"""A context manager which measures the time spent in a single phase.
+
+	Nested uses of the same phase are only counted once.
+	"""
+
+	__slots__ = ('timer', 'name', 'depth', 'start')
+
+	def __init__(self, timer, name):
+		"""Initializes the phase.
+
+		Parameters
+		----------
+		timer : PhaseTimer
+			The timer which collects the timings.
+		name : str
+			The name of the phase.
+		"""
+
+		self.timer = timer
+		self.name = name
+		self.depth = 0
+		self.start = 0.0
+
+
+
+	def __enter__(self):
+		if self.timer.is_active:
+			if self.depth == 0:
+				self.start = perf_counter()
+			self.depth += 1
+
+
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		if self.timer.is_active and self.depth > 0:
+			self.depth -= 1
+			if self.depth == 0:
+				self.timer.current[self.name] += perf_counter() - self.start
+
+		return False
+
+
+
+
+
+class PhaseTimer:
+	"""Collects the time spent in the phases of an optimization algorithm.
+
+	The timings of different phases may overlap, e.g., the time for the assembly
+	and the KSP solves within a Newton solve are also counted for the
+	Newton method. When the timer is inactive, the phases only check
+	a flag, so that the overhead is negligible.
+	"""
+
+	phases = ['assembly', 'ksp', 'newton', 'riesz', 'line_search', 'mesh_quality', 'remeshing']
+
+	def __init__(self):
+		"""Initializes the (inactive) timer.
+
+		"""
+
+		self.__phases = {name : _Phase(self, name) for name in self.phases}
+		self.reset(False)
+
+
+
+	def reset(self, active, state=None):
+		"""Resets the timings.
+
+		Parameters
+		----------
+		active : bool
+			Whether the timer is active.
+		state : dict or None, optional
+			The state of a previous timer, obtained by :py:meth:`state`, which
+			is restored (e.g. after remeshing). If this is ``None``, the timings
+			start from zero (default is ``None``).
+
+		Returns
+		-------
+		None
+		"""
+
+		self.is_active = active
+		for phase in self.__phases.values():
+			phase.depth = 0
+
+		self.history = {name : [] for name in self.phases + ['total']}
+		self.current = dict.fromkeys(self.phases, 0.0)
+		self.last_record = perf_counter()
+
+		if state is not None:
+			for name in self.history.keys():
+				self.history[name] = list(state['history'].get(name, []))
+			for name in self.phases:
+				self.current[name] = state['current'].get(name, 0.0)
+			self.last_record -= state['current'].get('total', 0.0)
+
+
+
+	def phase(self, name):
+		"""Returns the context manager for a phase.
+
+		Parameters
+		----------
+		name : str
+			The name of the phase, one of :py:attr:`phases`.
+
+		Returns
+		-------
+		_Phase
+			The context manager measuring the time of the phase.
+		"""
+
+		return self.__phases[name]
+
+
+
+	def record(self):
+		"""Stores the timings of the current iteration and starts a new one.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.is_active:
+			now = perf_counter()
+			for name in self.phases:
+				self.history[name].append(self.current[name])
+				self.current[name] = 0.0
+			self.history['total'].append(now - self.last_record)
+			self.last_record = now
+
+
+
+	def rollback(self):
+		"""Adds the timings of the last iteration to the current one again.
+
+		This is used when an iteration is repeated, e.g., after remeshing.
+
+		Returns
+		-------
+		None
+		"""
+
+		if self.is_active and len(self.history['total']) > 0:
+			for name in self.phases:
+				self.current[name] += self.history[name].pop()
+			self.last_record -= self.history['total'].pop()
+
+
+
+	def state(self):
+		"""Returns the state of the timer, which can be saved as json.
+
+		Returns
+		-------
+		dict
+			The timings of the previous iterations and of the current one.
+		"""
+
+		current = dict(self.current)
+		current['total'] = perf_counter() - self.last_record
+
+		return {'history' : self.history, 'current' : current}
+
+
+
+	def summary(self):
+		"""Computes the total time spent in each phase.
+
+		Returns
+		-------
+		dict
+			The total times (in seconds) of the phases, including the current iteration.
+		"""
+
+		state = self.state()
+
+		return {name : sum(state['history'][name]) + state['current'][name] for name in self.history.keys()}
+
+
+
+timer = PhaseTimer()
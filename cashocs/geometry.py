@@ -24,6 +24,7 @@ and :py:func:`regular_box_mesh <cashocs.geometry.regular_box_mesh>` commands cre
 which are great for testing.
 """
 
+import argparse
 import configparser
 import json
 import os
@@ -37,7 +38,9 @@ from petsc4py import PETSc
 from ufl import Jacobian, JacobianInverse
 
 from ._exceptions import ConfigError, InputError, CashocsException
-from .utils import (_assemble_petsc_system, _setup_petsc_options,
+from ._telemetry import telemetry
+from ._timing import timer
+from .utils import (_assemble_petsc_system, _global_all, _global_sum, _setup_petsc_options,
 					_solve_linear_problem, write_out_mesh)
 
 
@@ -407,6 +410,17 @@ class _MeshHandler:
 		self.bbtree = self.mesh.bounding_box_tree()
 		self.config = self.shape_form_handler.config
 
+		# Reference data for the a posteriori mesh check
+		self.comm = self.mesh.mpi_comm()
+		self.cells = self.mesh.cells()
+		self.global_vertex_indices = np.asarray(self.mesh.topology().global_indices(0), dtype=int)
+		self.global_cells = self.global_vertex_indices[self.cells]
+		self.boundary_vertices = fenics.BoundaryMesh(self.mesh, 'exterior').entity_map(0).array()
+		# for manifold meshes, the orientation is measured relative to the undeformed cells
+		self.is_manifold = (self.mesh.topology().dim() != self.mesh.geometric_dimension())
+		self.reference_edges = self.__edges(self.mesh.coordinates()) if self.is_manifold else None
+		self.reference_orientation = np.sign(self.__signed_volumes(self.mesh.coordinates()))
+
 		# setup from config
 		self.volume_change = float(self.config.get('MeshQuality', 'volume_change', fallback='inf'))
 		self.angle_change = float(self.config.get('MeshQuality', 'angle_change', fallback='inf'))
@@ -435,6 +449,7 @@ class _MeshHandler:
 
 		# Remeshing initializations
 		self.do_remesh = self.config.getboolean('Mesh', 'remesh', fallback=False)
+		self.remesh_in_process = self.config.getboolean('Mesh', 'remesh_in_process', fallback=False)
 		self.save_optimized_mesh = self.config.getboolean('Output', 'save_mesh', fallback=False)
 
 		if self.do_remesh or self.save_optimized_mesh:
@@ -456,10 +471,11 @@ class _MeshHandler:
 				raise ConfigError('Mesh', 'gmsh_file', 'Not a valid gmsh file. Has to end in .msh')
 
 			self.remesh_directory = self.mesh_directory + '/cashocs_remesh'
-			if not os.path.exists(self.remesh_directory):
-				os.mkdir(self.remesh_directory)
-			if not ('_cashocs_remesh_flag' in sys.argv):
-				os.system('rm -r ' + self.remesh_directory + '/*')
+			if self.comm.Get_rank() == 0:
+				if not os.path.exists(self.remesh_directory):
+					os.mkdir(self.remesh_directory)
+				if not ('_cashocs_remesh_flag' in sys.argv) and self.remesh_counter == 0:
+					os.system('rm -r ' + self.remesh_directory + '/*')
 			self.remesh_geo_file = self.remesh_directory + '/remesh.geo'
 
 		elif self.save_optimized_mesh:
@@ -469,9 +485,12 @@ class _MeshHandler:
 		if self.do_remesh and self.remesh_counter == 0:
 			self.gmsh_file_init = self.remesh_directory + '/mesh_' + format(self.remesh_counter, 'd') + '.msh'
 			copy_mesh = 'cp ' + self.gmsh_file + ' ' + self.gmsh_file_init
-			os.system(copy_mesh)
+			if self.comm.Get_rank() == 0:
+				os.system(copy_mesh)
 			self.gmsh_file = self.gmsh_file_init
 
+		self.comm.barrier()
+
 
 
 	def move_mesh(self, transformation):
@@ -585,9 +604,9 @@ class _MeshHandler:
 		else:
 			self.search_direction_container.vector()[:] = search_direction.vector()[:]
 			A, b = _assemble_petsc_system(self.a_frobenius, self.L_frobenius)
-			x = _solve_linear_problem(self.ksp_frobenius, A, b)
+			x = _solve_linear_problem(self.ksp_frobenius, A, b, role='mesh_quality')
 
-			frobenius_norm = np.max(x[:])
+			frobenius_norm = x.max()[1]
 			beta_armijo = self.config.getfloat('OptimizationRoutine', 'beta_armijo', fallback=2)
 
 			return np.maximum(np.ceil(np.log(self.angle_change/stepsize/frobenius_norm)/np.log(1/beta_armijo)), 0.0)
@@ -648,12 +667,13 @@ class _MeshHandler:
 
 		if self.volume_change < float('inf'):
 
-			self.transformation_container.vector()[:] = transformation.vector()[:]
-			A, b = _assemble_petsc_system(self.a_prior, self.L_prior)
-			x = _solve_linear_problem(self.ksp_prior, A, b)
+			with timer.phase('mesh_quality'):
+				self.transformation_container.vector()[:] = transformation.vector()[:]
+				A, b = _assemble_petsc_system(self.a_prior, self.L_prior)
+				x = _solve_linear_problem(self.ksp_prior, A, b, role='mesh_quality')
 
-			min_det = np.min(x[:])
-			max_det = np.max(x[:])
+			min_det = x.min()[1]
+			max_det = x.max()[1]
 
 			return (min_det >= 1/self.volume_change) and (max_det <= self.volume_change)
 
@@ -662,6 +682,86 @@ class _MeshHandler:
 
 
 
+	def __edges(self, coordinates):
+		"""Computes the edge vectors, starting at the first vertex, of all cells of the mesh.
+
+		Parameters
+		----------
+		coordinates : numpy.ndarray
+			The vertex coordinates of the mesh.
+
+		Returns
+		-------
+		numpy.ndarray
+			The edge vectors, stored row-wise for each cell.
+		"""
+
+		base_points = coordinates[self.cells[:, 0]]
+
+		return coordinates[self.cells[:, 1:]] - base_points[:, np.newaxis, :]
+
+
+
+	def __signed_volumes(self, coordinates):
+		r"""Computes the (scaled) signed volumes of all cells of the mesh.
+
+		The signed volume is given by the determinant of the edge vectors
+		of each simplex, which is computed for all cells simultaneously.
+		For manifold meshes (e.g. surfaces in 3D), where the matrix :math:`E`
+		of the edge vectors is not square, the volume is given by
+		:math:`\sqrt{\det(E E^T)}`, and its sign is the one of
+		:math:`\det(E E_0^T)`, where :math:`E_0` are the edges of the undeformed
+		cell, i.e., it is negative if the orientation (e.g. the normal) of the cell is flipped.
+
+		Parameters
+		----------
+		coordinates : numpy.ndarray
+			The vertex coordinates of the mesh.
+
+		Returns
+		-------
+		numpy.ndarray
+			The signed volumes of the cells (up to the factor 1/d!).
+		"""
+
+		edges = self.__edges(coordinates)
+
+		if not self.is_manifold:
+			return np.linalg.det(edges)
+		else:
+			gram = np.matmul(edges, np.transpose(edges, (0, 2, 1)))
+			orientation = np.linalg.det(np.matmul(edges, np.transpose(self.reference_edges, (0, 2, 1))))
+			return np.sqrt(np.maximum(np.linalg.det(gram), 0.0))*np.sign(orientation)
+
+
+
+	def __count_collisions(self, points, indices):
+		"""Counts the local cells which contain the given vertices.
+
+		Parameters
+		----------
+		points : numpy.ndarray
+			The coordinates of the vertices.
+		indices : numpy.ndarray
+			The global indices of the vertices.
+
+		Returns
+		-------
+		numpy.ndarray
+			The number of local cells containing each point (first row), and the
+			number of these cells which have the point as vertex (second row).
+		"""
+
+		counts = np.zeros((2, len(indices)), dtype=int)
+		for k in range(len(indices)):
+			cells_idx = self.bbtree.compute_entity_collisions(fenics.Point(points[k]))
+			counts[0, k] = len(cells_idx)
+			counts[1, k] = np.count_nonzero(self.global_cells[cells_idx] == indices[k])
+
+		return counts
+
+
+
 	def __test_a_posteriori(self):
 		"""Checks the quality of the transformation after the actual mesh is moved.
 
@@ -678,29 +778,50 @@ class _MeshHandler:
 		-----
 		fenics itself does not check whether the used mesh is a valid finite
 		element mesh, so this check has to be done manually.
+
+		First, the orientation of all cells is compared to the one of the
+		undeformed mesh, which detects inverted and degenerate elements.
+		If all cells keep their orientation, elements can only overlap if the
+		boundary of the mesh folds onto itself, so that the (expensive)
+		collision test only has to be carried out for the boundary vertices.
+
+		For distributed meshes, the boundary vertices of each process are only
+		sent to the processes whose bounding box contains them, which test them
+		against their local cells. The number of collisions is then compared to
+		the number of cells containing the vertex (identified by its global index)
+		over all processes.
 		"""
 
-		mesh = self.mesh
-		cells = mesh.cells()
-		coordinates = mesh.coordinates()
-		self_intersections = False
-		for i in range(coordinates.shape[0]):
-			x = fenics.Point(coordinates[i])
-			cells_idx = self.bbtree.compute_entity_collisions(x)
-			intersections = len(cells_idx)
-			M = cells[cells_idx]
-			occurences = M.flatten().tolist().count(i)
-
-			if intersections > occurences:
-				self_intersections = True
-				break
-
-		if self_intersections:
-			self.revert_transformation()
-			return False
-		else:
-			self.compute_mesh_quality()
-			return True
+		with timer.phase('mesh_quality'):
+			coordinates = self.mesh.coordinates()
+
+			orientation = np.sign(self.__signed_volumes(coordinates))
+			self_intersections = not _global_all(np.all(orientation == self.reference_orientation), self.comm)
+
+			if not self_intersections:
+				indices = self.global_vertex_indices[self.boundary_vertices]
+				points = coordinates[self.boundary_vertices]
+
+				if self.comm.Get_size() == 1:
+					counts = self.__count_collisions(points, indices)
+				else:
+					boxes = self.comm.allgather((np.min(coordinates, axis=0), np.max(coordinates, axis=0)))
+					masks = [np.all((points >= lower - 1e-12) & (points <= upper + 1e-12), axis=1) for lower, upper in boxes]
+					received = self.comm.alltoall([(points[mask], indices[mask]) for mask in masks])
+					returned = self.comm.alltoall([self.__count_collisions(rank_points, rank_indices) for rank_points, rank_indices in received])
+
+					counts = np.zeros((2, len(indices)), dtype=int)
+					for mask, rank_counts in zip(masks, returned):
+						counts[:, mask] += rank_counts
+
+				self_intersections = not _global_all(not np.any(counts[0] > counts[1]), self.comm)
+
+			if self_intersections:
+				self.revert_transformation()
+				return False
+			else:
+				self.compute_mesh_quality()
+				return True
 
 
 
@@ -715,25 +836,26 @@ class _MeshHandler:
 		None
 		"""
 
-		if self.mesh_quality_type in ['min', 'minimum']:
-			if self.mesh_quality_measure == 'skewness':
-				self.current_mesh_quality = MeshQuality.min_skewness(self.mesh)
-			elif self.mesh_quality_measure == 'maximum_angle':
-				self.current_mesh_quality = MeshQuality.min_maximum_angle(self.mesh)
-			elif self.mesh_quality_measure == 'radius_ratios':
-				self.current_mesh_quality = MeshQuality.min_radius_ratios(self.mesh)
-			elif self.mesh_quality_measure == 'condition_number':
-				self.current_mesh_quality = MeshQuality.min_condition_number(self.mesh)
+		with timer.phase('mesh_quality'):
+			if self.mesh_quality_type in ['min', 'minimum']:
+				if self.mesh_quality_measure == 'skewness':
+					self.current_mesh_quality = MeshQuality.min_skewness(self.mesh)
+				elif self.mesh_quality_measure == 'maximum_angle':
+					self.current_mesh_quality = MeshQuality.min_maximum_angle(self.mesh)
+				elif self.mesh_quality_measure == 'radius_ratios':
+					self.current_mesh_quality = MeshQuality.min_radius_ratios(self.mesh)
+				elif self.mesh_quality_measure == 'condition_number':
+					self.current_mesh_quality = MeshQuality.min_condition_number(self.mesh)
 
-		else:
-			if self.mesh_quality_measure == 'skewness':
-				self.current_mesh_quality = MeshQuality.avg_skewness(self.mesh)
-			elif self.mesh_quality_measure == 'maximum_angle':
-				self.current_mesh_quality = MeshQuality.avg_maximum_angle(self.mesh)
-			elif self.mesh_quality_measure == 'radius_ratios':
-				self.current_mesh_quality = MeshQuality.avg_radius_ratios(self.mesh)
-			elif self.mesh_quality_measure == 'condition_number':
-				self.current_mesh_quality = MeshQuality.avg_condition_number(self.mesh)
+			else:
+				if self.mesh_quality_measure == 'skewness':
+					self.current_mesh_quality = MeshQuality.avg_skewness(self.mesh)
+				elif self.mesh_quality_measure == 'maximum_angle':
+					self.current_mesh_quality = MeshQuality.avg_maximum_angle(self.mesh)
+				elif self.mesh_quality_measure == 'radius_ratios':
+					self.current_mesh_quality = MeshQuality.avg_radius_ratios(self.mesh)
+				elif self.mesh_quality_measure == 'condition_number':
+					self.current_mesh_quality = MeshQuality.avg_condition_number(self.mesh)
 
 
 
@@ -780,7 +902,11 @@ class _MeshHandler:
 		"""Remeshes the current geometry with GMSH.
 
 		Performs a remeshing of the geometry, and then restarts
-		the optimization problem with the new mesh.
+		the optimization problem with the new mesh. If the config option
+		``remesh_in_process`` of section ``Mesh`` is ``True``, the
+		python interpreter is not restarted. Instead, the method returns
+		and the optimization problem is re-initialized on the new mesh
+		in :py:meth:`ShapeOptimizationProblem.solve <cashocs.ShapeOptimizationProblem.solve>`.
 
 		Returns
 		-------
@@ -788,43 +914,66 @@ class _MeshHandler:
 		"""
 
 		if self.do_remesh:
-			self.remesh_counter += 1
-			self.temp_file = self.remesh_directory + '/mesh_' + format(self.remesh_counter, 'd') + '_pre_remesh' + '.msh'
-			write_out_mesh(self.mesh, self.gmsh_file, self.temp_file)
-			self.__generate_remesh_geo(self.temp_file)
-
-			# save the output dict (without the last entries since they are "remeshed")
-			self.temp_dict['output_dict'] = {}
-			self.temp_dict['output_dict']['state_solves'] = self.shape_optimization_problem.state_problem.number_of_solves
-			self.temp_dict['output_dict']['adjoint_solves'] = self.shape_optimization_problem.adjoint_problem.number_of_solves
-			self.temp_dict['output_dict']['iterations'] = self.shape_optimization_problem.solver.iteration
-
-			self.temp_dict['output_dict']['cost_function_value'] = self.shape_optimization_problem.solver.output_dict['cost_function_value'][:-1]
-			self.temp_dict['output_dict']['gradient_norm'] = self.shape_optimization_problem.solver.output_dict['gradient_norm'][:-1]
-			self.temp_dict['output_dict']['stepsize'] = self.shape_optimization_problem.solver.output_dict['stepsize'][:-1]
-			self.temp_dict['output_dict']['MeshQuality'] = self.shape_optimization_problem.solver.output_dict['MeshQuality'][:-1]
-
-			dim = self.mesh.geometric_dimension()
-
-			self.new_gmsh_file = self.remesh_directory + '/mesh_' + format(self.remesh_counter, 'd') + '.msh'
-			gmsh_command = 'gmsh ' + self.remesh_geo_file + ' -' + str(int(dim)) + ' -o ' + self.new_gmsh_file
-			if not self.config.getboolean('Mesh', 'show_gmsh_output', fallback=False):
-				os.system(gmsh_command + ' >/dev/null 2>&1')
-			else:
-				os.system(gmsh_command)
-
-
-			self.temp_dict['remesh_counter'] = self.remesh_counter
-
-			# rename_command = 'mv ' + self.temp_file + ' ' + self.new_gmsh_file
-			# os.system(rename_command)
-
-			self.new_xdmf_file = self.remesh_directory + '/mesh_' + format(self.remesh_counter, 'd') + '.xdmf'
-			convert_command = 'cashocs-convert ' + self.new_gmsh_file + ' ' + self.new_xdmf_file
-			os.system(convert_command)
+			# the last iteration is repeated on the new mesh
+			timer.rollback()
+			telemetry.rollback()
+			history_writer = self.shape_optimization_problem.solver.history_writer
+			if history_writer is not None:
+				history_writer.write({'rollback' : 1})
+				history_writer.close()
+			with timer.phase('remeshing'):
+				self.remesh_counter += 1
+				self.temp_file = self.remesh_directory + '/mesh_' + format(self.remesh_counter, 'd') + '_pre_remesh' + '.msh'
+				write_out_mesh(self.mesh, self.gmsh_file, self.temp_file)
+				# the files are only generated by the first process
+				is_root = (self.comm.Get_rank() == 0)
+				if is_root:
+					self.__generate_remesh_geo(self.temp_file)
+
+				# save the output dict (without the last entries since they are "remeshed")
+				self.temp_dict['output_dict'] = {}
+				self.temp_dict['output_dict']['state_solves'] = self.shape_optimization_problem.state_problem.number_of_solves
+				self.temp_dict['output_dict']['adjoint_solves'] = self.shape_optimization_problem.adjoint_problem.number_of_solves
+				self.temp_dict['output_dict']['iterations'] = self.shape_optimization_problem.solver.iteration
+
+				self.temp_dict['output_dict']['cost_function_value'] = self.shape_optimization_problem.solver.output_dict['cost_function_value'][:-1]
+				self.temp_dict['output_dict']['gradient_norm'] = self.shape_optimization_problem.solver.output_dict['gradient_norm'][:-1]
+				self.temp_dict['output_dict']['stepsize'] = self.shape_optimization_problem.solver.output_dict['stepsize'][:-1]
+				self.temp_dict['output_dict']['MeshQuality'] = self.shape_optimization_problem.solver.output_dict['MeshQuality'][:-1]
+
+				dim = self.mesh.geometric_dimension()
+
+				self.new_gmsh_file = self.remesh_directory + '/mesh_' + format(self.remesh_counter, 'd') + '.msh'
+				gmsh_command = 'gmsh ' + self.remesh_geo_file + ' -' + str(int(dim)) + ' -o ' + self.new_gmsh_file
+				if is_root:
+					if not self.config.getboolean('Mesh', 'show_gmsh_output', fallback=False):
+						os.system(gmsh_command + ' >/dev/null 2>&1')
+					else:
+						os.system(gmsh_command)
+
+
+				self.temp_dict['remesh_counter'] = self.remesh_counter
+
+				# rename_command = 'mv ' + self.temp_file + ' ' + self.new_gmsh_file
+				# os.system(rename_command)
+
+				self.new_xdmf_file = self.remesh_directory + '/mesh_' + format(self.remesh_counter, 'd') + '.xdmf'
+				if is_root:
+					if self.remesh_in_process:
+						# imported here, so that meshio is only loaded when it is needed
+						from ._cli import convert
+						convert(argparse.Namespace(infile=self.new_gmsh_file, outfile=self.new_xdmf_file))
+					else:
+						convert_command = 'cashocs-convert ' + self.new_gmsh_file + ' ' + self.new_xdmf_file
+						os.system(convert_command)
+				self.comm.barrier()
 
 			self.temp_dict['mesh_file'] = self.new_xdmf_file
 			self.temp_dict['gmsh_file'] = self.new_gmsh_file
+			if timer.is_active:
+				self.temp_dict['output_dict']['timings'] = timer.state()
+			if telemetry.is_active:
+				self.temp_dict['output_dict']['ksp_telemetry'] = telemetry.state()
 
 			# test, whether the same geometry is remeshed again
 			if self.temp_dict['OptimizationRoutine']['iteration_counter'] == self.shape_optimization_problem.solver.iteration:
@@ -833,6 +982,9 @@ class _MeshHandler:
 			self.temp_dict['OptimizationRoutine']['iteration_counter'] = self.shape_optimization_problem.solver.iteration
 			self.temp_dict['OptimizationRoutine']['gradient_norm_initial'] = self.shape_optimization_problem.solver.gradient_norm_initial
 
+			if self.remesh_in_process:
+				return
+
 			self.temp_dir = self.temp_dict['temp_dir']
 
 			with open(self.temp_dir + '/temp_dict.json', 'w') as file:
@@ -876,6 +1028,14 @@ class MeshQuality:
 	    avg_cond = cashocs.MeshQuality.avg_condition_number(mesh)
 
 	This works analogously for any mesh compatible with FEniCS.
+
+	Notes
+	-----
+	The skewness and maximum angle measures are implemented as a C++ extension,
+	which is only compiled on first use (and not when importing cashocs). The
+	compiled extension is cached on disk by FEniCS' just-in-time compiler, so that
+	subsequent processes only have to load it. It can be built ahead of time with
+	:py:meth:`compile_extension <cashocs.geometry.MeshQuality.compile_extension>`.
 	"""
 
 	_cpp_code_mesh_quality = """
@@ -1042,7 +1202,7 @@ class MeshQuality:
 			}
 
 		"""
-	_quality_object = fenics.compile_cpp_code(_cpp_code_mesh_quality)
+	_quality_object = None
 
 
 
@@ -1051,6 +1211,71 @@ class MeshQuality:
 
 
 
+	@classmethod
+	def compile_extension(cls):
+		"""Compiles (or loads from the cache) the C++ extension for the quality measures.
+
+		This is done automatically on the first call of a quality measure which
+		requires the extension, but can also be triggered manually, e.g., to
+		populate the cache before many short-lived processes are started.
+
+		Returns
+		-------
+		object
+			The compiled extension module.
+		"""
+
+		if cls._quality_object is None:
+			cls._quality_object = fenics.compile_cpp_code(cls._cpp_code_mesh_quality)
+
+		return cls._quality_object
+
+
+
+	@staticmethod
+	def _minimum(mesh, values):
+		"""Computes the minimum of cellwise quality values over all processes.
+
+		Parameters
+		----------
+		mesh : dolfin.cpp.mesh.Mesh
+			The (possibly distributed) mesh.
+		values : numpy.ndarray
+			The quality values of the local cells.
+
+		Returns
+		-------
+		float
+			The minimum over all cells of the mesh.
+		"""
+
+		return fenics.MPI.min(mesh.mpi_comm(), float(np.min(values, initial=np.inf)))
+
+
+
+	@staticmethod
+	def _average(mesh, values):
+		"""Computes the average of cellwise quality values over all processes.
+
+		Parameters
+		----------
+		mesh : dolfin.cpp.mesh.Mesh
+			The (possibly distributed) mesh.
+		values : numpy.ndarray
+			The quality values of the local cells.
+
+		Returns
+		-------
+		float
+			The average over all cells of the mesh.
+		"""
+
+		total, count = _global_sum(np.array([np.sum(values), len(values)], dtype=float), mesh.mpi_comm())
+
+		return total / count
+
+
+
 	@classmethod
 	def min_skewness(cls, mesh):
 		r"""Computes the minimal skewness of the mesh.
@@ -1081,7 +1306,7 @@ class MeshQuality:
 			The skewness of the mesh.
 		"""
 
-		return np.min(cls._quality_object.skewness(mesh).array())
+		return cls._minimum(mesh, cls.compile_extension().skewness(mesh).array())
 
 
 
@@ -1115,7 +1340,7 @@ class MeshQuality:
 			The average skewness of the mesh.
 		"""
 
-		return np.average(cls._quality_object.skewness(mesh).array())
+		return cls._average(mesh, cls.compile_extension().skewness(mesh).array())
 
 
 
@@ -1146,7 +1371,7 @@ class MeshQuality:
 			The minimum value of the maximum angle quality measure.
 		"""
 
-		return np.min(cls._quality_object.maximum_angle(mesh).array())
+		return cls._minimum(mesh, cls.compile_extension().maximum_angle(mesh).array())
 
 
 
@@ -1177,7 +1402,7 @@ class MeshQuality:
 			The average quality, based on the maximum angle measure.
 		"""
 
-		return np.average(cls._quality_object.maximum_angle(mesh).array())
+		return cls._average(mesh, cls.compile_extension().maximum_angle(mesh).array())
 
 
 	@staticmethod
@@ -1204,7 +1429,7 @@ class MeshQuality:
 			The minimal radius ratio of the mesh.
 		"""
 
-		return np.min(fenics.MeshQuality.radius_ratios(mesh).array())
+		return MeshQuality._minimum(mesh, fenics.MeshQuality.radius_ratios(mesh).array())
 
 
 
@@ -1232,7 +1457,7 @@ class MeshQuality:
 			The average radius ratio of the mesh.
 		"""
 
-		return np.average(fenics.MeshQuality.radius_ratios(mesh).array())
+		return MeshQuality._average(mesh, fenics.MeshQuality.radius_ratios(mesh).array())
 
 
 
@@ -1277,9 +1502,9 @@ class MeshQuality:
 		cond = fenics.Function(DG0)
 
 		A, b = _assemble_petsc_system(a, L)
-		_solve_linear_problem(ksp, A, b, cond.vector().vec())
+		_solve_linear_problem(ksp, A, b, cond.vector().vec(), role='mesh_quality')
 
-		return np.min(np.sqrt(mesh.geometric_dimension()) / cond.vector()[:])
+		return MeshQuality._minimum(mesh, np.sqrt(mesh.geometric_dimension()) / cond.vector()[:])
 
 
 
@@ -1324,6 +1549,6 @@ class MeshQuality:
 		cond = fenics.Function(DG0)
 
 		A, b = _assemble_petsc_system(a, L)
-		_solve_linear_problem(ksp, A, b, cond.vector().vec())
+		_solve_linear_problem(ksp, A, b, cond.vector().vec(), role='mesh_quality')
 
-		return np.average(np.sqrt(mesh.geometric_dimension()) / cond.vector()[:])
+		return MeshQuality._average(mesh, np.sqrt(mesh.geometric_dimension()) / cond.vector()[:])
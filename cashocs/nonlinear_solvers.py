@@ -18,20 +18,23 @@
 """Custom solvers for nonlinear equations.
 
 This module has custom solvers for nonlinear PDEs, including a damped
-Newton methd. This is the only function at the moment, others might
-follow.
+Newton methd. The solver is available as function, and as class
+:py:class:`DampedNewtonSolver`, which can be reused for repeated solves.
 """
 
 import fenics
+import numpy as np
 from petsc4py import PETSc
 
 from ._exceptions import NotConvergedError, InputError
+from ._timing import timer
 from .utils import _setup_petsc_options, _solve_linear_problem
 
 
 
 def damped_newton_solve(F, u, bcs, rtol=1e-10, atol=1e-10, max_iter=50, convergence_type='combined', norm_type='l2',
-						damped=True, verbose=True, ksp=None):
+						damped=True, verbose=True, ksp=None, inexact=False, forcing_choice=1, frozen_jacobian=False,
+						refresh_threshold=0.5):
 	r"""A damped Newton method for solving nonlinear equations.
 
 	The damped Newton method is based on the natural monotonicity test from
@@ -57,6 +60,24 @@ def damped_newton_solve(F, u, bcs, rtol=1e-10, atol=1e-10, max_iter=50, converge
 
 	The norm chosen for the termination criterion is specified via ``norm_type``.
 
+	For the inexact Newton method (``inexact = True``), the relative tolerance
+	:math:`\eta_k` of the inner solver is chosen according to
+	`Eisenstat and Walker, Choosing the forcing terms in an inexact Newton method <https://doi.org/10.1137/0917003>`_,
+	i.e., either as
+
+	.. math:: \eta_k = \frac{\lvert \lvert\lvert F_k \rvert\rvert - \lvert\lvert F_{k-1} + F'_{k-1} \delta u_{k-1} \rvert\rvert \rvert}{\lvert\lvert F_{k-1} \rvert\rvert}
+
+	(``forcing_choice = 1``), or as
+
+	.. math:: \eta_k = \gamma \left( \frac{\lvert\lvert F_k \rvert\rvert}{\lvert\lvert F_{k-1} \rvert\rvert} \right)^\alpha
+
+	(``forcing_choice = 2``), together with the safeguards proposed there.
+
+	For the modified Newton method (``frozen_jacobian = True``), the Jacobian and its
+	factorization are reused as long as the contraction rate, i.e., the ratio of the
+	norms of the simplified and ordinary Newton increments (for ``damped = True``) or of
+	consecutive residuals (for ``damped = False``), is at most ``refresh_threshold``.
+
 	Parameters
 	----------
 	F : ufl.form.Form
@@ -90,6 +111,21 @@ def damped_newton_solve(F, u, bcs, rtol=1e-10, atol=1e-10, max_iter=50, converge
 		The PETSc ksp object used to solve the inner (linear) problem
 		if this is ``None`` it uses the direct solver MUMPS (default is
 		``None``).
+	inexact : bool, optional
+		If ``True``, an inexact Newton method is used, where the relative tolerance
+		of the inner (linear) solver is adapted with the forcing terms of Eisenstat
+		and Walker. This is only useful for iterative inner solvers (default is
+		``False``).
+	forcing_choice : {1, 2}, optional
+		Determines which of the forcing terms proposed by Eisenstat and Walker is used
+		for the inexact Newton method (default is ``1``).
+	frozen_jacobian : bool, optional
+		If ``True``, a modified Newton method is used, where the Jacobian (and its
+		factorization) is kept for several iterations. It is only updated when the
+		contraction rate becomes larger than ``refresh_threshold`` (default is ``False``).
+	refresh_threshold : float, optional
+		The threshold for the contraction rate, above which the Jacobian is updated
+		in case ``frozen_jacobian`` is ``True`` (default is ``0.5``).
 
 	Returns
 	-------
@@ -123,126 +159,410 @@ def damped_newton_solve(F, u, bcs, rtol=1e-10, atol=1e-10, max_iter=50, converge
 		cashocs.damped_newton_solve(F, u, bcs)
 	"""
 
-	if not convergence_type in ['rel', 'abs', 'combined']:
-		raise InputError('cashocs.nonlinear_solvers.damped_newton_solve', 'convergence_type', 'Input convergence_type has to be one of \'rel\', \'abs\', or \'combined\'.')
-
-	if not norm_type in ['l2', 'linf']:
-		raise InputError('cashocs.nonlinear_solvers.damped_newton_solve', 'norm_type', 'Input norm_type has to be one of \'l2\' or \'linf\'.')
-
-	# create the PETSc ksp
-	if ksp is None:
-		options = [[
-			['ksp_type', 'preonly'],
-			['pc_type', 'lu'],
-			['pc_factor_mat_solver_type', 'mumps'],
-			['mat_mumps_icntl_24', 1]
-		]]
-
-		ksp = PETSc.KSP().create()
-		_setup_petsc_options([ksp], options)
-		ksp.setFromOptions()
-
-	# Calculate the Jacobian.
-	dF = fenics.derivative(F, u)
-
-	# Setup increment and function for monotonicity test
-	V = u.function_space()
-	du = fenics.Function(V)
-	ddu = fenics.Function(V)
-	u_save = fenics.Function(V)
-
-	iterations = 0
-
-	[bc.apply(u.vector()) for bc in bcs]
-	# copy the boundary conditions and homogenize them for the increment
-	bcs_hom = [fenics.DirichletBC(bc) for bc in bcs]
-	[bc.homogenize() for bc in bcs_hom]
-
-	assembler = fenics.SystemAssembler(dF, -F, bcs_hom)
-	assembler.keep_diagonal = True
-	A_fenics = fenics.PETScMatrix()
-	residuum = fenics.PETScVector()
-
-	# Compute the initial residual
-	assembler.assemble(A_fenics, residuum)
-	A_fenics.ident_zeros()
-	A = fenics.as_backend_type(A_fenics).mat()
-	b = fenics.as_backend_type(residuum).vec()
-
-	res_0 = residuum.norm(norm_type)
-	if res_0 == 0.0:
-		if verbose:
-			print('Residual vanishes, input is already a solution.')
-		return u
-
-	res = res_0
-	if verbose:
-		print('Newton Iteration ' + format(iterations, '2d') + ' - residuum (abs):  '
+	solver = DampedNewtonSolver(F, u, bcs, rtol=rtol, atol=atol, max_iter=max_iter, convergence_type=convergence_type,
+								norm_type=norm_type, damped=damped, verbose=verbose, ksp=ksp, inexact=inexact,
+								forcing_choice=forcing_choice, frozen_jacobian=frozen_jacobian, refresh_threshold=refresh_threshold)
+
+	return solver.solve()
+
+
+
+
+
+class DampedNewtonSolver:
+	"""A reusable damped Newton method for solving nonlinear equations.
+
+	This implements the same method as :py:func:`damped_newton_solve`, but
+	the Jacobian, the homogenized boundary conditions, the assembler, and the
+	work functions are only created once. Hence, repeated solves of the same
+	nonlinear problem (e.g. for changing coefficients) only have to assemble
+	and solve the linear systems.
+
+	See Also
+	--------
+	damped_newton_solve : The corresponding function, which also documents the parameters.
+	"""
+
+	def __init__(self, F, u, bcs, rtol=1e-10, atol=1e-10, max_iter=50, convergence_type='combined', norm_type='l2',
+				 damped=True, verbose=True, ksp=None, inexact=False, forcing_choice=1, frozen_jacobian=False,
+				 refresh_threshold=0.5):
+		"""Initializes the damped Newton solver.
+
+		Parameters
+		----------
+		F : ufl.form.Form
+			The variational form of the nonlinear problem to be solved by Newton's method.
+		u : dolfin.function.function.Function
+			The sought solution / initial guess, which is overwritten by the solver.
+		bcs : list[dolfin.fem.dirichletbc.DirichletBC]
+			A list of DirichletBCs for the nonlinear variational problem.
+		rtol : float, optional
+			Default relative tolerance of the solver (default is ``rtol = 1e-10``).
+		atol : float, optional
+			Default absolute tolerance of the solver (default is ``atol = 1e-10``).
+		max_iter : int, optional
+			Maximum number of iterations carried out by the method
+			(default is ``max_iter = 50``).
+		convergence_type : {'combined', 'rel', 'abs'}
+			Determines the type of stopping criterion that is used.
+		norm_type : {'l2', 'linf'}
+			Determines which norm is used in the stopping criterion.
+		damped : bool, optional
+			If ``True``, then a damping strategy is used (default is ``True``).
+		verbose : bool, optional
+			If ``True``, prints status of the iteration to the console (default
+			is ``True``).
+		ksp : petsc4py.PETSc.KSP, optional
+			The PETSc ksp object used to solve the inner (linear) problem
+			if this is ``None`` it uses the direct solver MUMPS (default is
+			``None``).
+		inexact : bool, optional
+			If ``True``, the relative tolerance of the inner solver is chosen
+			with the Eisenstat-Walker forcing terms (default is ``False``).
+		forcing_choice : {1, 2}, optional
+			The choice of the Eisenstat-Walker forcing term (default is ``1``).
+		frozen_jacobian : bool, optional
+			If ``True``, the Jacobian is only updated when the contraction rate
+			exceeds ``refresh_threshold`` (default is ``False``).
+		refresh_threshold : float, optional
+			The threshold for the contraction rate, used for the update of the
+			Jacobian (default is ``0.5``).
+		"""
+
+		if not convergence_type in ['rel', 'abs', 'combined']:
+			raise InputError('cashocs.nonlinear_solvers.damped_newton_solve', 'convergence_type', 'Input convergence_type has to be one of \'rel\', \'abs\', or \'combined\'.')
+
+		if not norm_type in ['l2', 'linf']:
+			raise InputError('cashocs.nonlinear_solvers.damped_newton_solve', 'norm_type', 'Input norm_type has to be one of \'l2\' or \'linf\'.')
+
+		if not forcing_choice in [1, 2]:
+			raise InputError('cashocs.nonlinear_solvers.damped_newton_solve', 'forcing_choice', 'Input forcing_choice has to be either 1 or 2.')
+
+		self.F = F
+		self.u = u
+		self.bcs = bcs
+		self.rtol = rtol
+		self.atol = atol
+		self.max_iter = max_iter
+		self.convergence_type = convergence_type
+		self.norm_type = norm_type
+		self.damped = damped
+		self.verbose = verbose
+		self.inexact = inexact
+		self.forcing_choice = forcing_choice
+		self.frozen_jacobian = frozen_jacobian
+		self.refresh_threshold = refresh_threshold
+
+		# parameters for the Eisenstat-Walker forcing terms (as in PETSc's SNES)
+		self.eta_0 = 0.3
+		self.eta_max = 0.9
+		self.ew_gamma = 1.0
+		self.ew_alpha = (1 + np.sqrt(5))/2
+		self.ew_threshold = 0.1
+
+		# create the PETSc ksp
+		if ksp is None:
+			options = [[
+				['ksp_type', 'preonly'],
+				['pc_type', 'lu'],
+				['pc_factor_mat_solver_type', 'mumps'],
+				['mat_mumps_icntl_24', 1]
+			]]
+
+			ksp = PETSc.KSP().create()
+			_setup_petsc_options([ksp], options)
+			ksp.setFromOptions()
+		self.ksp = ksp
+
+		# Calculate the Jacobian.
+		self.dF = fenics.derivative(self.F, self.u)
+
+		# Setup increment and function for monotonicity test
+		V = self.u.function_space()
+		self.du = fenics.Function(V)
+		self.ddu = fenics.Function(V)
+		self.u_save = fenics.Function(V)
+
+		# copy the boundary conditions and homogenize them for the increment
+		self.bcs_hom = [fenics.DirichletBC(bc) for bc in self.bcs]
+		[bc.homogenize() for bc in self.bcs_hom]
+
+		self.assembler = fenics.SystemAssembler(self.dF, -self.F, self.bcs_hom)
+		self.assembler.keep_diagonal = True
+		self.A_fenics = fenics.PETScMatrix()
+		self.residuum = fenics.PETScVector()
+
+		self.iterations = 0
+		self.jacobian_refreshes = 0
+
+
+
+	def __compute_forcing_term(self, res, res_prev, res_lin, eta_prev, tol):
+		"""Computes the Eisenstat-Walker forcing term for the inexact Newton method.
+
+		Parameters
+		----------
+		res : float
+			The norm of the current residual.
+		res_prev : float
+			The norm of the previous residual.
+		res_lin : float
+			The norm of the residual of the previous linear model.
+		eta_prev : float
+			The previous forcing term.
+		tol : float
+			The tolerance of the Newton method.
+
+		Returns
+		-------
+		float
+			The relative tolerance for the inner solver.
+		"""
+
+		if self.iterations == 1:
+			eta = self.eta_0
+		elif self.forcing_choice == 1:
+			eta = abs(res - res_lin) / res_prev
+			eta_safe = pow(eta_prev, self.ew_alpha)
+			if eta_safe > self.ew_threshold:
+				eta = max(eta, eta_safe)
+		else:
+			eta = self.ew_gamma*pow(res / res_prev, self.ew_alpha)
+			eta_safe = self.ew_gamma*pow(eta_prev, self.ew_alpha)
+			if eta_safe > self.ew_threshold:
+				eta = max(eta, eta_safe)
+
+		# do not solve more accurately than needed for the termination
+		eta = max(eta, 0.5*tol/res)
+
+		return min(eta, self.eta_max)
+
+
+
+	def __print_residual(self, res, res_0, atol, rtol):
+		"""Prints the current residual to the console.
+
+		Parameters
+		----------
+		res : float
+			The current residual.
+		res_0 : float
+			The initial residual.
+		atol : float
+			The absolute tolerance.
+		rtol : float
+			The relative tolerance.
+
+		Returns
+		-------
+		None
+		"""
+
+		print('Newton Iteration ' + format(self.iterations, '2d') + ' - residuum (abs):  '
 			  + format(res, '.3e') + ' (tol = ' + format(atol, '.3e') + ')    residuum (rel): '
 			  + format(res/res_0, '.3e') + ' (tol = ' + format(rtol, '.3e') + ')')
 
-	if convergence_type == 'abs':
-		tol = atol
-	elif convergence_type == 'rel':
-		tol = rtol*res_0
-	else:
-		tol = rtol*res_0 + atol
-
-	# While loop until termination
-	while res > tol and iterations < max_iter:
-		iterations += 1
-		lmbd = 1.0
-		breakdown = False
-		u_save.vector()[:] = u.vector()[:]
-
-		# Solve the inner problem
-		_solve_linear_problem(ksp, A, b, du.vector().vec())
-
-		# perform backtracking in case damping is used
-		if damped:
-			while True:
-				u.vector()[:] += lmbd*du.vector()[:]
-				assembler.assemble(residuum)
-				b = fenics.as_backend_type(residuum).vec()
-				_solve_linear_problem(ksp=ksp, b=b, x=ddu.vector().vec())
-
-				if ddu.vector().norm(norm_type)/du.vector().norm(norm_type) <= 1:
-					break
-				else:
-					u.vector()[:] = u_save.vector()[:]
-					lmbd /= 2
 
-				if lmbd < 1e-6:
-					breakdown = True
-					break
 
-		else:
-			u.vector()[:] += du.vector()[:]
+	def solve(self, rtol=None, atol=None):
+		"""Solves the nonlinear problem.
+
+		Parameters
+		----------
+		rtol : float or None, optional
+			The relative tolerance for this solve. If this is ``None``, the
+			tolerance specified at initialization is used (default is ``None``).
+		atol : float or None, optional
+			The absolute tolerance for this solve. If this is ``None``, the
+			tolerance specified at initialization is used (default is ``None``).
+
+		Returns
+		-------
+		dolfin.function.function.Function
+			The solution of the nonlinear variational problem, if converged.
+			This overrides the function u.
+		"""
+
+		with timer.phase('newton'):
+			return self.__solve(rtol, atol)
+
+
+
+	def __assemble(self, *tensors):
+		"""Assembles the Jacobian and / or the residual.
+
+		Parameters
+		----------
+		*tensors : dolfin.cpp.la.Matrix or dolfin.cpp.la.Vector
+			The tensors into which the system is assembled.
+
+		Returns
+		-------
+		None
+		"""
+
+		with timer.phase('assembly'):
+			self.assembler.assemble(*tensors)
 
-		if breakdown:
-			raise NotConvergedError('Newton solver (state system)', 'Stepsize for increment too low.')
 
-		if iterations == max_iter:
-			raise NotConvergedError('Newton solver (state system)', 'Maximum number of iterations were exceeded.')
 
-		# compute the new residual
-		assembler.assemble(A_fenics, residuum)
-		A_fenics.ident_zeros()
-		A = fenics.as_backend_type(A_fenics).mat()
-		b = fenics.as_backend_type(residuum).vec()
+	def __solve(self, rtol, atol):
+		"""Solves the nonlinear problem with the damped Newton method.
 
-		[bc.apply(residuum) for bc in bcs_hom]
+		Parameters
+		----------
+		rtol : float or None
+			The relative tolerance for this solve.
+		atol : float or None
+			The absolute tolerance for this solve.
 
-		res = residuum.norm(norm_type)
-		if verbose:
-			print('Newton Iteration ' + format(iterations, '2d') + ' - residuum (abs):  '
-				  + format(res, '.3e') + ' (tol = ' + format(atol, '.3e') + ')    residuum (rel): '
-				  + format(res/res_0, '.3e') + ' (tol = ' + format(rtol, '.3e') + ')')
+		Returns
+		-------
+		dolfin.function.function.Function
+			The solution of the nonlinear variational problem.
+		"""
+
+		rtol = self.rtol if rtol is None else rtol
+		atol = self.atol if atol is None else atol
+
+		self.iterations = 0
+		self.jacobian_refreshes = 0
+		jacobian_is_current = True
+
+		[bc.apply(self.u.vector()) for bc in self.bcs]
+
+		# Compute the initial residual
+		self.__assemble(self.A_fenics, self.residuum)
+		self.A_fenics.ident_zeros()
+		A = fenics.as_backend_type(self.A_fenics).mat()
+		b = fenics.as_backend_type(self.residuum).vec()
+
+		res_0 = self.residuum.norm(self.norm_type)
+		if res_0 == 0.0:
+			if self.verbose:
+				print('Residual vanishes, input is already a solution.')
+			return self.u
+
+		res = res_0
+		if self.verbose:
+			self.__print_residual(res, res_0, atol, rtol)
+
+		if self.convergence_type == 'abs':
+			tol = atol
+		elif self.convergence_type == 'rel':
+			tol = rtol*res_0
+		else:
+			tol = rtol*res_0 + atol
+
+		if self.inexact:
+			ksp_rtol = self.ksp.getTolerances()[0]
+			res_prev = res
+			res_lin = res
+			eta = self.eta_0
+
+		# the linear tolerance is restored, also when the Newton solver does not converge
+		try:
+			# While loop until termination
+			while res > tol and self.iterations < self.max_iter:
+				self.iterations += 1
+				lmbd = 1.0
+				breakdown = False
+				self.u_save.vector()[:] = self.u.vector()[:]
+
+				if self.inexact:
+					eta = self.__compute_forcing_term(res, res_prev, res_lin, eta, tol)
+					self.ksp.setTolerances(rtol=eta)
+
+				# Solve the inner problem
+				_solve_linear_problem(self.ksp, A, b, self.du.vector().vec(), role='state')
+
+				if self.inexact:
+					res_prev = res
+					if self.forcing_choice == 1:
+						lin_residual = b.duplicate()
+						A.mult(self.du.vector().vec(), lin_residual)
+						lin_residual.axpy(-1.0, b)
+						res_lin = lin_residual.norm(PETSc.NormType.NORM_INFINITY if self.norm_type == 'linf' else PETSc.NormType.NORM_2)
+
+				# perform backtracking in case damping is used
+				if self.damped:
+					while True:
+						self.u.vector()[:] += lmbd*self.du.vector()[:]
+						self.__assemble(self.residuum)
+						b = fenics.as_backend_type(self.residuum).vec()
+						_solve_linear_problem(ksp=self.ksp, b=b, x=self.ddu.vector().vec(), role='state')
+
+						if self.ddu.vector().norm(self.norm_type)/self.du.vector().norm(self.norm_type) <= 1:
+							break
+						else:
+							self.u.vector()[:] = self.u_save.vector()[:]
+							lmbd /= 2
+
+						if lmbd < 1e-6:
+							breakdown = True
+							break
+
+				else:
+					self.u.vector()[:] += self.du.vector()[:]
+
+				if breakdown:
+					if self.frozen_jacobian and not jacobian_is_current:
+						# the damping failed with an outdated Jacobian, so it is updated at the last iterate
+						self.__assemble(self.A_fenics, self.residuum)
+						self.A_fenics.ident_zeros()
+						A = fenics.as_backend_type(self.A_fenics).mat()
+						b = fenics.as_backend_type(self.residuum).vec()
+						self.jacobian_refreshes += 1
+						jacobian_is_current = True
+						continue
+					raise NotConvergedError('Newton solver (state system)', 'Stepsize for increment too low.')
+
+				if self.iterations == self.max_iter:
+					raise NotConvergedError('Newton solver (state system)', 'Maximum number of iterations were exceeded.')
+
+				# compute the new residual
+				if self.frozen_jacobian:
+					res_old = res
+					self.__assemble(self.residuum)
+					[bc.apply(self.residuum) for bc in self.bcs_hom]
+
+					if self.damped:
+						contraction = self.ddu.vector().norm(self.norm_type)/self.du.vector().norm(self.norm_type)
+					else:
+						contraction = self.residuum.norm(self.norm_type)/res_old
+
+					if contraction > self.refresh_threshold:
+						self.__assemble(self.A_fenics, self.residuum)
+						self.A_fenics.ident_zeros()
+						A = fenics.as_backend_type(self.A_fenics).mat()
+						self.jacobian_refreshes += 1
+						jacobian_is_current = True
+					else:
+						jacobian_is_current = False
+					b = fenics.as_backend_type(self.residuum).vec()
+
+				else:
+					self.__assemble(self.A_fenics, self.residuum)
+					self.A_fenics.ident_zeros()
+					A = fenics.as_backend_type(self.A_fenics).mat()
+					b = fenics.as_backend_type(self.residuum).vec()
+
+				[bc.apply(self.residuum) for bc in self.bcs_hom]
+
+				res = self.residuum.norm(self.norm_type)
+				if self.verbose:
+					self.__print_residual(res, res_0, atol, rtol)
+
+				if res < tol:
+					if self.verbose:
+						print('')
+						print('Newton Solver converged after ' + str(self.iterations) + ' iterations.')
+						if self.frozen_jacobian:
+							print('The Jacobian was updated ' + str(self.jacobian_refreshes) + ' times.')
+					break
 
-		if res < tol:
-			if verbose:
-				print('')
-				print('Newton Solver converged after ' + str(iterations) + ' iterations.')
-			break
+		finally:
+			if self.inexact:
+				self.ksp.setTolerances(rtol=ksp_rtol)
 
-	return u
+		return self.u
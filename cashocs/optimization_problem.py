@@ -22,12 +22,49 @@ as many parameters and variables are common for optimal control and shape
 optimization problems.
 """
 
+import time
+
 import fenics
+from ufl import Form
+from ufl.log import UFLException
 
 from ._exceptions import InputError
 
 
 
+def _collect_forms(obj, name):
+	"""Collects the UFL forms which are stored as attributes of an object.
+
+	Parameters
+	----------
+	obj : object
+		The object whose attributes are searched.
+	name : str
+		The name of the object, used as prefix for the names of the forms.
+
+	Returns
+	-------
+	list[tuple[str, ufl.form.Form]]
+		The names and forms found as attributes, or as entries of (nested)
+		list attributes, of the object.
+	"""
+
+	forms = []
+
+	def collect(value, value_name):
+		if isinstance(value, Form):
+			forms.append((value_name, value))
+		elif isinstance(value, (list, tuple)):
+			for i, entry in enumerate(value):
+				collect(entry, value_name + '[' + str(i) + ']')
+
+	for key, value in vars(obj).items():
+		collect(value, name + '.' + key)
+
+	return forms
+
+
+
 class OptimizationProblem:
 	"""Blueprint for an abstract PDE constrained optimization problem.
 
@@ -254,6 +291,7 @@ class OptimizationProblem:
 
 		self.state_problem = None
 		self.adjoint_problem = None
+		self.restart_from = None
 
 
 
@@ -287,3 +325,70 @@ class OptimizationProblem:
 
 		self.state_problem.solve()
 		self.adjoint_problem.solve()
+
+
+
+	def _forms_to_compile(self, algorithm=None):
+		"""Collects the forms which are needed for solving the problem.
+
+		Parameters
+		----------
+		algorithm : str or None, optional
+			The optimization algorithm, see :py:meth:`precompile`.
+
+		Returns
+		-------
+		list[tuple[str, ufl.form.Form]]
+			The names and UFL forms of the problem.
+		"""
+
+		forms = []
+		for i, solver in enumerate(getattr(self.state_problem, 'newton_solvers', [])):
+			forms += _collect_forms(solver, 'state_problem.newton_solvers[' + str(i) + ']')
+
+		return forms
+
+
+
+	def precompile(self, algorithm=None):
+		"""Compiles the forms needed for the solution of the problem, without solving it.
+
+		This just-in-time compiles all UFL forms which are used by the chosen
+		optimization algorithm, so that the (shared) cache of the form compiler
+		is populated, e.g., before many production runs are started. This is
+		also available from the command line as :ref:`cashocs-precompile <cashocs_precompile>`.
+
+		Parameters
+		----------
+		algorithm : str or None, optional
+			The optimization algorithm, with the same choices as for
+			the ``solve`` method of the problem. If this is ``None``, then
+			the value in the config file is used. Default is ``None``.
+
+		Returns
+		-------
+		dict
+			A dictionary, which maps the names of the compiled forms to the
+			time (in seconds) needed for their compilation.
+		"""
+
+		timings = {}
+		signatures = set()
+
+		for name, form in self._forms_to_compile(algorithm):
+			if form.empty():
+				continue
+			signature = form.signature()
+			if signature in signatures:
+				continue
+			signatures.add(signature)
+
+			start_time = time.time()
+			try:
+				fenics.Form(form)
+			except UFLException:
+				# intermediate forms (e.g. of mixed arity) are never assembled
+				continue
+			timings[name] = time.time() - start_time
+
+		return timings
@@ -27,10 +27,14 @@ import configparser
 
 import fenics
 import numpy as np
+from mpi4py import MPI
 from petsc4py import PETSc
 from ufl.measure import Measure
 
 from ._exceptions import InputError, PETScKSPError
+from ._history import load_history
+from ._telemetry import telemetry
+from ._timing import timer
 
 
 
@@ -426,8 +430,9 @@ def _assemble_petsc_system(A_form, b_form, bcs=None):
 	boundary etc.
 	"""
 
-	A, b = fenics.assemble_system(A_form, b_form, bcs, keep_diagonal=True)
-	A.ident_zeros()
+	with timer.phase('assembly'):
+		A, b = fenics.assemble_system(A_form, b_form, bcs, keep_diagonal=True)
+		A.ident_zeros()
 
 	A = fenics.as_backend_type(A).mat()
 	b = fenics.as_backend_type(b).vec()
@@ -471,7 +476,7 @@ def _setup_petsc_options(ksps, ksp_options):
 
 
 
-def _solve_linear_problem(ksp=None, A=None, b=None, x=None):
+def _solve_linear_problem(ksp=None, A=None, b=None, x=None, transpose=False, role='other'):
 	"""Solves a finite dimensional linear problem.
 
 	Parameters
@@ -490,6 +495,12 @@ def _solve_linear_problem(ksp=None, A=None, b=None, x=None):
 	x : petsc4py.PETSc.Vec or None, optional
 		The PETSc vector that stores the solution of the problem. If this is
 		None, then a new vector will be created (and returned)
+	transpose : bool, optional
+		If this is True, the transposed problem is solved, i.e., the system
+		with the matrix :math:`A^T`. Default is False.
+	role : str, optional
+		The role of the solver (e.g. ``'state'`` or ``'adjoint'``), under which
+		the solve is recorded by the KSP telemetry. Default is ``'other'``.
 
 	Returns
 	-------
@@ -522,7 +533,11 @@ def _solve_linear_problem(ksp=None, A=None, b=None, x=None):
 	if x is None:
 		x, _ = A.getVecs()
 
-	ksp.solve(b, x)
+	with timer.phase('ksp'), telemetry.monitor(ksp, role):
+		if transpose:
+			ksp.solveTranspose(b, x)
+		else:
+			ksp.solve(b, x)
 
 	if ksp.getConvergedReason() < 0:
 		raise PETScKSPError(ksp.getConvergedReason())
@@ -531,6 +546,186 @@ def _solve_linear_problem(ksp=None, A=None, b=None, x=None):
 
 
 
+def _solve_multiple_rhs(ksp, rhs, role='other'):
+	"""Solves a linear problem for several right-hand sides at once.
+
+	The right-hand sides are collected in a dense matrix and solved with a
+	single call of KSPMatSolve, so that, e.g., a factorization is used for
+	all back substitutions at once. For PETSc versions without KSPMatSolve,
+	the right-hand sides are solved one after the other.
+
+	Parameters
+	----------
+	ksp : petsc4py.PETSc.KSP
+		The KSP object used to solve the problem, its operator has to be set.
+	rhs : list[petsc4py.PETSc.Vec]
+		The right-hand sides of the linear problem.
+	role : str, optional
+		The role of the solver, under which the solves are recorded by the KSP
+		telemetry. Default is ``'other'``.
+
+	Returns
+	-------
+	numpy.ndarray
+		The (local parts of the) solutions, stored row-wise.
+	"""
+
+	if hasattr(ksp, 'matSolve'):
+		B = PETSc.Mat().createDense([rhs[0].getSizes(), (PETSc.DECIDE, len(rhs))], comm=rhs[0].getComm(),
+									array=np.asfortranarray(np.column_stack([b.getArray() for b in rhs])))
+		X = B.duplicate()
+		with timer.phase('ksp'), telemetry.monitor(ksp, role):
+			ksp.matSolve(B, X)
+
+		if ksp.getConvergedReason() < 0:
+			raise PETScKSPError(ksp.getConvergedReason())
+
+		return X.getDenseArray().T.copy()
+
+	else:
+		solutions = np.zeros((len(rhs), rhs[0].getLocalSize()))
+		x = rhs[0].duplicate()
+		for i, b in enumerate(rhs):
+			_solve_linear_problem(ksp, None, b, x, role=role)
+			solutions[i] = x.getArray()
+
+		return solutions
+
+
+
+def _global_sum(value, comm):
+	"""Sums a (numpy) array or a float over all processes of a communicator.
+
+	Parameters
+	----------
+	value : numpy.ndarray or float
+		The local contribution of the process.
+	comm : mpi4py.MPI.Comm
+		The communicator of the processes.
+
+	Returns
+	-------
+	numpy.ndarray or float
+		The sum of the local contributions.
+	"""
+
+	if comm.Get_size() == 1:
+		return value
+	else:
+		return comm.allreduce(value)
+
+
+
+def _global_max(value, comm):
+	"""Computes the maximum of a float over all processes of a communicator.
+
+	Parameters
+	----------
+	value : float
+		The local value of the process.
+	comm : mpi4py.MPI.Comm
+		The communicator of the processes.
+
+	Returns
+	-------
+	float
+		The maximum of the local values.
+	"""
+
+	if comm.Get_size() == 1:
+		return value
+	else:
+		return comm.allreduce(value, op=MPI.MAX)
+
+
+
+def _global_all(flag, comm):
+	"""Checks whether a boolean flag is ``True`` on all processes of a communicator.
+
+	Parameters
+	----------
+	flag : bool
+		The local flag of the process.
+	comm : mpi4py.MPI.Comm
+		The communicator of the processes.
+
+	Returns
+	-------
+	bool
+		``True`` if the flag is ``True`` on every process, ``False`` otherwise.
+	"""
+
+	if comm.Get_size() == 1:
+		return bool(flag)
+	else:
+		return comm.allreduce(bool(flag), op=MPI.LAND)
+
+
+
+def _lbfgs_compact_product(q, S, Y, SM, YM, curvatures, gamma, mask=None, comm=None):
+	"""Applies the inverse L-BFGS Hessian approximation in compact form.
+
+	This is equivalent to the classical double loop recursion, but only
+	uses (batched) dense linear algebra on the history arrays, see
+	Byrd, Nocedal, and Schnabel, Representations of quasi-Newton matrices
+	and their use in limited memory methods, Math. Program. 63 (1994).
+
+	Parameters
+	----------
+	q : numpy.ndarray
+		The vector the approximation is applied to (already restricted
+		to the inactive set, if ``mask`` is given).
+	S : numpy.ndarray
+		The history of steps, stored row-wise from oldest to newest.
+	Y : numpy.ndarray
+		The history of gradient differences, ordered like ``S``.
+	SM : numpy.ndarray
+		The images of ``S`` under the metric of the scalar product.
+	YM : numpy.ndarray
+		The images of ``Y`` under the metric of the scalar product.
+	curvatures : numpy.ndarray
+		The curvatures :math:`(y_i, s_i)` of the stored pairs.
+	gamma : float
+		The scaling of the initial approximation.
+	mask : numpy.ndarray or None, optional
+		A boolean array marking the inactive indices, to which the initial
+		approximation is restricted. ``None`` means no restriction
+		(default is ``None``).
+	comm : mpi4py.MPI.Comm or None, optional
+		The communicator, in case the arrays only contain the local parts of
+		distributed vectors. Then, all inner products are summed over the
+		processes with a single reduction. ``None`` means that the vectors are
+		not distributed (default is ``None``).
+
+	Returns
+	-------
+	numpy.ndarray
+		The (local part of the) result of the application of the approximation
+		to ``q``.
+	"""
+
+	if mask is None:
+		Y_P = Y
+	else:
+		Y_P = Y*mask
+
+	k = len(curvatures)
+	products = np.concatenate([(SM @ Y.T).ravel(), (YM @ Y_P.T).ravel(), SM @ q, YM @ q])
+	if comm is not None:
+		products = _global_sum(products, comm)
+
+	D = np.diag(curvatures)
+	R = np.triu(products[:k*k].reshape(k, k), 1) + D
+	C = gamma*products[k*k:2*k*k].reshape(k, k)
+
+	h0 = gamma*q
+	R_inv_a = np.linalg.solve(R, products[2*k*k:2*k*k + k])
+	u = np.linalg.solve(R.T, (D + C) @ R_inv_a - gamma*products[2*k*k + k:])
+
+	return h0 + S.T @ u - gamma*(Y_P.T @ R_inv_a)
+
+
+
 def write_out_mesh(mesh, original_msh_file, out_msh_file):
 	"""Writes out the current mesh as .msh file.
 
@@ -556,6 +751,10 @@ def write_out_mesh(mesh, original_msh_file, out_msh_file):
 	-----
 	The method only works with GMSH 4.1 file format. Others might also work,
 	but this is not tested or ensured in any way.
+
+	For distributed meshes, the coordinates are gathered on the first process
+	(using the global vertex indices, which correspond to the ones of the
+	original file), which then writes the file.
 	"""
 
 	if not original_msh_file[-4:] == '.msh':
@@ -565,9 +764,42 @@ def write_out_mesh(mesh, original_msh_file, out_msh_file):
 
 	dim = mesh.geometric_dimension()
 
-	with open(original_msh_file, 'r') as old_file, open(out_msh_file, 'w') as new_file:
+	comm = mesh.mpi_comm()
+	points = mesh.coordinates()
+	if comm.Get_size() > 1:
+		pieces = comm.gather((mesh.topology().global_indices(0), points), root=0)
+		if comm.Get_rank() == 0:
+			points = np.zeros((mesh.num_entities_global(0), points.shape[1]))
+			for global_indices, local_points in pieces:
+				points[global_indices] = local_points
+
+	if comm.Get_rank() == 0:
+		_write_out_mesh_file(points, dim, original_msh_file, out_msh_file)
+
+	comm.barrier()
+
+
+
+def _write_out_mesh_file(points, dim, original_msh_file, out_msh_file):
+	"""Writes the .msh file with updated vertex positions.
 
-		points = mesh.coordinates()
+	Parameters
+	----------
+	points : numpy.ndarray
+		The coordinates of all vertices of the mesh.
+	dim : int
+		The geometric dimension of the mesh.
+	original_msh_file : str
+		Path to the original GMSH mesh file.
+	out_msh_file : str
+		Path (and name) of the output mesh file.
+
+	Returns
+	-------
+	None
+	"""
+
+	with open(original_msh_file, 'r') as old_file, open(out_msh_file, 'w') as new_file:
 
 		node_section = False
 		info_section = False
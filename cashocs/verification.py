@@ -82,7 +82,7 @@ def control_gradient_test(ocp, u=None, h=None):
 		h = []
 		for V in ocp.form_handler.control_spaces:
 			temp = fenics.Function(V)
-			temp.vector()[:] = np.random.rand(V.dim())
+			temp.vector()[:] = np.random.rand(temp.vector().local_size())
 			h.append(temp)
 
 	for j in range(ocp.control_dim):
@@ -142,7 +142,7 @@ def shape_gradient_test(sop, h=None):
 
 	if h is None:
 		h = fenics.Function(sop.shape_form_handler.deformation_space)
-		h.vector()[:] = np.random.rand(sop.shape_form_handler.deformation_space.dim())
+		h.vector()[:] = np.random.rand(h.vector().local_size())
 	
 	# ensure that the shape boundary conditions are applied
 	[bc.apply(h.vector()) for bc in sop.shape_form_handler.bcs_shape]
@@ -154,8 +154,9 @@ def shape_gradient_test(sop, h=None):
 	shape_grad = sop.compute_shape_gradient()
 	shape_derivative_h = sop.shape_form_handler.scalar_product(shape_grad, h)
 
-	box_lower = np.max(sop.mesh_handler.mesh.coordinates())
-	box_upper = np.min(sop.mesh_handler.mesh.coordinates())
+	comm = sop.mesh_handler.mesh.mpi_comm()
+	box_lower = fenics.MPI.max(comm, float(np.max(sop.mesh_handler.mesh.coordinates())))
+	box_upper = fenics.MPI.min(comm, float(np.min(sop.mesh_handler.mesh.coordinates())))
 	length = box_upper - box_lower
 
 	epsilons = [length*1e-4 / 2**i for i in range(4)]
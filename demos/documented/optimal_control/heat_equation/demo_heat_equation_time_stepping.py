@@ -0,0 +1,65 @@
+# Copyright (C) 2020 Sebastian Blauth
+#
+# This file is part of CASHOCS.
+#
+# CASHOCS is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# CASHOCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CASHOCS.  If not, see <https://www.gnu.org/licenses/>.
+
+"""For the documentation of this demo see https://cashocs.readthedocs.io/en/latest/demos/optimal_control/doc_heat_equation.html.
+
+"""
+
+import numpy as np
+from fenics import *
+
+import cashocs
+
+
+
+config = cashocs.create_config('config.ini')
+mesh, subdomains, boundaries, dx, ds, dS = cashocs.regular_mesh(20)
+V = FunctionSpace(mesh, 'CG', 1)
+
+dt = 1 / 10
+t_array = np.linspace(0.0, 1.0, int(1/dt) + 1)
+
+y = Function(V)
+y_prev = Function(V)
+u = Function(V)
+p = Function(V)
+t = Constant(0.0)
+
+bcs = cashocs.create_bcs_list(V, Constant(0), boundaries, [1,2,3,4])
+
+alpha = 1e-5
+x = SpatialCoordinate(mesh)
+y_d = exp(-20*((x[0] - 0.5 - 0.25*cos(2*pi*t))**2 + (x[1] - 0.5 - 0.25*sin(2*pi*t))**2))
+
+e = Constant(1/dt)*(y - y_prev)*p*dx + inner(grad(y), grad(p))*dx - u*p*dx
+J = Constant(0.5*dt) * (y - y_d) * (y - y_d) * dx + Constant(0.5 * dt * alpha) * u * u * dx
+
+ocp = cashocs.TimeDependentOptimalControlProblem(e, bcs, J, y, y_prev, u, p, t_array, config, time=t)
+ocp.solve()
+
+
+
+### Post processing
+
+u_file = File('./visualization/u.pvd')
+y_file = File('./visualization/y.pvd')
+
+def save_step(k, t_k):
+	u_file << u, t_k
+	y_file << y, t_k
+
+ocp.compute_states(save_step)
@@ -33,11 +33,16 @@ setuptools.setup(
     install_requires=[
 		'pytest>=6.0.0',
         'meshio>=4.1.0',
-        'matplotlib'
+        'matplotlib',
+        'scipy'
     ],
+    extras_require={
+        'checkpoint' : ['h5py']
+    },
     entry_points={
         "console_scripts" : [
-            "cashocs-convert = cashocs._cli:convert"
+            "cashocs-convert = cashocs._cli:convert",
+            "cashocs-precompile = cashocs._cli:precompile"
         ]
     },
     python_requires='>=3.6',
@@ -20,6 +20,8 @@
 """
 
 import os
+import subprocess
+import sys
 
 import fenics
 import numpy as np
@@ -183,3 +185,18 @@ def test_empty_measure():
 	assert fenics.assemble(1*dm) == 0.0
 	assert (fenics.assemble(test*dm).norm('linf')) == 0.0
 	assert (fenics.assemble(trial*test*dm).norm('linf')) == 0.0
+
+
+
+def test_import_time():
+	# importing cashocs must neither compile the MeshQuality extension nor import meshio
+	code = (
+		'import sys\n'
+		'import cashocs\n'
+		'assert cashocs.MeshQuality._quality_object is None\n'
+		'assert \'meshio\' not in sys.modules\n'
+	)
+	subprocess.run([sys.executable, '-c', code], check=True)
+
+	MeshQuality.compile_extension()
+	assert MeshQuality._quality_object is not None
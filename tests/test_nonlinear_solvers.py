@@ -20,9 +20,12 @@
 """
 
 import numpy as np
+import pytest
 from fenics import *
+from petsc4py import PETSc
 
 import cashocs
+from cashocs._exceptions import NotConvergedError
 
 
 
@@ -44,3 +47,86 @@ def test_newton_solver():
 							damped=False, verbose=True, ksp=None)
 
 	assert np.allclose(u.vector()[:], u_fen.vector()[:])
+
+
+
+def test_reusable_newton_solver():
+	mesh, _, boundaries, dx, ds, _ = cashocs.regular_mesh(5)
+	V = FunctionSpace(mesh, 'CG', 1)
+
+	u = Function(V)
+	u_fen = Function(V)
+	v = TestFunction(V)
+	f = Function(V)
+
+	F = inner(grad(u), grad(v))*dx + Constant(1e2)*pow(u, 3)*v*dx - f*v*dx
+	bcs = cashocs.create_bcs_list(V, Constant(0), boundaries, [1,2,3,4])
+	solver = cashocs.nonlinear_solvers.DampedNewtonSolver(F, u, bcs, rtol=1e-9, atol=1e-10, verbose=False)
+
+	for value in [1.0, 5.0]:
+		f.vector()[:] = value
+		u.vector()[:] = 0.0
+		solve(F==0, u, bcs)
+		u_fen.vector()[:] = u.vector()[:]
+		u.vector()[:] = 0.0
+		solver.solve()
+
+		assert np.allclose(u.vector()[:], u_fen.vector()[:])
+
+
+
+def test_inexact_newton_solver():
+	mesh, _, boundaries, dx, ds, _ = cashocs.regular_mesh(5)
+	V = FunctionSpace(mesh, 'CG', 1)
+
+	u = Function(V)
+	u_fen = Function(V)
+	v = TestFunction(V)
+
+	F = inner(grad(u), grad(v))*dx + Constant(1e2)*pow(u, 3)*v*dx - Constant(1)*v*dx
+	bcs = cashocs.create_bcs_list(V, Constant(0), boundaries, [1,2,3,4])
+
+	solve(F==0, u, bcs)
+	u_fen.vector()[:] = u.vector()[:]
+
+	ksp = PETSc.KSP().create()
+	cashocs.utils._setup_petsc_options([ksp], [[['ksp_type', 'cg'], ['pc_type', 'hypre'], ['pc_hypre_type', 'boomeramg'], ['ksp_rtol', 1e-14]]])
+
+	for forcing_choice in [1, 2]:
+		u.vector()[:] = 0.0
+		cashocs.damped_newton_solve(F, u, bcs, rtol=1e-9, atol=1e-10, verbose=False, ksp=ksp,
+									inexact=True, forcing_choice=forcing_choice)
+
+		assert np.allclose(u.vector()[:], u_fen.vector()[:])
+		assert ksp.getTolerances()[0] == 1e-14
+
+	# the tolerance is also restored if the solver does not converge
+	u.vector()[:] = 0.0
+	with pytest.raises(NotConvergedError):
+		cashocs.damped_newton_solve(F, u, bcs, rtol=1e-9, atol=1e-10, max_iter=2, verbose=False, ksp=ksp, inexact=True)
+	assert ksp.getTolerances()[0] == 1e-14
+
+
+
+def test_frozen_jacobian_newton_solver():
+	mesh, _, boundaries, dx, ds, _ = cashocs.regular_mesh(5)
+	V = FunctionSpace(mesh, 'CG', 1)
+
+	u = Function(V)
+	u_fen = Function(V)
+	v = TestFunction(V)
+
+	F = inner(grad(u), grad(v))*dx + Constant(1e2)*pow(u, 3)*v*dx - Constant(1)*v*dx
+	bcs = cashocs.create_bcs_list(V, Constant(0), boundaries, [1,2,3,4])
+
+	solve(F==0, u, bcs)
+	u_fen.vector()[:] = u.vector()[:]
+
+	for damped in [True, False]:
+		u.vector()[:] = 0.0
+		solver = cashocs.nonlinear_solvers.DampedNewtonSolver(F, u, bcs, rtol=1e-9, atol=1e-10, damped=damped, verbose=False,
+															  frozen_jacobian=True, refresh_threshold=0.5)
+		solver.solve()
+
+		assert np.allclose(u.vector()[:], u_fen.vector()[:])
+		assert solver.jacobian_refreshes < solver.iterations
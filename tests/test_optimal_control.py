@@ -19,7 +19,12 @@
 
 """
 
+import shutil
+import subprocess
+import sys
+
 import numpy as np
+import pytest
 from fenics import *
 
 import cashocs
@@ -321,3 +326,253 @@ def test_control_pdas_newton():
 	assert ocp_cc.solver.converged
 	assert np.alltrue(ocp_cc.controls[0].vector()[:] >= cc[0])
 	assert np.alltrue(ocp_cc.controls[0].vector()[:] <= cc[1])
+
+
+
+def test_control_warm_start():
+	ksp_options = [['ksp_type', 'cg'], ['pc_type', 'hypre'], ['pc_hypre_type', 'boomeramg'], ['ksp_rtol', 1e-12], ['ksp_atol', 1e-20]]
+
+	for strategy in ['last', 'extrapolate']:
+		config_ws = cashocs.create_config('./config_ocp.ini')
+		config_ws.set('StateSystem', 'warm_start', strategy)
+		u.vector()[:] = 0.0
+		ocp_ws = cashocs.OptimalControlProblem(F, bcs, J, y, u, p, config_ws, ksp_options=ksp_options)
+		assert ocp_ws.state_problem.ksps[0].getInitialGuessNonzero()
+
+		ocp_ws.solve('bfgs', rtol=1e-2, atol=0.0, max_iter=7)
+		assert ocp_ws.solver.relative_norm <= ocp_ws.solver.rtol
+		assert ocp_ws.state_problem.warm_start.number_of_accepted > 0
+
+
+
+def test_precompile():
+	config_pc = cashocs.create_config('./config_ocp.ini')
+	ocp_pc = cashocs.OptimalControlProblem(F, bcs, J, y, u, p, config_pc)
+
+	timings = ocp_pc.precompile()
+	assert 'form_handler.state_eq_forms_lhs[0]' in timings.keys()
+	assert 'form_handler.gradient_forms_rhs[0]' in timings.keys()
+	assert not any([name.startswith('form_handler.sensitivity_eqs_lhs') for name in timings.keys()])
+	assert all([timing >= 0.0 for timing in timings.values()])
+
+	timings = ocp_pc.precompile('newton')
+	assert any([name.startswith('form_handler.sensitivity_eqs_lhs') for name in timings.keys()])
+
+
+
+def test_control_newton_explicit_hessian():
+	config_ex = cashocs.create_config('./config_ocp.ini')
+	config_ex.set('AlgoTNM', 'explicit_hessian', 'True')
+
+	u.vector()[:] = 0.0
+	ocp_ex = cashocs.OptimalControlProblem(F, bcs, J, y, u, p, config_ex)
+	ocp_ex.solve('newton', rtol=1e-2, atol=0.0, max_iter=2)
+	assert ocp_ex.solver.relative_norm <= 1e-6
+	assert ocp_ex.hessian_problem.hessian_assemblies > 0
+	# without control constraints, the reduced Hessian is only factorized after an assembly
+	assert ocp_ex.hessian_problem.hessian_factorizations == ocp_ex.hessian_problem.hessian_assemblies
+
+	u.vector()[:] = 0.0
+	ocp_ex_cc = cashocs.OptimalControlProblem(F, bcs, J, y, u, p, config_ex, control_constraints=cc)
+	hessian_actions = ocp_ex_cc.hessian_problem.hessian_actions[0][0]
+	ocp_ex_cc.solve('newton', rtol=1e-2, atol=0.0, max_iter=8)
+	# the functions for the assembly are allocated once
+	assert ocp_ex_cc.hessian_problem.hessian_assemblies > 0
+	assert ocp_ex_cc.hessian_problem.hessian_actions[0][0] is hessian_actions
+	assert ocp_ex_cc.solver.relative_norm <= ocp_ex_cc.solver.rtol
+	assert np.alltrue(ocp_ex_cc.controls[0].vector()[:] >= cc[0])
+	assert np.alltrue(ocp_ex_cc.controls[0].vector()[:] <= cc[1])
+
+
+
+def test_control_timings():
+	config_t = cashocs.create_config('./config_ocp.ini')
+	config_t.set('Output', 'timings', 'True')
+
+	u.vector()[:] = 0.0
+	ocp_t = cashocs.OptimalControlProblem(F, bcs, J, y, u, p, config_t)
+	ocp_t.solve('bfgs', rtol=1e-2, atol=0.0, max_iter=7)
+
+	timings = ocp_t.solver.output_dict['timings']
+	no_iterations = len(ocp_t.solver.output_dict['cost_function_value'])
+	assert all([len(timings[phase]) == no_iterations for phase in cashocs._timing.PhaseTimer.phases + ['total']])
+	assert all([t >= 0.0 for phase in timings.keys() for t in timings[phase]])
+	assert sum(timings['assembly']) > 0.0
+	assert sum(timings['ksp']) > 0.0
+	assert sum(timings['riesz']) > 0.0
+	assert sum(timings['line_search']) > 0.0
+	assert sum(timings['newton']) == 0.0
+	assert ocp_t.solver.output_dict['timings_total']['total'] >= sum(timings['total'])
+
+	u.vector()[:] = 0.0
+	ocp.solve('bfgs', rtol=1e-2, atol=0.0, max_iter=7)
+	assert 'timings' not in ocp.solver.output_dict.keys()
+
+
+
+def test_control_ksp_telemetry():
+	ksp_options = [['ksp_type', 'cg'], ['pc_type', 'hypre'], ['pc_hypre_type', 'boomeramg'], ['ksp_rtol', 1e-12], ['ksp_atol', 1e-20]]
+	config_kt = cashocs.create_config('./config_ocp.ini')
+	config_kt.set('Output', 'ksp_telemetry', 'True')
+
+	u.vector()[:] = 0.0
+	ocp_kt = cashocs.OptimalControlProblem(F, bcs, J, y, u, p, config_kt, ksp_options=ksp_options)
+	ocp_kt.solve('bfgs', rtol=1e-2, atol=0.0, max_iter=7)
+
+	summary = ocp_kt.solver.output_dict['ksp_telemetry']
+	solves = ocp_kt.solver.output_dict['ksp_solves']
+	no_iterations = len(ocp_kt.solver.output_dict['cost_function_value'])
+	assert set(['state', 'adjoint', 'riesz']) <= set(summary.keys())
+	assert all([len(summary[role]['solves']) == no_iterations for role in summary.keys()])
+	assert sum(summary['state']['solves']) == ocp_kt.state_problem.number_of_solves
+	assert len(solves['state']['iteration']) == ocp_kt.state_problem.number_of_solves
+	assert all([its > 0 for its in solves['state']['ksp_iterations']])
+	assert all([reason > 0 for role in solves.keys() for reason in solves[role]['converged_reason']])
+	assert all([t >= 0.0 for t in solves['state']['setup_time'] + solves['state']['solve_time']])
+	assert 'ksp_telemetry' not in ocp.solver.output_dict.keys()
+
+
+
+def test_control_stream_history(tmp_path, monkeypatch):
+	config_sh = cashocs.create_config('./config_ocp.ini')
+	config_sh.set('Output', 'stream_history', 'True')
+	config_sh.set('Output', 'timings', 'True')
+	monkeypatch.chdir(tmp_path)
+
+	u.vector()[:] = 0.0
+	ocp_sh = cashocs.OptimalControlProblem(F, bcs, J, y, u, p, config_sh)
+	ocp_sh.solve('bfgs', rtol=1e-2, atol=0.0, max_iter=7)
+	assert not ocp_sh.solver.history_writer.thread.is_alive()
+
+	history = cashocs.load_history('./history.jsonl')
+	output_dict = ocp_sh.solver.output_dict
+	for key in ['cost_function_value', 'gradient_norm', 'stepsize', 'state_solves', 'adjoint_solves', 'iterations']:
+		assert history[key] == output_dict[key]
+	assert history['timings']['total'] == output_dict['timings']['total']
+
+	# an aborted history and a repeated iteration
+	with open('./history.jsonl', 'w') as file:
+		file.write('{"iteration": 0, "cost_function_value": 2.0, "gradient_norm": 1.0, "stepsize": 1.0}\n')
+		file.write('{"iteration": 1, "cost_function_value": 1.0, "gradient_norm": 0.5, "stepsize": 1.0}\n')
+		file.write('{"rollback": 1}\n')
+		file.write('{"iteration": 1, "cost_function_value": 0.5, "gradient_norm": 0.1, "stepsize": 0.5}\n')
+		file.write('{"iteration": 2, "cost_fun')
+
+	history = cashocs.load_history('./history.jsonl')
+	assert history['cost_function_value'] == [2.0, 0.5]
+	assert history['stepsize'] == [1.0, 0.5]
+	assert 'state_solves' not in history.keys()
+
+
+
+def test_control_save_xdmf(tmp_path, monkeypatch):
+	config_xdmf = cashocs.create_config('./config_ocp.ini')
+	config_xdmf.set('Output', 'save_xdmf', 'True')
+	config_xdmf.set('Output', 'output_stride', '2')
+	monkeypatch.chdir(tmp_path)
+
+	u.vector()[:] = 0.0
+	ocp_xdmf = cashocs.OptimalControlProblem(F, bcs, J, y, u, p, config_xdmf)
+	ocp_xdmf.solve('bfgs', rtol=1e-2, atol=0.0, max_iter=7)
+	assert ocp_xdmf.solver.state_writer.is_closed
+	assert (tmp_path / 'xdmf' / 'state_0.xdmf').is_file()
+	assert (tmp_path / 'xdmf' / 'state_0.h5').is_file()
+
+	with open(str(tmp_path / 'xdmf' / 'state_0.xdmf'), 'r') as file:
+		content = file.read()
+	no_outputs = len([i for i in range(ocp_xdmf.solver.iteration + 1) if i % 2 == 0])
+	assert content.count('<Time ') == no_outputs
+
+	config_xdmf.set('Output', 'output_stride', '0')
+	with pytest.raises(cashocs._exceptions.ConfigError):
+		ocp_xdmf.solve('bfgs', rtol=1e-2, atol=0.0, max_iter=7)
+
+
+
+@pytest.mark.parametrize('algorithm', ['bfgs', 'cg'])
+def test_control_checkpoint(algorithm, tmp_path, monkeypatch):
+	pytest.importorskip('h5py')
+	config_cp = cashocs.create_config('./config_ocp.ini')
+	config_cp.set('Output', 'checkpoint_interval', '2')
+	monkeypatch.chdir(tmp_path)
+
+	u.vector()[:] = 0.0
+	ocp_cp = cashocs.OptimalControlProblem(F, bcs, J, y, u, p, config_cp)
+	ocp_cp.solve(algorithm, rtol=1e-2, atol=0.0, max_iter=30)
+	assert (tmp_path / 'checkpoint.h5').is_file()
+	assert not (tmp_path / 'checkpoint.h5.tmp').is_file()
+	u_reference = u.vector()[:]
+	output_reference = ocp_cp.solver.output_dict
+	restart_iteration = ocp_cp.solver.checkpoint_iteration
+	assert restart_iteration > 0
+
+	u.vector()[:] = 0.0
+	ocp_restart = cashocs.OptimalControlProblem(F, bcs, J, y, u, p, config_cp)
+	ocp_restart.solve(algorithm, rtol=1e-2, atol=0.0, max_iter=30, restart_from='./checkpoint.h5')
+	output_dict = ocp_restart.solver.output_dict
+
+	assert ocp_restart.solver.iteration == output_reference['iterations']
+	assert np.allclose(output_dict['cost_function_value'], output_reference['cost_function_value'])
+	assert np.allclose(u.vector()[:], u_reference)
+	# the first iterations are not recomputed
+	assert ocp_restart.state_problem.number_of_solves - output_reference['state_solves'] <= 1
+
+	with pytest.raises(cashocs._exceptions.InputError):
+		ocp_restart.solve('gd', rtol=1e-2, atol=0.0, max_iter=30, restart_from='./checkpoint.h5')
+	with pytest.raises(cashocs._exceptions.InputError):
+		ocp_restart.solve(algorithm, rtol=1e-2, atol=0.0, max_iter=30, restart_from='./missing.h5')
+
+
+
+def test_control_checkpoint_requires_h5py(monkeypatch):
+	# h5py cannot be imported
+	monkeypatch.setitem(sys.modules, 'h5py', None)
+	config_cp = cashocs.create_config('./config_ocp.ini')
+	config_cp.set('Output', 'checkpoint_interval', '2')
+
+	u.vector()[:] = 0.0
+	ocp_cp = cashocs.OptimalControlProblem(F, bcs, J, y, u, p, config_cp)
+	with pytest.raises(cashocs._exceptions.ConfigError):
+		ocp_cp.solve('bfgs', rtol=1e-2, atol=0.0, max_iter=30)
+
+	config_cp.set('Output', 'checkpoint_interval', '0')
+	with pytest.raises(cashocs._exceptions.InputError):
+		ocp_cp.solve('bfgs', rtol=1e-2, atol=0.0, max_iter=30, restart_from='./checkpoint.h5')
+
+
+
+@pytest.mark.skipif(shutil.which('mpirun') is None, reason='mpirun is not available')
+@pytest.mark.parametrize('ranks', [1, 2, 4])
+def test_control_parallel(ranks):
+	code = (
+		'from fenics import *\n'
+		'import cashocs\n'
+		'config = cashocs.create_config(\'./config_ocp.ini\')\n'
+		'config.set(\'Output\', \'save_results\', \'False\')\n'
+		'mesh, subdomains, boundaries, dx, ds, dS = cashocs.regular_mesh(10)\n'
+		'V = FunctionSpace(mesh, \'CG\', 1)\n'
+		'y = Function(V)\n'
+		'p = Function(V)\n'
+		'u = Function(V)\n'
+		'F = inner(grad(y), grad(p))*dx - u*p*dx\n'
+		'bcs = cashocs.create_bcs_list(V, Constant(0), boundaries, [1, 2, 3, 4])\n'
+		'y_d = Expression(\'sin(2*pi*x[0])*sin(2*pi*x[1])\', degree=1, domain=mesh)\n'
+		'J = Constant(0.5)*(y - y_d)*(y - y_d)*dx + Constant(0.5*1e-6)*u*u*dx\n'
+		'ocp_cc = cashocs.OptimalControlProblem(F, bcs, J, y, u, p, config, control_constraints=[0, 100])\n'
+		'assert cashocs.verification.control_gradient_test(ocp_cc) > 1.9\n'
+		'u.vector()[:] = 0.0\n'
+		'ocp_cc._erase_pde_memory()\n'
+		'ocp_cc.solve(\'lbfgs\', rtol=1e-2, atol=0.0, max_iter=11)\n'
+		'assert ocp_cc.solver.relative_norm <= ocp_cc.solver.rtol\n'
+		'assert u.vector().min() >= 0.0\n'
+		'if MPI.rank(mesh.mpi_comm()) == 0:\n'
+		'	print(ocp_cc.solver.objective_value, ocp_cc.solver.iteration)\n'
+	)
+	output = subprocess.run(['mpirun', '-n', str(ranks), sys.executable, '-c', code], stdout=subprocess.PIPE, check=True)
+	objective_value, iterations = output.stdout.decode().split()[-2:]
+
+	u.vector()[:] = 0.0
+	ocp_cc._erase_pde_memory()
+	ocp_cc.solve('lbfgs', rtol=1e-2, atol=0.0, max_iter=11)
+	assert int(iterations) == ocp_cc.solver.iteration
+	assert abs(float(objective_value) - ocp_cc.solver.objective_value) <= 1e-8*abs(ocp_cc.solver.objective_value)
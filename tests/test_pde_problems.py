@@ -27,6 +27,8 @@ import cashocs
 
 
 config = cashocs.create_config('./config_ocp.ini')
+config.set('StateSystem', 'reuse_lhs', 'True')
+config.set('StateSystem', 'cache_size', '5')
 mesh, _, boundaries, dx, ds, _ = cashocs.regular_mesh(10)
 V = FunctionSpace(mesh, 'CG', 1)
 
@@ -85,3 +87,220 @@ def test_control_gradient():
 	solve(a==L, gradient)
 
 	assert np.allclose(c_gradient.vector()[:], gradient.vector()[:])
+
+
+
+def test_state_lhs_reuse():
+	trial = TrialFunction(V)
+	test = TestFunction(V)
+	state = Function(V)
+
+	a = inner(grad(trial), grad(test))*dx
+	L_state = u*test*dx
+
+	assert ocp.state_problem.lhs_is_constant[0]
+
+	ocp._erase_pde_memory()
+	u.vector()[:] = np.random.rand(V.dim())
+	ocp.compute_state_variables()
+	A = ocp.state_problem.state_matrices[0]
+
+	ocp._erase_pde_memory()
+	u.vector()[:] = np.random.rand(V.dim())
+	ocp.compute_state_variables()
+	assert ocp.state_problem.state_matrices[0] is A
+
+	solve(a==L_state, state, bcs)
+	assert np.allclose(state.vector()[:], y.vector()[:])
+
+	# the reuse is opt-in
+	config_default = cashocs.create_config('./config_ocp.ini')
+	ocp_default = cashocs.OptimalControlProblem(e, bcs, J, y, u, p, config_default)
+	assert not ocp_default.state_problem.lhs_is_constant[0]
+
+
+
+def test_state_lhs_reuse_changed_data():
+	trial = TrialFunction(V)
+	test = TestFunction(V)
+	state = Function(V)
+
+	kappa = Constant(1.0)
+	y_k = Function(V)
+	p_k = Function(V)
+	e_k = kappa*inner(grad(y_k), grad(p_k))*dx - u*p_k*dx
+	J_k = Constant(0.5)*(y_k - y_d)*(y_k - y_d)*dx + Constant(0.5*alpha)*u*u*dx
+	ocp_k = cashocs.OptimalControlProblem(e_k, bcs, J_k, y_k, u, p_k, config)
+	assert ocp_k.state_problem.lhs_is_constant[0]
+
+	u.vector()[:] = np.random.rand(V.dim())
+	ocp_k.compute_state_variables()
+	A = ocp_k.state_problem.state_matrices[0]
+
+	# a change of a constant of the lhs leads to a reassembly
+	kappa.assign(10.0)
+	ocp_k._erase_pde_memory()
+	ocp_k.compute_state_variables()
+	assert ocp_k.state_problem.state_matrices[0] is not A
+
+	solve(kappa*inner(grad(trial), grad(test))*dx==u*test*dx, state, bcs)
+	assert np.allclose(state.vector()[:], y_k.vector()[:])
+
+
+
+def test_adjoint_transpose_reuse():
+	trial = TrialFunction(V)
+	test = TestFunction(V)
+	adjoint = Function(V)
+	beta = Constant((1.0, 0.5))
+
+	y_c = Function(V)
+	p_c = Function(V)
+	e_c = inner(grad(y_c), grad(p_c))*dx + inner(beta, grad(y_c))*p_c*dx - u*p_c*dx
+	J_c = Constant(0.5)*(y_c - y_d)*(y_c - y_d)*dx + Constant(0.5*alpha)*u*u*dx
+	ocp_c = cashocs.OptimalControlProblem(e_c, bcs, J_c, y_c, u, p_c, config)
+
+	y_d.vector()[:] = np.random.rand(V.dim())
+	u.vector()[:] = np.random.rand(V.dim())
+	ocp_c.compute_adjoint_variables()
+
+	assert ocp_c.adjoint_problem.reuse_state_lhs[0]
+	assert not ocp_c.adjoint_problem.state_lhs_is_symmetric[0]
+
+	a_adjoint = inner(grad(trial), grad(test))*dx + inner(beta, grad(test))*trial*dx
+	L_adjoint = -(y_c - y_d)*test*dx
+	solve(a_adjoint==L_adjoint, adjoint, bcs)
+
+	assert np.allclose(adjoint.vector()[:], p_c.vector()[:])
+
+
+
+def test_adjoint_transpose_iterative():
+	trial = TrialFunction(V)
+	test = TestFunction(V)
+	adjoint = Function(V)
+	beta = Constant((1.0, 0.5))
+
+	y_c = Function(V)
+	p_c = Function(V)
+	e_c = inner(grad(y_c), grad(p_c))*dx + inner(beta, grad(y_c))*p_c*dx - u*p_c*dx
+	J_c = Constant(0.5)*(y_c - y_d)*(y_c - y_d)*dx + Constant(0.5*alpha)*u*u*dx
+
+	a_adjoint = inner(grad(trial), grad(test))*dx + inner(beta, grad(test))*trial*dx
+	L_adjoint = -(y_c - y_d)*test*dx
+
+	# hypre cannot be applied transposed, so the adjoint operator is assembled in this case
+	for pc_type, reuse in [['jacobi', True], ['hypre', False]]:
+		ksp_options = [[['ksp_type', 'gmres'], ['pc_type', pc_type], ['ksp_rtol', 1e-12], ['ksp_atol', 1e-20], ['ksp_max_it', 1000]]]
+		ocp_c = cashocs.OptimalControlProblem(e_c, bcs, J_c, y_c, u, p_c, config, ksp_options=ksp_options, adjoint_ksp_options=ksp_options)
+
+		y_d.vector()[:] = np.random.rand(V.dim())
+		u.vector()[:] = np.random.rand(V.dim())
+		ocp_c.compute_adjoint_variables()
+
+		assert not ocp_c.adjoint_problem.state_lhs_is_symmetric[0]
+		assert ocp_c.adjoint_problem.reuse_state_lhs[0] == reuse
+
+		solve(a_adjoint==L_adjoint, adjoint, bcs)
+		assert np.allclose(adjoint.vector()[:], p_c.vector()[:])
+
+
+
+def test_state_cache():
+	cache = ocp.state_problem.cache
+	cache.clear()
+	hits = cache.hits
+	misses = cache.misses
+
+	u.vector()[:] = np.random.rand(V.dim())
+	u_saved = u.vector()[:]
+	ocp._erase_pde_memory()
+	ocp.state_problem.cache_key = cashocs._pde_problems.state_cache.compute_cache_key([u.vector()[:]])
+	ocp.compute_state_variables()
+	y_saved = y.vector()[:]
+
+	u.vector()[:] = np.random.rand(V.dim())
+	ocp.state_problem.has_solution = False
+	ocp.state_problem.cache_key = cashocs._pde_problems.state_cache.compute_cache_key([u.vector()[:]])
+	ocp.compute_state_variables()
+
+	u.vector()[:] = u_saved
+	ocp.state_problem.has_solution = False
+	ocp.state_problem.cache_key = cashocs._pde_problems.state_cache.compute_cache_key([u.vector()[:]])
+	number_of_solves = ocp.state_problem.number_of_solves
+	ocp.compute_state_variables()
+	ocp.state_problem.cache_key = None
+
+	assert ocp.state_problem.number_of_solves == number_of_solves
+	assert np.allclose(y.vector()[:], y_saved)
+	assert cache.hits == hits + 1
+	assert cache.misses == misses + 2
+
+	# the cache is invalidated, e.g., after problem data has changed
+	ocp._erase_pde_memory()
+	ocp.state_problem.cache_key = cashocs._pde_problems.state_cache.compute_cache_key([u.vector()[:]])
+	ocp.compute_state_variables()
+	ocp.state_problem.cache_key = None
+
+	assert ocp.state_problem.number_of_solves == number_of_solves + 1
+	assert cache.hits == hits + 1
+	assert cache.misses == misses + 3
+
+	# the cache is opt-in
+	ocp_default = cashocs.OptimalControlProblem(e, bcs, J, y, u, p, cashocs.create_config('./config_ocp.ini'))
+	assert not ocp_default.state_problem.cache.is_active
+
+
+
+def test_hessian_operator_reuse():
+	ocp.form_handler._ControlFormHandler__compute_newton_forms()
+	hessian_problem = cashocs._pde_problems.HessianProblem(ocp.form_handler, ocp.gradient_problem)
+
+	y_d.vector()[:] = np.random.rand(V.dim())
+	u.vector()[:] = np.random.rand(V.dim())
+	ocp._erase_pde_memory()
+	ocp.compute_gradient()
+
+	h = [Function(V)]
+	h[0].vector()[:] = np.random.rand(V.dim())
+	out_1 = [Function(V)]
+	out_2 = [Function(V)]
+
+	hessian_problem.hessian_application(h, out_1)
+	matrix = hessian_problem.sensitivity_matrices[0]
+	hessian_problem.hessian_application(h, out_2)
+
+	assert hessian_problem.sensitivity_matrices[0] is matrix
+	assert np.allclose(out_1[0].vector()[:], out_2[0].vector()[:])
+
+	# the problem is linear-quadratic, so the Hessian does not depend on the state
+	u.vector()[:] = np.random.rand(V.dim())
+	ocp._erase_pde_memory()
+	ocp.compute_gradient()
+	hessian_problem.hessian_application(h, out_2)
+
+	assert hessian_problem.sensitivity_matrices[0] is not matrix
+	assert np.allclose(out_1[0].vector()[:], out_2[0].vector()[:])
+
+
+
+def test_hessian_application_block():
+	ocp.form_handler._ControlFormHandler__compute_newton_forms()
+	hessian_problem = cashocs._pde_problems.HessianProblem(ocp.form_handler, ocp.gradient_problem)
+
+	y_d.vector()[:] = np.random.rand(V.dim())
+	u.vector()[:] = np.random.rand(V.dim())
+	ocp._erase_pde_memory()
+	ocp.compute_gradient()
+
+	hs = [[Function(V)] for k in range(3)]
+	outs = [[Function(V)] for k in range(3)]
+	out = [Function(V)]
+	for h in hs:
+		h[0].vector()[:] = np.random.rand(V.dim())
+
+	hessian_problem.hessian_application_block(hs, outs)
+
+	for h, out_block in zip(hs, outs):
+		hessian_problem.hessian_application(h, out)
+		assert np.allclose(out[0].vector()[:], out_block[0].vector()[:])
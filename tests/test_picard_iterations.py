@@ -145,3 +145,32 @@ def test_picard_solver_for_optimization():
 
 	assert np.allclose(u.vector()[:], u_picard.vector()[:])
 	assert np.max(np.abs(u.vector()[:] - u_picard.vector()[:])) / np.max(np.abs(u.vector()[:])) <= 1e-8
+
+
+
+def test_picard_anderson_acceleration():
+	config_anderson = cashocs.create_config('config_picard.ini')
+	config_anderson.set('StateSystem', 'picard_anderson_depth', '3')
+	ocp_anderson = cashocs.OptimalControlProblem(e, bcs, J, states, controls, adjoints, config_anderson)
+
+	u.vector()[:] = np.random.normal(0.0, 10.0, size=V.dim())
+	v.vector()[:] = np.random.normal(0.0, 10.0, size=V.dim())
+	ocp._erase_pde_memory()
+	sweeps_before = ocp.state_problem.anderson.number_of_sweeps
+	ocp.compute_state_variables()
+	sweeps_picard = ocp.state_problem.anderson.number_of_sweeps - sweeps_before
+	y_ref = y.vector()[:]
+	z_ref = z.vector()[:]
+
+	ocp_anderson._erase_pde_memory()
+	sweeps_before = ocp_anderson.state_problem.anderson.number_of_sweeps
+	ocp_anderson.compute_state_variables()
+	sweeps_anderson = ocp_anderson.state_problem.anderson.number_of_sweeps - sweeps_before
+
+	assert ocp_anderson.state_problem.anderson.is_active
+	assert 0 < sweeps_anderson < sweeps_picard
+	assert np.max(np.abs(y.vector()[:] - y_ref)) / np.max(np.abs(y_ref)) <= 1e-8
+	assert np.max(np.abs(z.vector()[:] - z_ref)) / np.max(np.abs(z_ref)) <= 1e-8
+
+	ocp_anderson.compute_adjoint_variables()
+	assert ocp_anderson.adjoint_problem.anderson.number_of_sweeps > 0
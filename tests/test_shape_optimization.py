@@ -19,6 +19,12 @@
 
 """
 
+import json
+import os
+import shutil
+import subprocess
+import sys
+
 import numpy as np
 import pytest
 from fenics import *
@@ -133,6 +139,77 @@ def test_move_mesh():
 	assert np.alltrue(abs(mesh.coordinates()[:, :] - initial_coordinates) < 1e-15)
 
 
+
+def test_a_posteriori_check():
+	mesh.coordinates()[:, :] = initial_coordinates
+	mesh.bounding_box_tree().build(mesh)
+	sop = cashocs.ShapeOptimizationProblem(e, bcs, J, u, p, boundaries, config)
+	V = VectorFunctionSpace(mesh, 'CG', 1)
+	trafo = Function(V)
+
+	# a small, smooth deformation is a valid transformation
+	trafo.interpolate(Expression(('0.05*x[0]*x[1]', '0.05*x[1]'), degree=2))
+	assert sop.mesh_handler.move_mesh(trafo)
+	sop.mesh_handler.revert_transformation()
+
+	# moving a single interior vertex through the mesh inverts its neighboring elements
+	interior = np.setdiff1d(np.arange(mesh.num_vertices()), sop.mesh_handler.boundary_vertices)
+	idx = interior[np.argmin(np.linalg.norm(initial_coordinates[interior], axis=1))]
+	trafo.vector()[:] = 0.0
+	v2d = vertex_to_dof_map(V)
+	trafo.vector()[v2d[2*idx]] = 1.5
+	assert not sop.mesh_handler.move_mesh(trafo)
+	assert np.alltrue(abs(mesh.coordinates()[:, :] - initial_coordinates) < 1e-15)
+
+
+
+def test_a_posteriori_check_manifold():
+	surface = BoundaryMesh(UnitCubeMesh(2, 2, 2), 'exterior')
+	coordinates = surface.coordinates().copy()
+	mesh_handler = cashocs.geometry._MeshHandler.__new__(cashocs.geometry._MeshHandler)
+	mesh_handler.cells = surface.cells()
+	mesh_handler.is_manifold = True
+	mesh_handler.reference_edges = mesh_handler._MeshHandler__edges(coordinates)
+
+	volumes = mesh_handler._MeshHandler__signed_volumes(coordinates)
+	assert np.all(volumes > 0.0)
+	assert abs(0.5*np.sum(volumes) - 6.0) < 1e-12
+
+	# reflecting a vertex of a cell at the midpoint of the opposite edge flips the orientation of the cell
+	a, b, c = surface.cells()[0]
+	coordinates[c] = coordinates[a] + coordinates[b] - coordinates[c]
+	assert mesh_handler._MeshHandler__signed_volumes(coordinates)[0] < 0.0
+
+
+
+def test_mesh_transfer():
+	mesh.coordinates()[:, :] = initial_coordinates
+	mesh.bounding_box_tree().build(mesh)
+	new_mesh = UnitDiscMesh.create(MPI.comm_world, 12, degree, dim)
+	new_subdomains = MeshFunction('size_t', new_mesh, dim=2, value=0)
+	new_boundaries = MeshFunction('size_t', new_mesh, dim=1)
+	boundary.mark(new_boundaries, 1)
+	mesh_transfer = cashocs._forms.MeshTransfer(new_mesh, new_subdomains, new_boundaries)
+
+	w = interpolate(Constant(2.0), V)
+	ds_marked = Measure('ds', mesh, subdomain_data=boundaries)
+	new_form = mesh_transfer.transfer_form(w*ds_marked(1) + w*dx)
+	assert new_form.ufl_domain() == new_mesh.ufl_domain()
+	reference = 2.0*assemble(Constant(1.0)*ds(domain=new_mesh) + Constant(1.0)*dx(domain=new_mesh))
+	assert abs(assemble(new_form) - reference) < 1e-10
+
+	new_bcs = mesh_transfer.transfer_bcs([[bcs]], [V])
+	assert new_bcs[0][0].function_space().mesh().id() == new_mesh.id()
+
+	# forms with test and trial functions
+	new_form = mesh_transfer.transfer_form(TrialFunction(V)*TestFunction(V)*dx + w*TestFunction(V)*ds_marked(1))
+	W = FunctionSpace(new_mesh, 'CG', 1)
+	reference = assemble(TrialFunction(W)*TestFunction(W)*dx(domain=new_mesh))
+	assert all([arg.ufl_function_space().mesh().id() == new_mesh.id() for arg in new_form.arguments()])
+	assert abs(assemble(lhs(new_form)).norm('frobenius') - reference.norm('frobenius')) < 1e-10
+	assert abs(assemble(rhs(new_form)).sum() + 2.0*assemble(Constant(1.0)*ds(domain=new_mesh))) < 1e-10
+
+
 def test_shape_derivative_unconstrained():
 	mesh.coordinates()[:, :] = initial_coordinates
 	mesh.bounding_box_tree().build(mesh)
@@ -378,3 +455,229 @@ def test_shape_barycenter_regularization():
 	config.set('MeshQuality', 'volume_change', 'inf')
 	config.set('Regularization', 'factor_volume', '0.0')
 	config.set('Regularization', 'use_initial_volume', 'False')
+
+
+
+@pytest.mark.parametrize('algorithm', ['lbfgs', 'cg'])
+def test_shape_checkpoint(algorithm, tmp_path, monkeypatch):
+	pytest.importorskip('h5py')
+	config_cp = cashocs.create_config('./config_sop.ini')
+	config_cp.set('Output', 'checkpoint_interval', '2')
+	monkeypatch.chdir(tmp_path)
+
+	mesh.coordinates()[:, :] = initial_coordinates
+	mesh.bounding_box_tree().build(mesh)
+	sop_cp = cashocs.ShapeOptimizationProblem(e, bcs, J, u, p, boundaries, config_cp)
+	sop_cp.solve(algorithm, rtol=1e-2, atol=0.0, max_iter=30)
+	assert (tmp_path / 'checkpoint.h5').is_file()
+	assert not (tmp_path / 'checkpoint.h5.tmp').is_file()
+	coordinates_reference = mesh.coordinates().copy()
+	output_reference = sop_cp.solver.output_dict
+	assert sop_cp.solver.checkpoint_iteration > 0
+
+	mesh.coordinates()[:, :] = initial_coordinates
+	mesh.bounding_box_tree().build(mesh)
+	sop_restart = cashocs.ShapeOptimizationProblem(e, bcs, J, u, p, boundaries, config_cp)
+	sop_restart.solve(algorithm, rtol=1e-2, atol=0.0, max_iter=30, restart_from='./checkpoint.h5')
+	output_dict = sop_restart.solver.output_dict
+
+	assert sop_restart.solver.iteration == output_reference['iterations']
+	assert np.allclose(output_dict['cost_function_value'], output_reference['cost_function_value'])
+	assert np.allclose(mesh.coordinates(), coordinates_reference)
+	# the first iterations are not recomputed
+	assert sop_restart.state_problem.number_of_solves - output_reference['state_solves'] <= 1
+
+	with pytest.raises(cashocs._exceptions.InputError):
+		sop_restart.solve('gd', rtol=1e-2, atol=0.0, max_iter=30, restart_from='./checkpoint.h5')
+
+
+
+@pytest.mark.skipif(shutil.which('mpirun') is None, reason='mpirun is not available')
+@pytest.mark.parametrize('ranks', [1, 2, 4])
+def test_shape_parallel(ranks):
+	code = (
+		'from fenics import *\n'
+		'import cashocs\n'
+		'config = cashocs.create_config(\'./config_sop.ini\')\n'
+		'config.set(\'Output\', \'save_results\', \'False\')\n'
+		'mesh = UnitDiscMesh.create(MPI.comm_world, 10, 1, 2)\n'
+		'dx = Measure(\'dx\', mesh)\n'
+		'boundaries = MeshFunction(\'size_t\', mesh, dim=1)\n'
+		'CompiledSubDomain(\'on_boundary\').mark(boundaries, 1)\n'
+		'V = FunctionSpace(mesh, \'CG\', 1)\n'
+		'bcs = DirichletBC(V, Constant(0), boundaries, 1)\n'
+		'x = SpatialCoordinate(mesh)\n'
+		'f = 2.5*pow(x[0] + 0.4 - pow(x[1], 2), 2) + pow(x[0], 2) + pow(x[1], 2) - 1\n'
+		'u = Function(V)\n'
+		'p = Function(V)\n'
+		'e = inner(grad(u), grad(p))*dx - f*p*dx\n'
+		'quality = [cashocs.MeshQuality.min_skewness(mesh), cashocs.MeshQuality.avg_radius_ratios(mesh)]\n'
+		'sop = cashocs.ShapeOptimizationProblem(e, bcs, u*dx, u, p, boundaries, config)\n'
+		'sop.solve(\'lbfgs\', rtol=1e-2, atol=0.0, max_iter=8)\n'
+		'assert sop.solver.relative_norm < sop.solver.rtol\n'
+		'if MPI.rank(mesh.mpi_comm()) == 0:\n'
+		'	print(quality[0], quality[1], sop.solver.objective_value, sop.solver.iteration)\n'
+	)
+	output = subprocess.run(['mpirun', '-n', str(ranks), sys.executable, '-c', code], stdout=subprocess.PIPE, check=True)
+	min_skewness, avg_radius_ratios, objective_value, iterations = output.stdout.decode().split()[-4:]
+
+	mesh.coordinates()[:, :] = initial_coordinates
+	mesh.bounding_box_tree().build(mesh)
+	assert abs(float(min_skewness) - cashocs.MeshQuality.min_skewness(mesh)) <= 1e-12
+	assert abs(float(avg_radius_ratios) - cashocs.MeshQuality.avg_radius_ratios(mesh)) <= 1e-12
+
+	sop = cashocs.ShapeOptimizationProblem(e, bcs, J, u, p, boundaries, config)
+	sop.solve('lbfgs', rtol=1e-2, atol=0.0, max_iter=8)
+	assert int(iterations) == sop.solver.iteration
+	assert abs(float(objective_value) - sop.solver.objective_value) <= 1e-8*abs(sop.solver.objective_value)
+
+
+
+def remeshing_problem(tmp_path, monkeypatch, config_options=()):
+	"""Sets up the documented remeshing problem with remeshing in process
+
+	Parameters
+	----------
+	tmp_path : pathlib.Path
+		the directory where the problem is solved
+	monkeypatch : _pytest.monkeypatch.MonkeyPatch
+		used to change the working directory
+	config_options : list[tuple[str, str, str]]
+		additional config options (section, key, value)
+
+	Returns
+	-------
+	cashocs.ShapeOptimizationProblem
+		the shape optimization problem
+	"""
+
+	pytest.importorskip('meshio')
+	demo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'demos', 'documented', 'shape_optimization', 'remeshing')
+	config_remesh = cashocs.create_config(os.path.join(demo_dir, 'config.ini'))
+	shutil.copytree(os.path.join(demo_dir, 'mesh'), str(tmp_path / 'mesh'), ignore=shutil.ignore_patterns('cashocs_remesh', 'optimized_mesh.msh'))
+	monkeypatch.chdir(tmp_path)
+
+	config_remesh.set('Mesh', 'remesh_in_process', 'True')
+	config_remesh.set('Mesh', 'show_gmsh_output', 'False')
+	config_remesh.set('OptimizationRoutine', 'soft_exit', 'False')
+	config_remesh.set('Output', 'save_results', 'False')
+	config_remesh.set('Output', 'save_pvd', 'False')
+	config_remesh.set('Output', 'save_mesh', 'False')
+	for section, key, value in config_options:
+		config_remesh.set(section, key, value)
+
+	remesh_mesh, _, remesh_boundaries, remesh_dx, _, _ = cashocs.import_mesh(config_remesh)
+	W = FunctionSpace(remesh_mesh, 'CG', 1)
+	w = Function(W)
+	q = Function(W)
+	y = SpatialCoordinate(remesh_mesh)
+	g = 2.5*pow(y[0] + 0.4 - pow(y[1], 2), 2) + pow(y[0], 2) + pow(y[1], 2) - 1
+	state_form = inner(grad(w), grad(q))*remesh_dx - g*q*remesh_dx
+	remesh_bcs = DirichletBC(W, Constant(0), remesh_boundaries, 1)
+
+	return cashocs.ShapeOptimizationProblem(state_form, remesh_bcs, w*remesh_dx, w, q, remesh_boundaries, config_remesh)
+
+
+
+@pytest.mark.skipif(shutil.which('gmsh') is None, reason='gmsh is not available')
+def test_shape_remeshing_in_process(tmp_path, monkeypatch):
+	sop = remeshing_problem(tmp_path, monkeypatch)
+	remesh_mesh = sop.mesh_handler.mesh
+	sop.solve('lbfgs', rtol=1e-2, atol=0.0, max_iter=30)
+
+	# the problem was re-initialized on the new mesh
+	assert sop.temp_dict['remesh_counter'] >= 1
+	assert sop.states[0].function_space().mesh().id() != remesh_mesh.id()
+	assert sop.mesh_handler.mesh.id() == sop.states[0].function_space().mesh().id()
+	assert sop.solver.relative_norm < sop.solver.rtol
+
+	# the iterations and the history are continued after the remeshing
+	remesh_iteration = sop.temp_dict['OptimizationRoutine']['iteration_counter']
+	assert 0 < remesh_iteration < sop.solver.iteration
+	for key in ['cost_function_value', 'gradient_norm', 'stepsize', 'MeshQuality']:
+		assert len(sop.solver.output_dict[key]) == sop.solver.iteration + 1
+		assert sop.solver.output_dict[key][:remesh_iteration] == sop.temp_dict['output_dict'][key]
+	assert sop.solver.output_dict['iterations'] == sop.solver.iteration
+	assert sop.solver.output_dict['gradient_norm'][0] == 1.0
+
+
+
+@pytest.mark.skipif(shutil.which('mpirun') is None or shutil.which('gmsh') is None, reason='mpirun or gmsh is not available')
+@pytest.mark.parametrize('ranks', [2, 4])
+def test_shape_remeshing_parallel(ranks, tmp_path):
+	pytest.importorskip('meshio')
+	demo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'demos', 'documented', 'shape_optimization', 'remeshing')
+	code = (
+		'from fenics import *\n'
+		'import cashocs\n'
+		'config = cashocs.create_config(\'./config.ini\')\n'
+		'config.set(\'Mesh\', \'remesh_in_process\', \'True\')\n'
+		'config.set(\'Mesh\', \'show_gmsh_output\', \'False\')\n'
+		'config.set(\'OptimizationRoutine\', \'soft_exit\', \'False\')\n'
+		'config.set(\'Output\', \'verbose\', \'False\')\n'
+		'config.set(\'Output\', \'save_results\', \'False\')\n'
+		'config.set(\'Output\', \'save_pvd\', \'False\')\n'
+		'config.set(\'Output\', \'save_mesh\', \'False\')\n'
+		'mesh, subdomains, boundaries, dx, ds, dS = cashocs.import_mesh(config)\n'
+		'V = FunctionSpace(mesh, \'CG\', 1)\n'
+		'u = Function(V)\n'
+		'p = Function(V)\n'
+		'x = SpatialCoordinate(mesh)\n'
+		'f = 2.5*pow(x[0] + 0.4 - pow(x[1], 2), 2) + pow(x[0], 2) + pow(x[1], 2) - 1\n'
+		'e = inner(grad(u), grad(p))*dx - f*p*dx\n'
+		'bcs = DirichletBC(V, Constant(0), boundaries, 1)\n'
+		'sop = cashocs.ShapeOptimizationProblem(e, bcs, u*dx, u, p, boundaries, config)\n'
+		'sop.solve(\'lbfgs\', rtol=1e-2, atol=0.0, max_iter=30)\n'
+		'if MPI.rank(MPI.comm_world) == 0:\n'
+		'	print(sop.temp_dict[\'remesh_counter\'], sop.temp_dict[\'OptimizationRoutine\'][\'iteration_counter\'], sop.solver.iteration)\n'
+	)
+
+	results = []
+	for n in [1, ranks]:
+		work_dir = tmp_path / ('ranks_' + str(n))
+		work_dir.mkdir()
+		shutil.copy(os.path.join(demo_dir, 'config.ini'), str(work_dir))
+		shutil.copytree(os.path.join(demo_dir, 'mesh'), str(work_dir / 'mesh'), ignore=shutil.ignore_patterns('cashocs_remesh', 'optimized_mesh.msh'))
+		output = subprocess.run(['mpirun', '-n', str(n), sys.executable, '-c', code], stdout=subprocess.PIPE, cwd=str(work_dir), check=True)
+		results.append(output.stdout.decode().split()[-3:])
+
+	# the same remeshing is performed in serial and in parallel
+	assert int(results[0][0]) >= 1
+	assert results[0] == results[1]
+
+	# the mesh gathered on the first process is the same as the serial one
+	with open(str(tmp_path / 'ranks_1' / 'mesh' / 'cashocs_remesh' / 'mesh_1_pre_remesh.msh'), 'r') as file:
+		serial_lines = file.readlines()
+	with open(str(tmp_path / ('ranks_' + str(ranks)) / 'mesh' / 'cashocs_remesh' / 'mesh_1_pre_remesh.msh'), 'r') as file:
+		parallel_lines = file.readlines()
+
+	assert len(serial_lines) == len(parallel_lines)
+	for serial_line, parallel_line in zip(serial_lines, parallel_lines):
+		if serial_line != parallel_line:
+			assert np.allclose(np.array(serial_line.split(), dtype=float), np.array(parallel_line.split(), dtype=float), rtol=0.0, atol=1e-8)
+
+
+
+@pytest.mark.skipif(shutil.which('gmsh') is None, reason='gmsh is not available')
+def test_shape_remeshing_history(tmp_path, monkeypatch):
+	sop = remeshing_problem(tmp_path, monkeypatch, [('Output', 'timings', 'True'), ('Output', 'stream_history', 'True')])
+	sop.solve('lbfgs', rtol=1e-2, atol=0.0, max_iter=30)
+	output_dict = sop.solver.output_dict
+	assert sop.temp_dict['remesh_counter'] >= 1
+
+	# the iteration before the remeshing is repeated, and removed from the streamed history
+	with open('./history.jsonl', 'r') as file:
+		records = [json.loads(line) for line in file]
+	assert sum([1 for record in records if 'rollback' in record.keys()]) == sop.temp_dict['remesh_counter']
+
+	history = cashocs.load_history('./history.jsonl')
+	for key in ['cost_function_value', 'gradient_norm', 'stepsize', 'MeshQuality', 'state_solves', 'adjoint_solves', 'iterations']:
+		assert history[key] == output_dict[key]
+	assert history['timings'] == output_dict['timings']
+	assert history['timings_total'] == output_dict['timings_total']
+
+	# the timings of the repeated iteration are rolled back, and the remeshing is timed
+	timings = output_dict['timings']
+	assert all([len(timings[phase]) == sop.solver.iteration + 1 for phase in cashocs._timing.PhaseTimer.phases + ['total']])
+	assert sum(timings['mesh_quality']) > 0.0
+	assert sum(timings['remeshing']) > 0.0
@@ -0,0 +1,174 @@
+# Copyright (C) 2020 Sebastian Blauth
+#
+# This file is part of CASHOCS.
+#
+# CASHOCS is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# CASHOCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CASHOCS.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Tests for time-dependent optimal control problems.
+
+"""
+
+import numpy as np
+import pytest
+from fenics import *
+
+import cashocs
+from cashocs._exceptions import ConfigError
+
+
+
+config = cashocs.create_config('./config_ocp.ini')
+mesh, subdomains, boundaries, dx, ds, dS = cashocs.regular_mesh(8)
+V = FunctionSpace(mesh, 'CG', 1)
+
+dt = 0.1
+t_array = np.linspace(0.0, 1.0, 11)
+alpha = 1e-5
+x = SpatialCoordinate(mesh)
+bcs = cashocs.create_bcs_list(V, Constant(0), boundaries, [1, 2, 3, 4])
+
+def desired_state(t):
+	return exp(-20*((x[0] - 0.5 - 0.25*cos(2*pi*t))**2 + (x[1] - 0.5 - 0.25*sin(2*pi*t))**2))
+
+### single time step formulation
+y = Function(V)
+y_prev = Function(V)
+u = Function(V)
+p = Function(V)
+t = Constant(0.0)
+
+e = Constant(1/dt)*(y - y_prev)*p*dx + inner(grad(y), grad(p))*dx - u*p*dx
+J = Constant(0.5*dt)*(y - desired_state(t))*(y - desired_state(t))*dx + Constant(0.5*dt*alpha)*u*u*dx
+
+ocp = cashocs.TimeDependentOptimalControlProblem(e, bcs, J, y, y_prev, u, p, t_array, config, time=t)
+
+config_checkpoints = cashocs.create_config('./config_ocp.ini')
+config_checkpoints.add_section('TimeStepping')
+config_checkpoints.set('TimeStepping', 'checkpoints', '2')
+ocp_checkpoints = cashocs.TimeDependentOptimalControlProblem(e, bcs, J, y, y_prev, u, p, t_array, config_checkpoints, time=t)
+
+### formulation with a list of all time steps
+states = [Function(V) for k in range(len(t_array) - 1)]
+controls = [Function(V) for k in range(len(t_array) - 1)]
+adjoints = [Function(V) for k in range(len(t_array) - 1)]
+
+e_list = []
+J_list = []
+for k in range(len(t_array) - 1):
+	y_k_prev = Function(V) if k == 0 else states[k - 1]
+	e_list.append(Constant(1/dt)*(states[k] - y_k_prev)*adjoints[k]*dx + inner(grad(states[k]), grad(adjoints[k]))*dx - controls[k]*adjoints[k]*dx)
+	y_d = desired_state(Constant(t_array[k + 1]))
+	J_list.append(Constant(0.5*dt)*(states[k] - y_d)*(states[k] - y_d)*dx + Constant(0.5*dt*alpha)*controls[k]*controls[k]*dx)
+
+ocp_list = cashocs.OptimalControlProblem(e_list, [bcs]*len(states), cashocs.utils.summation(J_list), states, controls, adjoints, config)
+
+
+
+def set_controls(values):
+	for k in range(len(controls)):
+		controls[k].vector()[:] = values[k]
+		ocp.controls[k].vector()[:] = values[k]
+		ocp_checkpoints.controls[k].vector()[:] = values[k]
+	ocp._erase_pde_memory()
+	ocp_checkpoints._erase_pde_memory()
+	ocp_list._erase_pde_memory()
+
+
+
+def test_time_stepping_gradient():
+	assert cashocs.verification.control_gradient_test(ocp) > 1.9
+	assert cashocs.verification.control_gradient_test(ocp_checkpoints) > 1.9
+
+
+
+def test_time_stepping_equivalence():
+	set_controls([np.random.rand(V.dim()) for k in range(len(controls))])
+
+	cost = ocp.reduced_cost_functional.evaluate()
+	cost_list = ocp_list.reduced_cost_functional.evaluate()
+	assert abs(cost - cost_list) / abs(cost_list) < 1e-10
+
+	gradients = ocp.compute_gradient()
+	gradients_checkpoints = ocp_checkpoints.compute_gradient()
+	gradients_list = ocp_list.compute_gradient()
+	for k in range(len(controls)):
+		norm = np.linalg.norm(gradients_list[k].vector()[:])
+		assert np.linalg.norm(gradients[k].vector()[:] - gradients_list[k].vector()[:]) / norm < 1e-8
+		assert np.linalg.norm(gradients_checkpoints[k].vector()[:] - gradients_list[k].vector()[:]) / norm < 1e-8
+
+	# the backward sweep with checkpoints recomputes states, but stores at most two of them
+	assert ocp_checkpoints.state_problem.number_of_steps_solved > ocp.state_problem.number_of_steps_solved
+	assert len(ocp_checkpoints.state_problem.snapshots) <= 2
+
+
+
+def test_time_stepping_lbfgs():
+	set_controls([np.zeros(V.dim()) for k in range(len(controls))])
+	ocp_checkpoints.solve('lbfgs', rtol=1e-2, atol=0.0, max_iter=20)
+	assert ocp_checkpoints.solver.relative_norm <= ocp_checkpoints.solver.rtol
+
+	ocp_list.solve('lbfgs', rtol=1e-2, atol=0.0, max_iter=20)
+	assert abs(ocp_checkpoints.solver.objective_value - ocp_list.solver.objective_value) / abs(ocp_list.solver.objective_value) < 1e-2
+
+
+
+def test_time_stepping_compute_states():
+	set_controls([np.random.rand(V.dim()) for k in range(len(controls))])
+	ocp_list.compute_state_variables()
+
+	def compare(k, t_k):
+		assert t_k == t_array[k]
+		assert np.allclose(y.vector()[:], states[k - 1].vector()[:])
+
+	ocp.compute_states(compare)
+
+
+
+def test_time_stepping_checkpoint(tmp_path, monkeypatch):
+	pytest.importorskip('h5py')
+	config_cp = cashocs.create_config('./config_ocp.ini')
+	config_cp.set('Output', 'checkpoint_interval', '2')
+	monkeypatch.chdir(tmp_path)
+
+	ocp_cp = cashocs.TimeDependentOptimalControlProblem(e, bcs, J, y, y_prev, u, p, t_array, config_cp, time=t)
+	ocp_cp.solve('lbfgs', rtol=1e-2, atol=0.0, max_iter=20)
+	controls_reference = [control.vector()[:] for control in ocp_cp.controls]
+	output_reference = ocp_cp.solver.output_dict
+	assert ocp_cp.solver.checkpoint_iteration > 0
+
+	ocp_restart = cashocs.TimeDependentOptimalControlProblem(e, bcs, J, y, y_prev, u, p, t_array, config_cp, time=t)
+	ocp_restart.solve('lbfgs', rtol=1e-2, atol=0.0, max_iter=20, restart_from='./checkpoint.h5')
+
+	assert ocp_restart.solver.iteration == output_reference['iterations']
+	assert np.allclose(ocp_restart.solver.output_dict['cost_function_value'], output_reference['cost_function_value'])
+	for k in range(len(controls_reference)):
+		assert np.allclose(ocp_restart.controls[k].vector()[:], controls_reference[k])
+
+
+
+def test_time_stepping_algorithms():
+	with pytest.raises(ConfigError):
+		ocp.solve('newton')
+	with pytest.raises(ConfigError):
+		ocp.solve('pdas')
+
+
+
+def test_time_stepping_output():
+	for key in ['save_pvd', 'save_xdmf']:
+		config_output = cashocs.create_config('./config_ocp.ini')
+		config_output.set('Output', key, 'True')
+		ocp_output = cashocs.TimeDependentOptimalControlProblem(e, bcs, J, y, y_prev, u, p, t_array, config_output, time=t)
+		with pytest.raises(ConfigError):
+			ocp_output.solve('lbfgs', rtol=1e-2, atol=0.0, max_iter=2)
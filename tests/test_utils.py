@@ -170,3 +170,33 @@ def test_interpolator():
 
 	assert np.allclose(fen_W.vector()[:], cas_W.vector()[:])
 	assert np.allclose(fen_X.vector()[:], cas_X.vector()[:])
+
+
+
+def test_lbfgs_compact_product():
+	n = 20
+	k = 4
+	B = np.random.rand(n, n)
+	M = B @ B.T + n*np.eye(n)
+	S = np.random.rand(k, n)
+	Y = S + 0.1*np.random.rand(k, n)
+	mask = np.random.rand(n) > 0.3
+	curvatures = np.array([S[i] @ M @ Y[i] for i in range(k)])
+	gamma = 0.5
+	q = mask*np.random.rand(n)
+
+	# reference: double loop recursion, oldest pair in the first row
+	r = q.copy()
+	alphas = []
+	for i in reversed(range(k)):
+		alpha = (S[i] @ M @ r) / curvatures[i]
+		alphas.append(alpha)
+		r -= alpha*Y[i]
+	r = mask*(gamma*r)
+	for i in range(k):
+		beta = (Y[i] @ M @ r) / curvatures[i]
+		r += S[i]*(alphas[k - 1 - i] - beta)
+
+	result = cashocs.utils._lbfgs_compact_product(q, S, Y, S @ M, Y @ M, curvatures, gamma, mask)
+
+	assert np.allclose(mask*result, mask*r)